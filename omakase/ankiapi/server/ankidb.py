@@ -1,41 +1,265 @@
 """
 Manipulate an Anki db
 """
+import pathlib
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
 from typing import Optional
 
-from anki.collection import Collection
+from anki.collection import Collection, SearchNode
+from anki.notes import Note
+from anki.utils import ids2str
 
+from omakase.ankiapi.server.collection_pool import CollectionPool, get_collection_pool
 from omakase.annotations import (
+    AnkiSearch,
+    AnkiTypeCode,
     CardId,
     DeckId,
     DeckName,
     NoteFieldIdx,
+    NoteFieldName,
     NoteFieldValue,
     NoteId,
 )
 from omakase.om_logging import logger
 
+# Number of notes written per transaction by `update_fields_bulk`
+BULK_UPDATE_CHUNK_SIZE = 500
+# Separator of the fields in the `flds` column of the notes table
+_FIELD_SEPARATOR = "\x1f"
+# Separator of the components of deck names in the decks table (shown as '::')
+_DECK_NAME_SEPARATOR = "\x1f"
+# Card/note properties, as read by the hydration query
+_HYDRATION_QUERY = """
+select c.id, c.nid, n.sfld, c.due, nt.name, c.type, c.queue, n.mid, n.flds
+from cards c
+join notes n on n.id = c.nid
+join notetypes nt on nt.id = n.mid
+where {where}
+order by c.id
+"""
 
-class ManipulateAnkiDb:
-    def __init__(self, db_path: str) -> None:
+
+# Watermark for the change feed: a modification time, in seconds. The collection USN
+# cannot serve that purpose, as it is -1 for all local changes until the next sync.
+Watermark = int
+
+
+def get_watermark() -> Watermark:
+    """Watermark covering every change happening from now on"""
+    return int(time.time())
+
+
+@dataclass
+class CollectionChanges:
+    """Ids of items modified since a watermark (see `ManipulateAnkiDb.changes_since`)
+
+    Attributes:
+        card_ids: modified cards, and cards of modified notes
+        watermark: to pass as `since` to get the next changes
+    """
+
+    note_ids: list[NoteId]
+    card_ids: list[CardId]
+    deck_ids: list[DeckId]
+    watermark: Watermark
+
+
+@dataclass
+class CardRecord:
+    """Card and note properties, as needed to build an `ObservableCard`
+
+    Attributes:
+        card_type: Anki card type (0=new, 1=learning, 2=review, 3=relearning)
+        card_queue: Anki card queue (<0 for suspended/buried cards)
+        note_fields: {field name: value}, in the note type field order
+    """
+
+    card_id: CardId
+    note_id: NoteId
+    sort_field_value: str
+    due_value: int
+    note_type: str
+    card_type: AnkiTypeCode
+    card_queue: int
+    note_fields: dict[NoteFieldName, NoteFieldValue]
+
+
+@dataclass
+class BulkUpdateReport:
+    """Outcome of `ManipulateAnkiDb.update_fields_bulk`
+
+    Attributes:
+        updated_note_ids: notes that were written
+        unchanged_note_ids: notes left untouched, as they already had the new values
+        errors: error message for each note that could not be written
+    """
+
+    updated_note_ids: list[NoteId] = field(default_factory=list)
+    unchanged_note_ids: list[NoteId] = field(default_factory=list)
+    errors: dict[NoteId, str] = field(default_factory=dict)
+
+
+class AnkiDbReader(ABC):
+    """SQL reads of a collection, shared by the read-write (`ManipulateAnkiDb`) and
+    read-only (`ReadOnlyAnkiDb`) accesses"""
+
+    @abstractmethod
+    def _db_all(self, sql: str, *args) -> list[tuple]:
+        """Rows returned by `sql`"""
+        pass
+
+    @abstractmethod
+    def _get_deck_and_child_ids(self, deck_id: DeckId) -> list[DeckId]:
+        pass
+
+    def _db_list(self, sql: str, *args) -> list:
+        """First column of the rows returned by `sql`"""
+        return [row[0] for row in self._db_all(sql, *args)]
+
+    def hydrate_deck(
+        self, deck_id: DeckId, sql_filter: Optional[str] = None
+    ) -> list[CardRecord]:
+        """Card/note properties of all cards in a deck (incl. subdecks)
+
+        Rely on two SQL queries, whatever the number of cards.
+
+        Args:
+            sql_filter: only keep cards matching that sql condition on the cards
+                table (aliased `c`), e.g. 'c.type = 0'
+        """
+        where = self._get_deck_condition(deck_id=deck_id)
+        if sql_filter:
+            where = f"({where}) and ({sql_filter})"
+        return self._hydrate(where=where)
+
+    def find_card_ids_in_deck(
+        self, deck_id: DeckId, sql_filter: Optional[str] = None
+    ) -> list[CardId]:
+        """Ids of the cards of a deck (incl. subdecks), optionally matching
+        `sql_filter` (see `hydrate_deck`)"""
+        where = self._get_deck_condition(deck_id=deck_id)
+        if sql_filter:
+            where = f"({where}) and ({sql_filter})"
+        return self._db_list(f"select c.id from cards c where {where} order by c.id")
+
+    def _get_deck_condition(self, deck_id: DeckId) -> str:
+        """SQL condition on cards (aliased `c`) being in the deck or its subdecks.
+        Filtered decks move cards away from their home deck (`odid`), hence the check
+        on both `did` and `odid`."""
+        deck_ids_str = ids2str(self._get_deck_and_child_ids(deck_id))
+        return f"c.did in {deck_ids_str} or c.odid in {deck_ids_str}"
+
+    def hydrate_cards(self, card_ids: list[CardId]) -> list[CardRecord]:
+        """Card/note properties of the cards `card_ids`, ordered by card id"""
+        return self._hydrate(where=f"c.id in {ids2str(card_ids)}")
+
+    def _hydrate(self, where: str) -> list[CardRecord]:
+        """Build the CardRecords of cards matching the sql `where` clause"""
+        field_names = self._get_field_names_by_note_type()
+        rows = self._db_all(_HYDRATION_QUERY.format(where=where))
+        records = [
+            CardRecord(
+                card_id=card_id,
+                note_id=note_id,
+                sort_field_value=str(sort_field_value),
+                due_value=due_value,
+                note_type=note_type,
+                card_type=card_type,
+                card_queue=card_queue,
+                note_fields=dict(
+                    zip(field_names[note_type_id], flds.split(_FIELD_SEPARATOR))
+                ),
+            )
+            for (
+                card_id,
+                note_id,
+                sort_field_value,
+                due_value,
+                note_type,
+                card_type,
+                card_queue,
+                note_type_id,
+                flds,
+            ) in rows
+        ]
+        return records
+
+    def _get_field_names_by_note_type(self) -> dict[int, list[NoteFieldName]]:
+        """{note type id: field names, in order}"""
+        field_names: dict[int, list[NoteFieldName]] = {}
+        for note_type_id, name in self._db_all(
+            "select ntid, name from fields order by ntid, ord"
+        ):
+            field_names.setdefault(note_type_id, []).append(name)
+        return field_names
+
+    def get_note_mods(self, note_ids: list[NoteId]) -> dict[NoteId, int]:
+        """Modification times (epoch seconds) of the existing notes among
+        `note_ids`"""
+        return dict(
+            self._db_all(f"select id, mod from notes where id in {ids2str(note_ids)}")
+        )
+
+    def changes_since(self, since: Watermark) -> CollectionChanges:
+        """Notes, cards and decks modified since the `since` watermark
+
+        Modification times have a one-second resolution, so items modified during
+        the `since` second are returned again: consumers should apply changes
+        idempotently. Deletions are not reported.
+        """
+        # Taken before querying, so that no later change is missed
+        watermark = get_watermark()
+        note_ids = self._db_list("select id from notes where mod >= ?", since)
+        card_ids = self._db_list(
+            f"select id from cards where mod >= ? or nid in {ids2str(note_ids)}",
+            since,
+        )
+        deck_ids = self._db_list("select id from decks where mtime_secs >= ?", since)
+        return CollectionChanges(
+            note_ids=note_ids,
+            card_ids=card_ids,
+            deck_ids=deck_ids,
+            watermark=watermark,
+        )
+
+
+class ManipulateAnkiDb(AnkiDbReader):
+    def __init__(
+        self, db_path: str, pool: Optional[CollectionPool] = None, pooled: bool = True
+    ) -> None:
         """Manipulate an Anki database
 
         Must be used as a context manager.
 
         Args:
             db_path: path to a 'collection.anki2' file
+            pool: pool the collection handle is borrowed from. Default to the
+                process-wide pool.
+            pooled: if False, open a fresh collection on enter and close it on exit
         """
         self._db_path = db_path
+        self._pooled = pooled
+        self._pool = pool if pool is not None else get_collection_pool()
 
     def __enter__(self) -> "ManipulateAnkiDb":
-        """Open the connexion to db"""
-        self._coll = Collection(COL_PATH)
+        """Open the connexion to db (or borrow it from the pool)"""
+        if self._pooled:
+            self._coll: Collection = self._pool.checkout(db_path=self._db_path)
+        else:
+            self._coll = Collection(self._db_path)
         return self
 
     def __exit__(self, exc_type, exc_value, exc_tb) -> bool:
-        """Close the connexion to db"""
+        """Close the connexion to db (or give it back to the pool)"""
         # CLose connexion
-        self._coll.close()
+        if self._pooled:
+            self._pool.checkin(db_path=self._db_path)
+        else:
+            self._coll.close()
         # Propagate any error
         no_exception_occured = exc_value is None
         return no_exception_occured
@@ -44,6 +268,12 @@ class ManipulateAnkiDb:
         deck_list = {deck["id"]: deck["name"] for deck in self._coll.decks.all()}
         return deck_list
 
+    def _db_all(self, sql: str, *args) -> list[tuple]:
+        return self._coll.db.all(sql, *args)
+
+    def _get_deck_and_child_ids(self, deck_id: DeckId) -> list[DeckId]:
+        return self._coll.decks.deck_and_child_ids(deck_id)
+
     def list_cards_in_deck(self, deck_id: DeckId) -> list[CardId]:
         cids = self._coll.decks.cids(did=deck_id, children=True)
         return cids
@@ -63,25 +293,198 @@ class ManipulateAnkiDb:
             )
             return []
         # Building the query (incl if new/not new)
-        deck_name = self.list_decks()[deck_id]
-        query = f'deck:"{deck_name}"'
+        nodes = [SearchNode(deck=self._coll.decks.name(deck_id))]
         if new is not None:
-            if new:
-                query += " is:new"
-            else:
-                query += " -is:new"
+            nodes.append(SearchNode(parsable_text="is:new" if new else "-is:new"))
+        query = self._coll.build_search_string(*nodes)
         # Getting the ids
         nids = self._coll.find_notes(query=query)
         return nids
 
+    def find_cards_in_deck(
+        self,
+        deck_id: DeckId,
+        search: AnkiSearch = "",
+        tag: Optional[str] = None,
+        text: Optional[str] = None,
+    ) -> list[CardId]:
+        """Ids of the cards of a deck (incl. subdecks) matching all the criteria
+
+        Args:
+            deck_id: id of the deck
+            search: Anki search expression (e.g. 'is:new')
+            tag: only keep notes with that tag
+            text: only keep notes containing that text (taken literally)
+        """
+        nodes = [SearchNode(deck=self._coll.decks.name(deck_id))]
+        if search:
+            nodes.append(SearchNode(parsable_text=search))
+        if tag:
+            nodes.append(SearchNode(tag=tag))
+        if text:
+            nodes.append(SearchNode(literal_text=text))
+        query = self._coll.build_search_string(*nodes)
+        return list(self._coll.find_cards(query=query))
+
+    def search_deck(
+        self,
+        deck_id: DeckId,
+        search: AnkiSearch = "",
+        tag: Optional[str] = None,
+        text: Optional[str] = None,
+    ) -> list[CardRecord]:
+        """Card/note properties of the cards of a deck (incl. subdecks) matching
+        all the criteria (see `find_cards_in_deck`)
+
+        The search runs inside the collection, so that only matching cards are
+        hydrated.
+        """
+        card_ids = self.find_cards_in_deck(
+            deck_id=deck_id, search=search, tag=tag, text=text
+        )
+        return self.hydrate_cards(card_ids=card_ids)
+
     def update_fields(
-        self, note_id: NoteId, updates=dict[NoteFieldIdx, NoteFieldValue]
-    ) -> None:
-        """Update the fields of a note"""
+        self, note_id: NoteId, updates: dict[NoteFieldIdx, NoteFieldValue]
+    ) -> bool:
+        """Update the fields of a note
+
+        The note is not written (hence its modification time is not bumped) if it
+        already has the new values.
+
+        Returns:
+            Whether the note was written
+        """
         note = self._coll.get_note(id=note_id)
+        if all(note.fields[idx] == content for idx, content in updates.items()):
+            return False
         for idx, content in updates.items():
             note.fields[idx] = content
         self._coll.update_note(note=note)
+        return True
+
+    def update_fields_bulk(
+        self,
+        updates: dict[NoteId, dict[NoteFieldIdx, NoteFieldValue]],
+        chunk_size: int = BULK_UPDATE_CHUNK_SIZE,
+    ) -> BulkUpdateReport:
+        """Update the fields of many notes
+
+        Notes are written by chunks of `chunk_size`, each chunk in a single transaction
+        (hence a single undo entry). A note that cannot be updated (missing note, wrong
+        field index) is reported and does not prevent the others from being written.
+        Notes that already have the new values are not written.
+
+        Args:
+            updates: for each note, {field index: new value}
+            chunk_size: max number of notes per transaction
+
+        Returns:
+            Report of updated, unchanged and failed notes
+        """
+        report = BulkUpdateReport()
+        note_ids = list(updates.keys())
+        for start in range(0, len(note_ids), chunk_size):
+            chunk_note_ids = note_ids[start : start + chunk_size]
+            fields_by_note_id = self._get_note_fields(note_ids=chunk_note_ids)
+            # Apply changes in memory, loading only the notes that change
+            notes: list[Note] = []
+            for note_id in chunk_note_ids:
+                if note_id not in fields_by_note_id:
+                    report.errors[note_id] = "No such note"
+                    continue
+                fields = fields_by_note_id[note_id]
+                bad_idxs = [
+                    idx for idx in updates[note_id] if not 0 <= idx < len(fields)
+                ]
+                if bad_idxs:
+                    report.errors[note_id] = (
+                        f"Field index {bad_idxs[0]} out of range (note has"
+                        f" {len(fields)} fields)"
+                    )
+                    continue
+                if all(fields[idx] == value for idx, value in updates[note_id].items()):
+                    report.unchanged_note_ids.append(note_id)
+                    continue
+                note = self._coll.get_note(id=note_id)
+                for idx, content in updates[note_id].items():
+                    note.fields[idx] = content
+                notes.append(note)
+            # Write the chunk in one transaction
+            if not notes:
+                continue
+            try:
+                self._coll.update_notes(notes=notes)
+            except Exception as e:
+                logger.exception(f"Bulk update of {len(notes)} notes failed")
+                report.errors.update({note.id: str(e) for note in notes})
+            else:
+                report.updated_note_ids.extend(note.id for note in notes)
+        return report
+
+    def _get_note_fields(self, note_ids: list[NoteId]) -> dict[NoteId, list[str]]:
+        """Fields of the existing notes among `note_ids`, read with a single query
+        (`Collection.get_note` loads notes one at a time)"""
+        rows = self._coll.db.all(
+            f"select id, flds from notes where id in {ids2str(note_ids)}"
+        )
+        return {note_id: flds.split(_FIELD_SEPARATOR) for note_id, flds in rows}
+
+
+class ReadOnlyAnkiDb(AnkiDbReader):
+    def __init__(self, db_path: str) -> None:
+        """Read an Anki database through a read-only SQLite connection
+
+        Must be used as a context manager. Unlike `ManipulateAnkiDb`, the collection
+        is neither opened through Anki nor borrowed from the pool: any number of
+        readers can browse it concurrently, including while a writer holds it. The
+        collection being in WAL mode, readers see the last committed state.
+
+        Only the collection tables are read (no search, no scheduling logic).
+
+        Args:
+            db_path: path to a 'collection.anki2' file
+
+        Raises:
+            sqlite3.OperationalError: on enter, if the database cannot be opened
+        """
+        self._db_path = db_path
+
+    def __enter__(self) -> "ReadOnlyAnkiDb":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb) -> None:
+        self.close()
+
+    def open(self) -> None:
+        """Open the read-only connection (done on enter)"""
+        uri = pathlib.Path(self._db_path).absolute().as_uri() + "?mode=ro"
+        self._conn = sqlite3.connect(uri, uri=True)
+
+    def close(self) -> None:
+        """Close the connection (done on exit)"""
+        self._conn.close()
+
+    def list_decks(self) -> dict[DeckId, DeckName]:
+        return {
+            deck_id: name.replace(_DECK_NAME_SEPARATOR, "::")
+            for deck_id, name in self._db_all("select id, name from decks")
+        }
+
+    def _db_all(self, sql: str, *args) -> list[tuple]:
+        return self._conn.execute(sql, args).fetchall()
+
+    def _get_deck_and_child_ids(self, deck_id: DeckId) -> list[DeckId]:
+        names_by_id = dict(self._db_all("select id, name from decks"))
+        name = names_by_id.get(deck_id)
+        if name is None:
+            return []
+        return [
+            child_id
+            for child_id, child_name in names_by_id.items()
+            if child_name == name or child_name.startswith(name + _DECK_NAME_SEPARATOR)
+        ]
 
 
 # TODO: remove
@@ -0,0 +1,183 @@
+"""
+Asyncio facade over `ManipulateAnkiDb`
+
+Collection operations are blocking (SQLite, Rust backend). Awaiting them through
+`AsyncAnkiDb` runs them on a worker thread dedicated to the collection, so that the
+event loop keeps serving other clients meanwhile. As Anki collections are not
+thread-safe, each collection has a single worker: operations on a collection run one
+at a time, in submission order, while different collections are worked on in
+parallel.
+
+Reads that do not go through an Anki collection (see `ReadOnlyAnkiDb`) can instead
+run on a shared pool of reader threads, concurrently with each other and with the
+writer (`run_reader`).
+"""
+import asyncio
+import atexit
+import functools as ft
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from omakase.ankiapi.server.ankidb import (
+    BULK_UPDATE_CHUNK_SIZE,
+    BulkUpdateReport,
+    CardRecord,
+    CollectionChanges,
+    ManipulateAnkiDb,
+    Watermark,
+)
+from omakase.ankiapi.server.collection_pool import CollectionPool
+from omakase.annotations import (
+    AnkiSearch,
+    CardId,
+    DeckId,
+    DeckName,
+    NoteFieldIdx,
+    NoteFieldValue,
+    NoteId,
+)
+
+T = TypeVar("T")
+
+# Number of threads shared by all read-only operations
+READER_THREADS = 8
+
+_WORKERS: dict[str, ThreadPoolExecutor] = {}
+"""{collection path: its worker}"""
+_WORKERS_LOCK = threading.Lock()
+
+
+def _get_worker(db_path: str) -> ThreadPoolExecutor:
+    """Worker thread dedicated to the collection at `db_path`"""
+    with _WORKERS_LOCK:
+        if db_path not in _WORKERS:
+            _WORKERS[db_path] = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="anki-collection"
+            )
+        return _WORKERS[db_path]
+
+
+_READERS = ThreadPoolExecutor(
+    max_workers=READER_THREADS, thread_name_prefix="anki-reader"
+)
+
+
+@atexit.register
+def _shutdown_workers() -> None:
+    with _WORKERS_LOCK:
+        for worker in _WORKERS.values():
+            worker.shutdown(wait=True)
+    _READERS.shutdown(wait=True)
+
+
+class AsyncAnkiDb:
+    def __init__(self, db_path: str, pool: Optional[CollectionPool] = None) -> None:
+        """Awaitable access to an Anki collection
+
+        Each call borrows the collection (see `ManipulateAnkiDb`) on the worker thread
+        of the collection, and gives it back once done.
+
+        Args:
+            db_path: path to a 'collection.anki2' file
+            pool: pool the collection handle is borrowed from. Default to the
+                process-wide pool.
+        """
+        self._db_path = db_path
+        self._pool = pool
+
+    async def run(self, func: Callable[[ManipulateAnkiDb], T]) -> T:
+        """Run `func(anki_db)` on the worker of the collection
+
+        Use it to group several operations under a single checkout.
+        """
+        return await self.run_in_worker(self._run_with_db, func)
+
+    async def run_in_worker(
+        self, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """Run `func(*args, **kwargs)` on the worker of the collection, e.g., for
+        functions that open the collection themselves"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _get_worker(db_path=self._db_path), ft.partial(func, *args, **kwargs)
+        )
+
+    def submit(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        """Submit `func(*args, **kwargs)` to the worker of the collection, from any
+        thread (synchronous counterpart of `run_in_worker`)"""
+        return _get_worker(db_path=self._db_path).submit(func, *args, **kwargs)
+
+    async def run_reader(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run `func(*args, **kwargs)` on the shared reader threads. To be used for
+        functions that only read, preferably through `ReadOnlyAnkiDb` (they would
+        otherwise wait for the collection to be available)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_READERS, ft.partial(func, *args, **kwargs))
+
+    async def list_decks(self) -> dict[DeckId, DeckName]:
+        return await self.run(lambda anki_db: anki_db.list_decks())
+
+    async def find_cards_in_deck(
+        self,
+        deck_id: DeckId,
+        search: AnkiSearch = "",
+        tag: Optional[str] = None,
+        text: Optional[str] = None,
+    ) -> list[CardId]:
+        """See `ManipulateAnkiDb.find_cards_in_deck`"""
+        return await self.run(
+            lambda anki_db: anki_db.find_cards_in_deck(
+                deck_id=deck_id, search=search, tag=tag, text=text
+            )
+        )
+
+    async def search_deck(
+        self,
+        deck_id: DeckId,
+        search: AnkiSearch = "",
+        tag: Optional[str] = None,
+        text: Optional[str] = None,
+    ) -> list[CardRecord]:
+        """See `ManipulateAnkiDb.search_deck`"""
+        return await self.run(
+            lambda anki_db: anki_db.search_deck(
+                deck_id=deck_id, search=search, tag=tag, text=text
+            )
+        )
+
+    async def hydrate_deck(self, deck_id: DeckId) -> list[CardRecord]:
+        """See `ManipulateAnkiDb.hydrate_deck`"""
+        return await self.run(lambda anki_db: anki_db.hydrate_deck(deck_id=deck_id))
+
+    async def hydrate_cards(self, card_ids: list[CardId]) -> list[CardRecord]:
+        """See `ManipulateAnkiDb.hydrate_cards`"""
+        return await self.run(lambda anki_db: anki_db.hydrate_cards(card_ids=card_ids))
+
+    async def changes_since(self, since: Watermark) -> CollectionChanges:
+        """See `ManipulateAnkiDb.changes_since`"""
+        return await self.run(lambda anki_db: anki_db.changes_since(since=since))
+
+    async def update_fields(
+        self, note_id: NoteId, updates: dict[NoteFieldIdx, NoteFieldValue]
+    ) -> bool:
+        """See `ManipulateAnkiDb.update_fields`"""
+        return await self.run(
+            lambda anki_db: anki_db.update_fields(note_id=note_id, updates=updates)
+        )
+
+    async def update_fields_bulk(
+        self,
+        updates: dict[NoteId, dict[NoteFieldIdx, NoteFieldValue]],
+        chunk_size: int = BULK_UPDATE_CHUNK_SIZE,
+    ) -> BulkUpdateReport:
+        """See `ManipulateAnkiDb.update_fields_bulk`"""
+        return await self.run(
+            lambda anki_db: anki_db.update_fields_bulk(
+                updates=updates, chunk_size=chunk_size
+            )
+        )
+
+    def _run_with_db(self, func: Callable[[ManipulateAnkiDb], T]) -> T:
+        with ManipulateAnkiDb(db_path=self._db_path, pool=self._pool) as anki_db:
+            return func(anki_db)
@@ -0,0 +1,175 @@
+"""
+Pool of long-lived Anki collection handles
+
+Opening an `anki.collection.Collection` reloads the schema, decks and note types,
+which is slow for large collections. The pool keeps at most one open handle per
+collection path, hands it out to one user at a time, and closes it once it has been
+idle for too long or when room is needed for another collection (LRU eviction).
+"""
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from anki.collection import Collection
+
+from omakase.om_logging import logger
+
+# Default pool parameters
+DEFAULT_MAX_SIZE = 8
+DEFAULT_IDLE_TIMEOUT = 300  # seconds
+
+
+@dataclass
+class _PooledCollection:
+    """Pool entry. `coll` is None while the collection is being opened."""
+
+    coll: Optional[Collection]
+    in_use: bool
+    last_used: float
+
+
+class CollectionPool:
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+    ) -> None:
+        """Thread-safe pool of open Anki collections, keyed by collection path
+
+        Anki collections are not thread-safe: a handle is checked out by one caller at
+        a time, and other callers asking for the same path wait for its release.
+
+        Args:
+            max_size: maximum number of collections kept open at once
+            idle_timeout: close a collection after that many seconds without use
+        """
+        if max_size < 1:
+            raise ValueError(f"{max_size=} should be at least 1")
+        self._max_size = max_size
+        self._idle_timeout = idle_timeout
+        self._entries: OrderedDict[str, _PooledCollection] = OrderedDict()
+        self._cond = threading.Condition()
+
+    @property
+    def open_paths(self) -> list[str]:
+        """Paths of the currently open collections, least recently used first"""
+        with self._cond:
+            return list(self._entries.keys())
+
+    def checkout(self, db_path: str) -> Collection:
+        """Get exclusive access to the collection at `db_path`
+
+        Open the collection if it is not in the pool yet. Must be paired with a call to
+        `checkin`.
+        """
+        with self._cond:
+            while True:
+                self._close_idle()
+                entry = self._entries.get(db_path)
+                if entry is not None:
+                    if not entry.in_use:
+                        entry.in_use = True
+                        self._entries.move_to_end(db_path)
+                        return entry.coll
+                elif self._make_room():
+                    # Reserve the slot, then open outside the lock
+                    self._entries[db_path] = _PooledCollection(
+                        coll=None, in_use=True, last_used=time.monotonic()
+                    )
+                    break
+                self._cond.wait()
+        try:
+            coll = Collection(db_path)
+        except Exception:
+            with self._cond:
+                self._entries.pop(db_path)
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._entries[db_path].coll = coll
+        logger.info(f"Opened collection {db_path} in pool")
+        return coll
+
+    def checkin(self, db_path: str) -> None:
+        """Give back the collection obtained through `checkout`"""
+        with self._cond:
+            entry = self._entries[db_path]
+            entry.in_use = False
+            entry.last_used = time.monotonic()
+            self._cond.notify_all()
+
+    @contextmanager
+    def collection(self, db_path: str) -> Iterator[Collection]:
+        """Context manager around `checkout`/`checkin`"""
+        coll = self.checkout(db_path=db_path)
+        try:
+            yield coll
+        finally:
+            self.checkin(db_path=db_path)
+
+    def close(self, db_path: str) -> None:
+        """Close the collection at `db_path`, waiting for it to be checked in"""
+        with self._cond:
+            while db_path in self._entries and self._entries[db_path].in_use:
+                self._cond.wait()
+            if db_path in self._entries:
+                self._close_entry(db_path=db_path)
+                self._cond.notify_all()
+
+    def close_all(self) -> None:
+        """Close every collection, waiting for those in use to be checked in"""
+        for db_path in self.open_paths:
+            self.close(db_path=db_path)
+
+    def _make_room(self) -> bool:
+        """Ensure a slot is free for a new collection, evicting the least recently
+        used idle collection if needed. Return False if every slot is in use.
+
+        Must be called with the lock held."""
+        if len(self._entries) < self._max_size:
+            return True
+        for db_path, entry in self._entries.items():
+            if not entry.in_use:
+                self._close_entry(db_path=db_path)
+                return True
+        return False
+
+    def _close_idle(self) -> None:
+        """Close collections idle for more than the idle timeout
+
+        Must be called with the lock held."""
+        now = time.monotonic()
+        expired = [
+            db_path
+            for db_path, entry in self._entries.items()
+            if not entry.in_use and now - entry.last_used > self._idle_timeout
+        ]
+        for db_path in expired:
+            self._close_entry(db_path=db_path)
+
+    def _close_entry(self, db_path: str) -> None:
+        """Close and forget a collection. Must be called with the lock held."""
+        entry = self._entries.pop(db_path)
+        try:
+            entry.coll.close()
+        except Exception:
+            logger.exception(f"Could not close collection {db_path} properly")
+        logger.info(f"Closed collection {db_path} from pool")
+
+
+_DEFAULT_POOL: Optional[CollectionPool] = None
+_DEFAULT_POOL_LOCK = threading.Lock()
+
+
+def get_collection_pool() -> CollectionPool:
+    """Process-wide collection pool"""
+    global _DEFAULT_POOL
+    with _DEFAULT_POOL_LOCK:
+        if _DEFAULT_POOL is None:
+            _DEFAULT_POOL = CollectionPool()
+            atexit.register(_DEFAULT_POOL.close_all)
+        return _DEFAULT_POOL
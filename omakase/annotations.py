@@ -6,12 +6,14 @@ from typing import Annotated, Literal
 # Deck/card/notes-related
 NoteFieldName = Annotated[str, "Field of a note"]
 NoteFieldValue = Annotated[str, "Value of a note"]
-NoteFieldIdx = Annotated[str, "Index of a field in a note"]
+NoteFieldIdx = Annotated[int, "Index of a field in a note"]
 DeckName = Annotated[str, "Name of a deck"]
 OmDeckFilterUiLabel = Annotated[str, "UI label of an deck filter"]
 AnkiTypeCode = Annotated[int, "Anki type code (0=new, 1=learning, 2=due)"]
+AnkiSearch = Annotated[str, "Anki search expression (e.g. 'is:new tag:verb')"]
 OmDeckFilterCode = Annotated[
-    Literal[0, 1, 2], "Code of a deck filter (0 is all, 1 new, 2 in study)"
+    Literal[0, 1, 2, 3, 4],
+    "Code of a deck filter (0 is all, 1 new, 2 in learning, 3 in review, 4 due)",
 ]
 DeckId = Annotated[int, "ID of a deck"]
 CardId = Annotated[int, "ID of a card"]
@@ -0,0 +1,451 @@
+"""
+Generation of mnemonics for many cards at once (e.g., a whole deck)
+
+A `BulkGenerationJob` generates one mnemonic per note (cards of the same note share
+it), and goes through 3 stages:
+1. Prompts are rendered in batch (see `mnemonics.batch`), their fields pre-filled
+   from the note fields associated to the prompt sections (see
+   `MnemonicNoteFieldMapData`), as in the card editor. Notes whose output field is
+   already filled are skipped, unless overwriting is asked for, and so are notes
+   whose prompt is left with empty fields.
+2. Generations run concurrently, at most `max_concurrency` at once, and at most
+   `requests_per_second` on average (token bucket). Failed generations are retried
+   with exponential backoff and random jitter, without holding a concurrency slot
+   while waiting.
+3. Generated mnemonics go through a bounded queue to a single writer, which fills in
+   the note fields and queues the note saves (see `NoteSaveQueue`). When the writer
+   lags behind, the queue fills up and generations wait.
+
+Progress is exposed as an observable, for the UI.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, Optional, Type
+
+from omakase.annotations import NoteFieldName, NoteFieldValue, NoteId
+from omakase.backend.decks import CardStore, DecksManipulator
+from omakase.backend.generation import (
+    GenerationBackend,
+    GenerationError,
+    get_generation_backend,
+)
+from omakase.backend.mnemonics.base import (
+    EmptyFieldError,
+    MnemonicNoteFieldMapData,
+    PromptFieldsData,
+)
+from omakase.backend.mnemonics.batch import get_column_name, render_prompts
+from omakase.backend.note_saves import NoteSaveResult
+from omakase.io import get_bulk_generation_conf
+from omakase.observer_logic import Change, Observable
+from omakase.om_logging import logger
+
+
+# =============
+# Rate limiting
+# =============
+class TokenBucket:
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Rate limiter: tokens are added at `rate` per second, up to `capacity`
+
+        Args:
+            rate: tokens added per second (sustained rate)
+            capacity: maximum number of tokens (burst)
+            clock: current time, in seconds
+        """
+        if rate <= 0 or capacity < 1:
+            raise ValueError("The rate must be positive, and the capacity at least 1")
+        self._rate = rate
+        self._capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._last_refill = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait for a token, and take it"""
+        # Callers are served in turn: a waiting caller holds the lock
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+                self._refill()
+            self._tokens -= 1
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed, self._last_refill = now - self._last_refill, now
+        self._tokens = min(self._capacity, self._tokens + elapsed * self._rate)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Retries of a failed generation
+
+    Attributes:
+        max_attempts: attempts per note, the first one included
+        base_delay: seconds before the first retry, doubled upon each retry
+        max_delay: cap of the delay before a retry, in seconds
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def get_delay(self, n_failed_attempts: int) -> float:
+        """Seconds to wait before the next attempt ("full jitter": drawn uniformly
+        below the exponential backoff, so that concurrent retries spread out)"""
+        backoff = self.base_delay * 2 ** (n_failed_attempts - 1)
+        return random.uniform(0, min(self.max_delay, backoff))
+
+
+# ========
+# Progress
+# ========
+@dataclass(frozen=True)
+class BulkGenerationProgress:
+    """Progress of a bulk generation job
+
+    Attributes:
+        total: number of notes
+        generated: notes whose mnemonic was generated
+        saved: notes saved with their mnemonic
+        failed: notes whose prompt, generation or save failed
+        skipped: notes without note field associated to the generation output, or
+            whose output field is already filled (when not overwriting)
+        empty: notes skipped as their pre-filled prompt has empty fields
+        finished: whether the job is over
+    """
+
+    total: int = 0
+    generated: int = 0
+    saved: int = 0
+    failed: int = 0
+    skipped: int = 0
+    empty: int = 0
+    finished: bool = False
+
+    @property
+    def fraction_done(self) -> float:
+        """Share of the notes that are saved, failed or skipped"""
+        if self.total == 0:
+            return 1.0
+        return (self.saved + self.failed + self.skipped + self.empty) / self.total
+
+
+class BulkGenerationProgressObl(Observable):
+    """Progress of a bulk generation job
+
+    Use `self.value` to access the progress. `self.notify` is triggered upon
+    assignment."""
+
+    def __init__(self, data: BulkGenerationProgress) -> None:
+        self._value = data
+
+    @property
+    def value(self) -> BulkGenerationProgress:
+        return self._value
+
+    @value.setter
+    def value(self, value: BulkGenerationProgress) -> None:
+        old_value, self._value = self._value, value
+        self.notify(change=Change(old_value=old_value, new_value=value))
+
+
+# ===
+# Job
+# ===
+@dataclass(frozen=True)
+class _GenerationTask:
+    card_idx: int  # in the card store
+    note_id: NoteId
+    note_field_name: NoteFieldName
+    prompt: str
+
+
+@dataclass(frozen=True)
+class _GenerationOutput:
+    task: _GenerationTask
+    output: str
+
+
+class BulkGenerationJob:
+    def __init__(
+        self,
+        cards: CardStore,
+        prompt_fields_data_class: Type[PromptFieldsData],
+        om_username: str,
+        backend: GenerationBackend,
+        deck_manipulator: DecksManipulator,
+        max_concurrency: int = 4,
+        rate_limiter: Optional[TokenBucket] = None,
+        retry_policy: RetryPolicy = RetryPolicy(),
+        queue_size: int = 32,
+        overwrite: bool = False,
+    ) -> None:
+        """Generate mnemonics for the notes of `cards`, and save them into the notes
+
+        Args:
+            cards: cards whose notes to generate a mnemonic for (one per note). Views
+                are only built for the cards whose note is written.
+            prompt_fields_data_class: type of mnemonic to generate
+            om_username: user whose note field associations are used
+            backend: generates the mnemonics
+            deck_manipulator: saves the notes of the user
+            max_concurrency: generations in flight at once
+            rate_limiter: limits the rate of generation requests (none if None)
+            retry_policy: retries of failed generations
+            queue_size: generated mnemonics awaiting their note save
+            overwrite: whether to generate into output fields already filled
+        """
+        self._cards = cards
+        # Index of the first card of each note: the mnemonic goes into the note
+        card_idx_by_note_id: dict[NoteId, int] = {}
+        for card_idx, note_id in enumerate(cards.get_column("note_id")):
+            card_idx_by_note_id.setdefault(note_id, card_idx)
+        self._card_idxs = list(card_idx_by_note_id.values())
+        self._prompt_fields_data_class = prompt_fields_data_class
+        self._om_username = om_username
+        self._backend = backend
+        self._deck_manipulator = deck_manipulator
+        self._max_concurrency = max_concurrency
+        self._rate_limiter = rate_limiter
+        self._retry_policy = retry_policy
+        self._queue_size = queue_size
+        self._overwrite = overwrite
+        self.progress_obl = BulkGenerationProgressObl(
+            data=BulkGenerationProgress(total=len(self._card_idxs))
+        )
+
+    async def run(self) -> BulkGenerationProgress:
+        """Run the job to its end
+
+        Returns:
+            Final progress
+        """
+        tasks = self._build_tasks()
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        queue: asyncio.Queue[Optional[_GenerationOutput]] = asyncio.Queue(
+            maxsize=self._queue_size
+        )
+        writer = asyncio.create_task(self._write(queue=queue))
+        try:
+            await asyncio.gather(
+                *(
+                    self._generate(task=task, semaphore=semaphore, queue=queue)
+                    for task in tasks
+                )
+            )
+            await queue.put(None)  # the writer stops there
+            await writer
+        finally:
+            writer.cancel()
+            self._increment(finished=True)
+        progress = self.progress_obl.value
+        logger.info(f"Bulk generation for {self._om_username}: {progress}")
+        return progress
+
+    def _build_tasks(self) -> list[_GenerationTask]:
+        """Render the prompts of the notes with an associated output note field,
+        empty unless overwriting"""
+        note_types = self._cards.get_column("note_type")
+        nf_maps: dict[str, MnemonicNoteFieldMapData] = {}
+        rows, card_idxs, note_field_names = [], [], []
+        for card_idx in self._card_idxs:
+            note_type = note_types[card_idx]
+            note_fields = self._cards.get_note_fields(idx=card_idx)
+            if note_type not in nf_maps:
+                nf_maps[note_type] = MnemonicNoteFieldMapData(
+                    prompt_params_class=self._prompt_fields_data_class,
+                    note_type=note_type,
+                    note_field_names=list(note_fields.keys()),
+                    om_username=self._om_username,
+                )
+            nf_map = nf_maps[note_type]
+            if not nf_map.genout_is_associated_to_note_field():
+                self._increment(skipped=1)
+                continue
+            note_field_name = nf_map.point_to_genout_note_field_dp().value
+            if not self._overwrite and note_fields.get(note_field_name, "").strip():
+                self._increment(skipped=1)
+                continue
+            rows.append(self._prefill(nf_map=nf_map, note_fields=note_fields))
+            card_idxs.append(card_idx)
+            note_field_names.append(note_field_name)
+        note_ids = self._cards.get_column("note_id")
+        tasks = []
+        for rendered in render_prompts(
+            prompt_fields_data_class=self._prompt_fields_data_class, table=rows
+        ):
+            card_idx = card_idxs[rendered.row_label]
+            if isinstance(rendered.error, EmptyFieldError):
+                logger.info(
+                    f"No prompt for note {note_ids[card_idx]}: {rendered.error}"
+                )
+                self._increment(empty=1)
+                continue
+            if not rendered.ok:
+                logger.warning(
+                    f"No prompt for note {note_ids[card_idx]}: {rendered.error!r}"
+                )
+                self._increment(failed=1)
+                continue
+            tasks.append(
+                _GenerationTask(
+                    card_idx=card_idx,
+                    note_id=note_ids[card_idx],
+                    note_field_name=note_field_names[rendered.row_label],
+                    prompt=rendered.prompt,
+                )
+            )
+        return tasks
+
+    def _prefill(
+        self,
+        nf_map: MnemonicNoteFieldMapData,
+        note_fields: dict[NoteFieldName, NoteFieldValue],
+    ) -> dict[str, str]:
+        """Prompt fields pre-filled from a note, as a row of the table to render
+
+        As in the card editor, each field of each row of a section is pre-filled
+        with the note field associated to the section.
+        """
+        row = {}
+        for section in self._prompt_fields_data_class.get_schema().sections:
+            assoc_note_field = nf_map.point_to_prompt_note_assoc_dp(
+                section_prompt_name=section.prompt_name
+            ).value
+            if assoc_note_field not in note_fields:
+                continue
+            for row_idx in range(section.n_repeat):
+                for field_name in section.field_names:
+                    column = get_column_name(
+                        section_prompt_name=section.prompt_name,
+                        row_idx=row_idx,
+                        field_prompt_name=field_name,
+                    )
+                    row[column] = note_fields[assoc_note_field]
+        return row
+
+    async def _generate(
+        self,
+        task: _GenerationTask,
+        semaphore: asyncio.Semaphore,
+        queue: "asyncio.Queue[Optional[_GenerationOutput]]",
+    ) -> None:
+        """Generate the mnemonic of a note, with retries, and queue it for writing
+
+        Failures are counted, and do not stop the generation of the other notes.
+        """
+        try:
+            output = await self._generate_with_retries(
+                prompt=task.prompt, semaphore=semaphore
+            )
+        except GenerationError as e:
+            logger.warning(f"Generation failed for note {task.note_id}: {e}")
+            self._increment(failed=1)
+            return
+        except Exception:
+            logger.exception(f"Generation failed for note {task.note_id}")
+            self._increment(failed=1)
+            return
+        self._increment(generated=1)
+        # Waits while the writer lags behind (backpressure)
+        await queue.put(_GenerationOutput(task=task, output=output))
+
+    async def _generate_with_retries(
+        self, prompt: str, semaphore: asyncio.Semaphore
+    ) -> str:
+        """Generated text for `prompt`, retried as per the retry policy
+
+        Raises:
+            GenerationError: the last attempt failed
+        """
+        for n_attempts in range(1, self._retry_policy.max_attempts + 1):
+            try:
+                async with semaphore:
+                    if self._rate_limiter is not None:
+                        await self._rate_limiter.acquire()
+                    return await self._backend.generate(prompt=prompt)
+            except GenerationError:
+                if n_attempts == self._retry_policy.max_attempts:
+                    raise
+            # Out of the semaphore: other notes are generated meanwhile
+            await asyncio.sleep(
+                self._retry_policy.get_delay(n_failed_attempts=n_attempts)
+            )
+        raise GenerationError("No generation attempt")
+
+    async def _write(self, queue: "asyncio.Queue[Optional[_GenerationOutput]]") -> None:
+        """Fill in the note fields, and queue the note saves (batched together)"""
+        saves = []
+        while (generation := await queue.get()) is not None:
+            card = self._cards.get_card(idx=generation.task.card_idx)
+            try:
+                card.note_fields[generation.task.note_field_name] = generation.output
+                save = asyncio.wrap_future(
+                    self._deck_manipulator.queue_note_save(card=card)
+                )
+            except Exception:
+                logger.exception(f"Could not queue the save of note {card.note_id}")
+                self._increment(failed=1)
+                continue
+            save.add_done_callback(self._handle_save_done)
+            saves.append(save)
+        await asyncio.gather(*saves, return_exceptions=True)
+
+    def _handle_save_done(self, save: "asyncio.Future[NoteSaveResult]") -> None:
+        if not save.cancelled() and save.exception() is None and save.result().ok:
+            self._increment(saved=1)
+        else:
+            self._increment(failed=1)
+
+    def _increment(self, finished: bool = False, **counts: int) -> None:
+        """Update the progress (and notify it)"""
+        progress = self.progress_obl.value
+        self.progress_obl.value = replace(
+            progress,
+            finished=finished or progress.finished,
+            **{name: getattr(progress, name) + n for name, n in counts.items()},
+        )
+
+
+def create_bulk_generation_job(
+    cards: CardStore,
+    prompt_fields_data_class: Type[PromptFieldsData],
+    om_username: str,
+    deck_manipulator: DecksManipulator,
+    overwrite: bool = False,
+) -> BulkGenerationJob:
+    """Bulk generation job using the shared backend, configured as in
+    conf/generation.toml
+
+    Raises:
+        GenerationError: no generation backend is configured
+    """
+    conf = get_bulk_generation_conf()
+    return BulkGenerationJob(
+        cards=cards,
+        prompt_fields_data_class=prompt_fields_data_class,
+        om_username=om_username,
+        backend=get_generation_backend(),
+        deck_manipulator=deck_manipulator,
+        max_concurrency=conf["max_concurrency"],
+        rate_limiter=TokenBucket(
+            rate=conf["requests_per_second"], capacity=conf["burst"]
+        ),
+        retry_policy=RetryPolicy(
+            max_attempts=conf["max_attempts"],
+            base_delay=conf["retry_base_delay"],
+            max_delay=conf["retry_max_delay"],
+        ),
+        queue_size=conf["queue_size"],
+        overwrite=overwrite,
+    )
@@ -1,16 +1,44 @@
 """
 Query and edit decks
 """
+import copy
+import os
+import sqlite3
+import threading
+from array import array
+from concurrent.futures import Future
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence, TypeVar
 
-from dataclasses import asdict, dataclass, fields
-
+from omakase.ankiapi.server.ankidb import (
+    AnkiDbReader,
+    CardRecord,
+    ManipulateAnkiDb,
+    ReadOnlyAnkiDb,
+    Watermark,
+    get_watermark,
+)
+from omakase.ankiapi.server.async_ankidb import AsyncAnkiDb
 from omakase.annotations import (
+    AnkiSearch,
+    CardId,
+    DeckId,
     DeckName,
+    NoteFieldIdx,
     NoteFieldName,
     NoteFieldValue,
+    NoteId,
     OmDeckFilterCode,
 )
+from omakase.backend.note_saves import (
+    NoteSaveCounters,
+    NoteSaveResult,
+    get_note_save_queue,
+)
+from omakase.exceptions import NoSuchDeckException
+from omakase.io import get_collection_path
 from omakase.observer_logic import ObservableDataclass
+from omakase.om_logging import logger
 
 
 # ===============
@@ -26,11 +54,51 @@ class ObservableCard(ObservableDataclass):
     study_status: OmDeckFilterCode
     note_fields: dict[NoteFieldName, NoteFieldValue]
 
+    def __post_init__(self) -> None:
+        super().__post_init__()
+        # Note fields as last pulled from/saved to the collection
+        self._pristine_note_fields = dict(self.note_fields)
+
+    @property
+    def dirty_fields(self) -> set[NoteFieldName]:
+        """Note fields edited since the card was pulled or last saved"""
+        return {
+            name
+            for name, value in self.note_fields.items()
+            if self._pristine_note_fields.get(name) != value
+        }
+
+    def get_dirty_field_updates(self) -> dict[NoteFieldIdx, NoteFieldValue]:
+        """{field index: value} of the dirty fields, indexes following the note type
+        field order (that of `note_fields`)"""
+        dirty_fields = self.dirty_fields
+        return {
+            idx: value
+            for idx, (name, value) in enumerate(self.note_fields.items())
+            if name in dirty_fields
+        }
+
+    def mark_clean(
+        self, field_values: Optional[dict[NoteFieldName, NoteFieldValue]] = None
+    ) -> None:
+        """Consider note fields as saved
+
+        Args:
+            field_values: {note field: saved value}. If None, all the current note
+                fields.
+        """
+        if field_values is None:
+            field_values = self.note_fields
+        self._pristine_note_fields.update(field_values)
+
     def get_card_properties(self) -> dict:
         """Return the card properties (excl the card's fields) as a dict"""
-        dic = asdict(self)
-        dic.pop("note_fields")
-        return dic
+        # Not using `asdict`, which would deep-copy the note fields only to drop them
+        return {
+            f.name: getattr(self, f.name)
+            for f in fields(self)
+            if f.name != "note_fields"
+        }
 
 
 def get_card_property_names() -> list:
@@ -40,98 +108,757 @@ def get_card_property_names() -> list:
     return names
 
 
-# ===============
-# SRS-independent
-# ===============
+# Attributes of a `CardStore` holding its cards, shared by copies until either is
+# appended to (see `CardStore.copy`)
+_CARD_STORE_COLUMNS = (
+    "_card_ids",
+    "_note_ids",
+    "_due_values",
+    "_study_statuses",
+    "_note_type_idxs",
+    "_field_names_idxs",
+    "_sort_field_values",
+    "_field_values",
+    "_note_types",
+    "_note_type_idx_by_name",
+    "_field_names",
+    "_field_names_idx_by_names",
+)
+
+
+class CardStore:
+    def __init__(self) -> None:
+        """Compact, column-oriented storage of cards
+
+        Ids, due values and study statuses are stored in typed arrays; note types and
+        field names are stored once, and referred to by index. `ObservableCard`s are
+        only built on demand, as views to edit a card (see `get_card`); views are
+        memoized, so that edits in a view survive until the store is replaced.
+
+        Prefer the column accessors (`card_ids`, `get_column`, `get_card_properties`)
+        to iterating over views when going through many cards.
+        """
+        self._card_ids = array("q")
+        self._note_ids = array("q")
+        self._due_values = array("q")
+        self._study_statuses = array("b")
+        self._note_type_idxs = array("I")
+        self._field_names_idxs = array("I")
+        self._sort_field_values: list[str] = []
+        self._field_values: list[tuple[NoteFieldValue, ...]] = []
+        # Interned note types and field names, referred to by index in the columns
+        self._note_types: list[str] = []
+        self._note_type_idx_by_name: dict[str, int] = {}
+        self._field_names: list[tuple[NoteFieldName, ...]] = []
+        self._field_names_idx_by_names: dict[tuple[NoteFieldName, ...], int] = {}
+        # Built on demand
+        self._idx_by_card_id: Optional[dict[CardId, int]] = None
+        self._views: dict[CardId, ObservableCard] = {}
+        # Whether the columns may be shared with a copy
+        self._shared_columns = False
+
+    @classmethod
+    def from_cards(cls, cards: Iterable[ObservableCard]) -> "CardStore":
+        store = cls()
+        for card in cards:
+            store.append(
+                card_id=card.card_id,
+                note_id=card.note_id,
+                sort_field_value=card.sort_field_value,
+                due_value=card.due_value,
+                note_type=card.note_type,
+                study_status=card.study_status,
+                note_fields=card.note_fields,
+            )
+        return store
+
+    def append(
+        self,
+        card_id: CardId,
+        note_id: NoteId,
+        sort_field_value: str,
+        due_value: int,
+        note_type: str,
+        study_status: OmDeckFilterCode,
+        note_fields: dict[NoteFieldName, NoteFieldValue],
+    ) -> None:
+        """Add a card at the end of the store"""
+        self._own_columns()
+        field_names = tuple(note_fields.keys())
+        self._card_ids.append(card_id)
+        self._note_ids.append(note_id)
+        self._due_values.append(due_value)
+        self._study_statuses.append(study_status)
+        self._note_type_idxs.append(
+            _intern(note_type, self._note_types, self._note_type_idx_by_name)
+        )
+        self._field_names_idxs.append(
+            _intern(field_names, self._field_names, self._field_names_idx_by_names)
+        )
+        self._sort_field_values.append(sort_field_value)
+        self._field_values.append(tuple(note_fields.values()))
+        self._idx_by_card_id = None
+
+    def __len__(self) -> int:
+        return len(self._card_ids)
+
+    def __getitem__(self, idx: int) -> ObservableCard:
+        return self.get_card(idx=idx)
+
+    def __iter__(self) -> Iterator[ObservableCard]:
+        """Views of all cards (costly for big stores, see `get_card`)"""
+        for idx in range(len(self)):
+            yield self.get_card(idx=idx)
+
+    @property
+    def card_ids(self) -> Sequence[CardId]:
+        """Card ids, in order (not to be modified)"""
+        return self._card_ids
+
+    def index(self, card_id: CardId) -> int:
+        """Index of a card
+
+        Raises:
+            ValueError: if the card is not in the store
+        """
+        if self._idx_by_card_id is None:
+            self._idx_by_card_id = {
+                card_id: idx for idx, card_id in enumerate(self._card_ids)
+            }
+        try:
+            return self._idx_by_card_id[card_id]
+        except KeyError:
+            raise ValueError(f"Card {card_id} is not in the store")
+
+    def has_card(self, card_id: CardId) -> bool:
+        try:
+            self.index(card_id=card_id)
+        except ValueError:
+            return False
+        return True
+
+    def get_card(self, idx: int) -> ObservableCard:
+        """Observable view of the card at `idx`, to display or edit it
+
+        Raises:
+            IndexError: if there is no such card
+        """
+        card_id = self._card_ids[idx]
+        if card_id not in self._views:
+            self._views[card_id] = ObservableCard(
+                note_fields=dict(
+                    zip(
+                        self._field_names[self._field_names_idxs[idx]],
+                        self._field_values[idx],
+                    )
+                ),
+                **self.get_card_properties(idx=idx),
+            )
+        return self._views[card_id]
+
+    def get_note_fields(self, idx: int) -> dict[NoteFieldName, NoteFieldValue]:
+        """Note fields of the card at `idx`, as edited in its view if any (no view is
+        built)"""
+        card_id = self._card_ids[idx]
+        if card_id in self._views:
+            return dict(self._views[card_id].note_fields)
+        return dict(
+            zip(
+                self._field_names[self._field_names_idxs[idx]],
+                self._field_values[idx],
+            )
+        )
+
+    def get_card_properties(self, idx: int) -> dict:
+        """Properties (excl. the note fields) of the card at `idx`, as returned by
+        `ObservableCard.get_card_properties`"""
+        return {
+            "card_id": self._card_ids[idx],
+            "note_id": self._note_ids[idx],
+            "sort_field_value": self._sort_field_values[idx],
+            "due_value": self._due_values[idx],
+            "note_type": self._note_types[self._note_type_idxs[idx]],
+            "study_status": self._study_statuses[idx],
+        }
+
+    def get_column(self, name: str) -> Sequence:
+        """Values of a card property (see `get_card_property_names`), in card order"""
+        if name == "note_type":
+            return [self._note_types[idx] for idx in self._note_type_idxs]
+        return {
+            "card_id": self._card_ids,
+            "note_id": self._note_ids,
+            "sort_field_value": self._sort_field_values,
+            "due_value": self._due_values,
+            "study_status": self._study_statuses,
+        }[name]
+
+    def copy(self) -> "CardStore":
+        """Copy of the cards, without the views handed out so far
+
+        The columns are shared (copy-on-write), so copying is cheap: they are only
+        copied when either store gets appended to.
+        """
+        store = CardStore()
+        for name in _CARD_STORE_COLUMNS:
+            setattr(store, name, getattr(self, name))
+        store._idx_by_card_id = self._idx_by_card_id
+        self._shared_columns = store._shared_columns = True
+        return store
+
+    def select(self, idxs: Iterable[int]) -> "CardStore":
+        """New store with the cards at `idxs`, in that order"""
+        store = CardStore()
+        for idx in idxs:
+            store._append_from(other=self, idx=idx)
+        return store
+
+    def with_changes(
+        self, upserted_cards: "CardStore", removed_card_ids: set[CardId]
+    ) -> "CardStore":
+        """New store where `upserted_cards` replace the cards with the same id (or are
+        appended), and without `removed_card_ids`. Views of untouched cards are kept.
+        """
+        store = CardStore()
+        for idx, card_id in enumerate(self._card_ids):
+            if card_id in removed_card_ids:
+                continue
+            if upserted_cards.has_card(card_id=card_id):
+                store._append_from(
+                    other=upserted_cards, idx=upserted_cards.index(card_id=card_id)
+                )
+            else:
+                store._append_from(other=self, idx=idx)
+                if card_id in self._views:
+                    store._views[card_id] = self._views[card_id]
+        for idx, card_id in enumerate(upserted_cards.card_ids):
+            if not self.has_card(card_id=card_id):
+                store._append_from(other=upserted_cards, idx=idx)
+        return store
+
+    def _append_from(self, other: "CardStore", idx: int) -> None:
+        """Append the card at `idx` in `other`, sharing its (immutable) values"""
+        self._own_columns()
+        self._card_ids.append(other._card_ids[idx])
+        self._note_ids.append(other._note_ids[idx])
+        self._due_values.append(other._due_values[idx])
+        self._study_statuses.append(other._study_statuses[idx])
+        self._note_type_idxs.append(
+            _intern(
+                other._note_types[other._note_type_idxs[idx]],
+                self._note_types,
+                self._note_type_idx_by_name,
+            )
+        )
+        self._field_names_idxs.append(
+            _intern(
+                other._field_names[other._field_names_idxs[idx]],
+                self._field_names,
+                self._field_names_idx_by_names,
+            )
+        )
+        self._sort_field_values.append(other._sort_field_values[idx])
+        self._field_values.append(other._field_values[idx])
+        self._idx_by_card_id = None
+
+    def _own_columns(self) -> None:
+        """Copy the columns if they may be shared, before appending to them"""
+        if self._shared_columns:
+            for name in _CARD_STORE_COLUMNS:
+                setattr(self, name, copy.copy(getattr(self, name)))
+            self._shared_columns = False
+
+
+def _intern(value, values: list, idx_by_value: dict) -> int:
+    """Index of `value` in `values`, which it is added to if needed"""
+    if value not in idx_by_value:
+        idx_by_value[value] = len(values)
+        values.append(value)
+    return idx_by_value[value]
+
+
+# =============
+# SRS-dependent
+# =============
+T = TypeVar("T")
+_DeckFilterKey = tuple[DeckName, OmDeckFilterCode, Optional[str], Optional[str]]
+
+
+@dataclass
+class _DeckCache:
+    """In-process cache of the decks of one omakase user
+
+    Valid as long as the collection files have the same `collection_version`.
+
+    Attributes:
+        collection_version: version of the collection the cache was filled from
+        deck_ids_by_name: None if the deck list was not loaded yet
+        stores_by_deck_filter: cards for each (deck name, om filter code, tag, text)
+        lock: to be held when reading/writing the above
+    """
+
+    collection_version: Optional[tuple] = None
+    deck_ids_by_name: Optional[dict[DeckName, DeckId]] = None
+    stores_by_deck_filter: dict[_DeckFilterKey, CardStore] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+_DECK_CACHES: dict[str, _DeckCache] = {}
+"""{om username: deck cache}"""
+_DECK_CACHES_LOCK = threading.Lock()
+
+
+class _CollectionNeeded(Exception):
+    """A read-only call needs the (read-write) collection"""
+
+    pass
+
+
+def _get_collection_version(db_path: str) -> tuple:
+    """Version of the collection, as given by the modification time and size of its
+    files (the db and its write-ahead log).
+
+    Any write to the collection changes it, and reading it does not require opening
+    the db."""
+    version = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            version.append(None)
+        else:
+            version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+def _get_study_status(record: CardRecord) -> OmDeckFilterCode:
+    """Om study status of a card (1 new, 2 in learning, 3 in review)"""
+    if record.card_type == 0:
+        return 1
+    elif record.card_type == 2:
+        return 3
+    else:  # learning, relearning
+        return 2
+
+
+def _store_from_records(records: list[CardRecord]) -> CardStore:
+    """Build a CardStore from card records"""
+    store = CardStore()
+    for record in records:
+        store.append(
+            card_id=record.card_id,
+            note_id=record.note_id,
+            sort_field_value=record.sort_field_value,
+            due_value=record.due_value,
+            note_type=record.note_type,
+            study_status=_get_study_status(record=record),
+            note_fields=record.note_fields,
+        )
+    return store
+
+
+@dataclass
+class CardChanges:
+    """Changes of the cards of a deck since a watermark
+
+    Attributes:
+        upserted_cards: new or modified cards
+        removed_card_ids: cards that left the deck/filter (or were deleted)
+        decks_changed: whether some decks were modified (e.g., renamed)
+        watermark: to pass as `since` to get the next changes
+    """
+
+    upserted_cards: CardStore
+    removed_card_ids: set[CardId]
+    decks_changed: bool
+    watermark: Watermark
+
+
 class DecksManipulator:
     def __init__(self, om_username: str) -> None:
-        """Manipulate decks of `om_username`"""
+        """Manipulate decks of `om_username`
+
+        Deck lists and deck contents are cached per user, in-process. The cache is
+        dropped as soon as the collection changes on disk, so that repeated calls hit
+        the collection only if needed.
+
+        From the event loop, prefer the `async_*` methods, which do not block it.
+        """
         self._om_username = om_username
+        self._db_path = get_collection_path(om_username=om_username)
+        self._async_db = AsyncAnkiDb(db_path=self._db_path)
+        with _DECK_CACHES_LOCK:
+            self._cache = _DECK_CACHES.setdefault(om_username, _DeckCache())
+
+    def list_decks(self) -> list[DeckName]:
+        """List decks for the omakase user
+
+        Returns:
+            List of decks (empty if the user has no collection yet)
+        """
+        return self._list_decks(read_only=False)
+
+    def _list_decks(self, read_only: bool) -> list[DeckName]:
+        """See `list_decks` and `_read`"""
+        if not os.path.exists(self._db_path):
+            return []
+        return list(self._get_deck_ids_by_name(read_only=read_only).keys())
+
+    def get_cards_from_deck(
+        self,
+        deck_name: DeckName,
+        om_filter_code: OmDeckFilterCode,
+        tag: Optional[str] = None,
+        text: Optional[str] = None,
+    ) -> CardStore:
+        """Cards from `deck_name` (incl. subdecks) matching `om_filter_code`, and
+        optionally having `tag` and containing `text`
+
+        Filtering happens before hydration: in SQL, through a read-only connection,
+        when the filter allows it (see `DeckFilter.sql_filter`), otherwise in the
+        collection search. The returned store is a (copy-on-write, hence cheap) copy
+        of the cached one, which the caller is free to edit.
+
+        Raises:
+            NoSuchDeckException: if there is no such deck
+        """
+        return self._get_cards_from_deck(
+            deck_name=deck_name,
+            om_filter_code=om_filter_code,
+            tag=tag,
+            text=text,
+            read_only=False,
+        )
+
+    def _get_cards_from_deck(
+        self,
+        deck_name: DeckName,
+        om_filter_code: OmDeckFilterCode,
+        tag: Optional[str],
+        text: Optional[str],
+        read_only: bool,
+    ) -> CardStore:
+        """See `get_cards_from_deck` and `_read`"""
+        self._sync_cache()
+        key = (deck_name, om_filter_code, tag, text)
+        store = self._cache.stores_by_deck_filter.get(key)
+        if store is None:
+            deck_id = self._get_deck_id(deck_name=deck_name, read_only=read_only)
+            deck_filter = get_deck_filter(om_filter_code=om_filter_code)
+            if deck_filter.sql_filter is not None and not (tag or text):
+                records, version = self._read(
+                    lambda reader: (
+                        reader.hydrate_deck(
+                            deck_id=deck_id, sql_filter=deck_filter.sql_filter
+                        ),
+                        _get_collection_version(db_path=self._db_path),
+                    ),
+                    read_only=read_only,
+                )
+            else:
+                if read_only:
+                    raise _CollectionNeeded()
+                with ManipulateAnkiDb(db_path=self._db_path) as anki_db:
+                    records = anki_db.search_deck(
+                        deck_id=deck_id,
+                        search=deck_filter.anki_search,
+                        tag=tag,
+                        text=text,
+                    )
+                    version = _get_collection_version(db_path=self._db_path)
+            store = _store_from_records(records=records)
+            self._store_in_cache(version=version, key=key, store=store)
+        return store.copy()
+
+    async def async_list_decks(self) -> list[DeckName]:
+        """Awaitable `list_decks`"""
+        return await self._run_async(self._list_decks)
+
+    async def async_get_cards_from_deck(
+        self,
+        deck_name: DeckName,
+        om_filter_code: OmDeckFilterCode,
+        tag: Optional[str] = None,
+        text: Optional[str] = None,
+    ) -> CardStore:
+        """Awaitable `get_cards_from_deck`"""
+        return await self._run_async(
+            self._get_cards_from_deck,
+            deck_name=deck_name,
+            om_filter_code=om_filter_code,
+            tag=tag,
+            text=text,
+        )
 
-    def list_decks(self) -> list[str]:
-        """List decks for a given omakase user
+    async def async_get_card_changes(
+        self,
+        deck_name: DeckName,
+        om_filter_code: OmDeckFilterCode,
+        since: Watermark,
+        known_card_ids: set[CardId],
+    ) -> CardChanges:
+        """Awaitable `get_card_changes`"""
+        return await self._run_async(
+            self._get_card_changes,
+            deck_name=deck_name,
+            om_filter_code=om_filter_code,
+            since=since,
+            known_card_ids=known_card_ids,
+        )
+
+    def get_watermark(self) -> Watermark:
+        """Watermark covering every change from now on. Take it before getting cards,
+        to later pull changes with `get_card_changes`."""
+        return get_watermark()
+
+    def get_card_changes(
+        self,
+        deck_name: DeckName,
+        om_filter_code: OmDeckFilterCode,
+        since: Watermark,
+        known_card_ids: set[CardId],
+    ) -> CardChanges:
+        """Changes in the cards of `deck_name` matching `om_filter_code`
+
+        Only the new and modified cards are hydrated, so that the cost is
+        proportional to the changes, not to the deck size.
 
         Args:
-            om_username: name of the omakase user
+            since: watermark of the previous pull
+            known_card_ids: ids of the cards pulled so far
+
+        Raises:
+            NoSuchDeckException: if there is no such deck
+        """
+        return self._get_card_changes(
+            deck_name=deck_name,
+            om_filter_code=om_filter_code,
+            since=since,
+            known_card_ids=known_card_ids,
+            read_only=False,
+        )
+
+    def _get_card_changes(
+        self,
+        deck_name: DeckName,
+        om_filter_code: OmDeckFilterCode,
+        since: Watermark,
+        known_card_ids: set[CardId],
+        read_only: bool,
+    ) -> CardChanges:
+        """See `get_card_changes` and `_read`"""
+        deck_id = self._get_deck_id(deck_name=deck_name, read_only=read_only)
+        deck_filter = get_deck_filter(om_filter_code=om_filter_code)
+
+        def get_changes(reader: AnkiDbReader) -> CardChanges:
+            changes = reader.changes_since(since=since)
+            if deck_filter.sql_filter is not None:
+                card_ids = reader.find_card_ids_in_deck(
+                    deck_id=deck_id, sql_filter=deck_filter.sql_filter
+                )
+            else:  # read-write collection, see below
+                card_ids = reader.find_cards_in_deck(
+                    deck_id=deck_id, search=deck_filter.anki_search
+                )
+            current_card_ids = set(card_ids)
+            to_hydrate = (current_card_ids - known_card_ids) | (
+                current_card_ids & set(changes.card_ids)
+            )
+            records = reader.hydrate_cards(card_ids=list(to_hydrate))
+            return CardChanges(
+                upserted_cards=_store_from_records(records=records),
+                removed_card_ids=known_card_ids - current_card_ids,
+                decks_changed=len(changes.deck_ids) > 0,
+                watermark=changes.watermark,
+            )
+
+        if deck_filter.sql_filter is not None:
+            return self._read(get_changes, read_only=read_only)
+        if read_only:
+            raise _CollectionNeeded()
+        with ManipulateAnkiDb(db_path=self._db_path) as anki_db:
+            return get_changes(anki_db)
+
+    def save_note(self, card: ObservableCard) -> NoteSaveResult:
+        """Write the dirty fields of the note of `card` now (nothing if clean)
 
         Returns:
-            List of decks
+            Outcome of the save
         """
-        # TODO: implement
-        # BEGIN MOCK
-        if self._om_username == "X":
-            decks = ["deck1", "deck2"]
-        else:
-            decks = []
-        # END MOCK
-        return decks
+        future = self.queue_note_save(card=card)
+        get_note_save_queue(om_username=self._om_username).flush()
+        result = future.result()
+        logger.info(f"User {self._om_username} saved note {card.note_id}: {result}")
+        return result
 
-    def get_cards_from_deck(
-        self, deck_name: DeckName, om_filter_code: OmDeckFilterCode
-    ) -> list[ObservableCard]:
-        # TODO: implement card retrieval
-        # TODO: implement filter system (from the *om* filter, select the cards with the
-        # right *anki* filters)
-        # TODO: raise NoSuchDeckException if no1 such deck
-        # BEGIN MOCK
-        if deck_name == "deck1":
-            cards = [
-                ObservableCard(
-                    card_id=0,
-                    note_id=0,
-                    sort_field_value="card1",
-                    due_value=0,
-                    study_status=0,
-                    note_type="note type 1",
-                    note_fields={"c1f1": "c1fv1", "c1f2": "c1f2v2"},
-                ),
-                ObservableCard(
-                    card_id=2,
-                    note_id=1,
-                    sort_field_value="card2",
-                    study_status=1,
-                    due_value=0,
-                    note_type="note type 2",
-                    note_fields={"c2f1": "c2fv1", "c2f2": "c2f2v2"},
+    def queue_note_save(self, card: ObservableCard) -> "Future[NoteSaveResult]":
+        """Queue the write of the dirty fields of the note of `card`, to be batched
+        with other saves of the user (see `NoteSaveQueue`). Clean cards are skipped.
+
+        The saved fields are clean again once written. If the save fails, they stay
+        dirty, to be saved again. Fields edited in the meantime stay dirty too.
+
+        Returns:
+            Future resolved with the outcome of the save
+        """
+        updates = card.get_dirty_field_updates()
+        saved_values = {name: card.note_fields[name] for name in card.dirty_fields}
+
+        def mark_clean_if_saved(future: "Future[NoteSaveResult]") -> None:
+            if not future.cancelled() and future.exception() is None:
+                if future.result().ok:
+                    card.mark_clean(field_values=saved_values)
+
+        queue = get_note_save_queue(om_username=self._om_username)
+        future = queue.enqueue(note_id=card.note_id, updates=updates)
+        future.add_done_callback(mark_clean_if_saved)
+        return future
+
+    def get_note_save_counters(self) -> NoteSaveCounters:
+        """Number of written/skipped/failed note saves of the user"""
+        return get_note_save_queue(om_username=self._om_username).counters
+
+    def _get_deck_ids_by_name(self, read_only: bool) -> dict[DeckName, DeckId]:
+        """{deck name: deck id}, from the cache if up to date"""
+        self._sync_cache()
+        deck_ids_by_name = self._cache.deck_ids_by_name
+        if deck_ids_by_name is None:
+            decks, version = self._read(
+                lambda reader: (
+                    reader.list_decks(),
+                    _get_collection_version(db_path=self._db_path),
                 ),
-            ]
-            if om_filter_code == 1:
-                cards = [cards[0]]
-            elif om_filter_code == 2:
-                cards = [cards[1]]
-        else:
-            cards = []
-        # END MOCK
-        return cards
-
-    def save_note(self, note_id: int, note_fields: dict[NoteFieldName, NoteFieldValue]):
-        """Update a note with `note_field`"""
-        # TODO: implement all
-        # BEGIN MOCK
-        print(
-            f"Faking that we are saving {note_id=} with new values" f" {note_fields=}."
-        )
-        # END MOCK
+                read_only=read_only,
+            )
+            deck_ids_by_name = {name: deck_id for deck_id, name in decks.items()}
+            self._sync_cache()
+            with self._cache.lock:
+                if self._cache.collection_version == version:
+                    self._cache.deck_ids_by_name = deck_ids_by_name
+        return deck_ids_by_name
+
+    async def _run_async(self, func: Callable[..., T], **kwargs: Any) -> T:
+        """Await `func(read_only=..., **kwargs)`, a read of the collection
+
+        It first runs read-only on the shared reader threads. If it needs the
+        read-write collection, it runs again on the worker of the collection, as
+        Anki collections are not thread-safe (see `AsyncAnkiDb`).
+        """
+        try:
+            return await self._async_db.run_reader(func, read_only=True, **kwargs)
+        except _CollectionNeeded:
+            return await self._async_db.run_in_worker(func, read_only=False, **kwargs)
+
+    def _read(self, func: Callable[[AnkiDbReader], T], read_only: bool) -> T:
+        """Run `func` with a read-only connection to the collection, so that readers
+        wait neither for each other nor for the writer
+
+        Fall back to the (pooled) read-write collection if the read-only connection
+        cannot be opened.
+
+        Raises:
+            _CollectionNeeded: `read_only` is True, and the fallback is needed
+        """
+        reader = ReadOnlyAnkiDb(db_path=self._db_path)
+        try:
+            reader.open()
+        except sqlite3.OperationalError:
+            if read_only:
+                raise _CollectionNeeded()
+            logger.warning(
+                f"Cannot open {self._db_path} read-only, reading it read-write"
+            )
+            with ManipulateAnkiDb(db_path=self._db_path) as anki_db:
+                return func(anki_db)
+        try:
+            return func(reader)
+        finally:
+            reader.close()
+
+    def _get_deck_id(self, deck_name: DeckName, read_only: bool) -> DeckId:
+        """Raise NoSuchDeckException if no such deck"""
+        try:
+            return self._get_deck_ids_by_name(read_only=read_only)[deck_name]
+        except KeyError:
+            raise NoSuchDeckException(
+                f"User {self._om_username} has no deck named {deck_name}"
+            )
+
+    def _sync_cache(self) -> None:
+        """Drop the cache if the collection changed since it was filled"""
+        version = _get_collection_version(db_path=self._db_path)
+        with self._cache.lock:
+            if self._cache.collection_version != version:
+                self._cache.collection_version = version
+                self._cache.deck_ids_by_name = None
+                self._cache.stores_by_deck_filter = {}
+
+    def _store_in_cache(
+        self,
+        version: tuple,
+        key: _DeckFilterKey,
+        store: CardStore,
+    ) -> None:
+        """Cache `store`, unless the collection changed in the meantime"""
+        self._sync_cache()
+        with self._cache.lock:
+            if self._cache.collection_version == version:
+                self._cache.stores_by_deck_filter[key] = store
 
 
 @dataclass
 class DeckFilter:
-    """Define a filter for a deck"""
+    """Define a filter for a deck
+
+    `anki_search` is the equivalent Anki search expression (empty for no filter).
+    `sql_filter` is the equivalent condition on the cards table (aliased `c`), to
+    browse through a read-only connection; None if it cannot be expressed in SQL alone.
+    """
 
     code: OmDeckFilterCode
     ui_label: str
+    anki_search: AnkiSearch
+    sql_filter: Optional[str]
 
 
 class DeckFilters:
     """List of available deck filters, provided as attributes"""
 
     def __init__(self):
-        self.all_notes = DeckFilter(code=0, ui_label="All cards")
-        self.new_notes = DeckFilter(code=1, ui_label="New")
-        self.in_learning_notes = DeckFilter(code=2, ui_label="In learning")
+        self.all_notes = DeckFilter(
+            code=0, ui_label="All cards", anki_search="", sql_filter=""
+        )
+        self.new_notes = DeckFilter(
+            code=1, ui_label="New", anki_search="is:new", sql_filter="c.type = 0"
+        )
+        self.in_learning_notes = DeckFilter(
+            code=2,
+            ui_label="In learning",
+            anki_search="is:learn",
+            sql_filter="c.type in (1, 3)",
+        )
+        self.in_review_notes = DeckFilter(
+            code=3,
+            ui_label="In review",
+            anki_search="is:review",
+            sql_filter="c.type in (2, 3)",
+        )
+        # Depends on the scheduler's current day
+        self.due_notes = DeckFilter(
+            code=4, ui_label="Due", anki_search="is:due", sql_filter=None
+        )
 
 
 filter_label_obj_corr: dict[str, DeckFilter] = {
     v.ui_label: v for v in vars(DeckFilters()).values()
 }
 """Dict of all  {DeckFilter.ui_label: DeckFilter}"""
+
+_filter_code_obj_corr: dict[OmDeckFilterCode, DeckFilter] = {
+    v.code: v for v in vars(DeckFilters()).values()
+}
+
+
+def get_deck_filter(om_filter_code: OmDeckFilterCode) -> DeckFilter:
+    """DeckFilter corresponding to `om_filter_code`"""
+    return _filter_code_obj_corr[om_filter_code]
@@ -0,0 +1,215 @@
+"""
+Generation of mnemonics by a LLM
+
+A `MnemonicGenerator` renders the prompt of a `PromptFieldsData`, sends it to a
+generation backend, and writes the output into the note field associated to the
+generation output (see `MnemonicNoteFieldMapData`).
+
+The backend is configured in conf/generation.toml:
+- "http": a chat completions API, called through a pool of connections shared by all
+  users, with timeouts.
+- "none" (default): generation is not configured, and fails with a `GenerationError`.
+`FakeGenerationBackend`, a local stub, is to be passed explicitly (tests, offline use).
+"""
+import asyncio
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import httpx
+
+from omakase.backend.decks import ObservableCard
+from omakase.backend.mnemonics.base import MnemonicNoteFieldMapData, PromptFieldsData
+from omakase.io import get_generation_backend_name, get_generation_http_conf
+from omakase.om_logging import logger
+
+
+class GenerationError(Exception):
+    """A mnemonic could not be generated"""
+
+    pass
+
+
+# ========
+# Backends
+# ========
+class GenerationBackend(ABC):
+    """Turns a prompt into a generated text"""
+
+    @abstractmethod
+    async def generate(self, prompt: str) -> str:
+        """Generated text for `prompt`
+
+        Raises:
+            GenerationError: the generation failed
+        """
+        pass
+
+    async def aclose(self) -> None:
+        """Release the resources of the backend"""
+        pass
+
+
+class HttpGenerationBackend(GenerationBackend):
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        api_key: Optional[str] = None,
+        timeout: float = 60.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 10,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        """Backend calling a chat completions API ({base_url}/chat/completions)
+
+        Args:
+            base_url: root of the API
+            model: name of the model to query
+            api_key: sent as a bearer token, if any
+            timeout: seconds to receive the whole answer
+            connect_timeout: seconds to connect to the server
+            max_connections: size of the connection pool
+            transport: httpx transport (e.g., `httpx.MockTransport` in tests)
+        """
+        self._model = model
+        headers = {} if api_key is None else {"Authorization": f"Bearer {api_key}"}
+        # Pooled connections are reused across generations
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            transport=transport,
+        )
+
+    async def generate(self, prompt: str) -> str:
+        payload = {
+            "model": self._model,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        try:
+            response = await self._client.post("/chat/completions", json=payload)
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"]
+        except httpx.HTTPError as e:
+            raise GenerationError(f"The generation request failed: {e!r}") from e
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise GenerationError(f"Unexpected answer to generation: {e!r}") from e
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class FakeGenerationBackend(GenerationBackend):
+    def __init__(self, delay: float = 0.0) -> None:
+        """Local stub, answering a deterministic text
+
+        Args:
+            delay: seconds to wait before answering, to mimic a remote backend
+        """
+        self._delay = delay
+        self.prompts: list[str] = []  # received prompts, in order
+
+    async def generate(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        if self._delay > 0:
+            await asyncio.sleep(self._delay)
+        return f"Fake mnemonic #{len(self.prompts)} ({len(prompt)} prompt characters)"
+
+
+# =========
+# Generator
+# =========
+class MnemonicGenerator:
+    def __init__(self, backend: GenerationBackend) -> None:
+        """Generate mnemonics into note fields
+
+        Args:
+            backend: generates text from the rendered prompts
+        """
+        self._backend = backend
+
+    async def generate(
+        self,
+        prompt_fields_data: PromptFieldsData,
+        card: ObservableCard,
+        mnem_note_field_map: MnemonicNoteFieldMapData,
+    ) -> str:
+        """Generate a mnemonic, and write it into the note field of `card` associated
+        to the generation output
+
+        The card is then dirty, and saved as any other edit of the note fields.
+
+        Returns:
+            The generated mnemonic
+
+        Raises:
+            GenerationError: no note field is associated to the generation output, or
+                the backend failed
+            EmptyFieldError: the prompt fields are partly filled in
+        """
+        if not mnem_note_field_map.genout_is_associated_to_note_field():
+            raise GenerationError(
+                "No note field is associated to the generation output"
+            )
+        note_field_name = mnem_note_field_map.point_to_genout_note_field_dp().value
+        prompt = prompt_fields_data.get_prompt()
+        output = await self._backend.generate(prompt=prompt)
+        card.note_fields[note_field_name] = output
+        logger.info(f"Generated a mnemonic into {note_field_name} of {card.note_id}")
+        return output
+
+
+# ===========
+# Entry point
+# ===========
+_BACKEND: Optional[GenerationBackend] = None
+_BACKEND_LOCK = threading.Lock()
+
+
+def get_generation_backend() -> GenerationBackend:
+    """Process-wide generation backend, as configured in conf/generation.toml
+
+    Raises:
+        GenerationError: no backend is configured, or the configured one is unknown
+    """
+    global _BACKEND
+    with _BACKEND_LOCK:
+        if _BACKEND is None:
+            _BACKEND = _create_backend(backend=get_generation_backend_name())
+        return _BACKEND
+
+
+async def close_generation_backend() -> None:
+    """Close the process-wide generation backend, if any (e.g., upon shutdown)"""
+    global _BACKEND
+    with _BACKEND_LOCK:
+        backend, _BACKEND = _BACKEND, None
+    if backend is not None:
+        await backend.aclose()
+
+
+def _create_backend(backend: str) -> GenerationBackend:
+    if backend == "none":
+        raise GenerationError(
+            "Mnemonic generation is not configured: set the backend in"
+            " conf/generation.toml"
+        )
+    if backend == "http":
+        conf = get_generation_http_conf()
+        return HttpGenerationBackend(
+            base_url=conf["base_url"],
+            model=conf["model"],
+            api_key=os.environ.get(conf["api_key_env"]),
+            timeout=conf["timeout"],
+            connect_timeout=conf["connect_timeout"],
+            max_connections=conf["max_connections"],
+        )
+    raise GenerationError(
+        f"Unknown generation backend in conf/generation.toml: {backend!r}"
+    )
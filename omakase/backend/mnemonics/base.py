@@ -1,4 +1,5 @@
 import asyncio
+import functools
 from abc import ABC, abstractmethod
 from copy import deepcopy
 from dataclasses import dataclass, fields
@@ -18,6 +19,7 @@ from omakase.backend.om_user import (
     MNEM_NOTE_ASSOCS_KEY,
     PROMPT_NOTE_ASSOCS_KEY,
     CachedUserDataPoint,
+    UserDataPoints,
     point_to_om_user_subcache,
 )
 from omakase.io import get_jinja_template
@@ -44,6 +46,9 @@ Developer note:
 * PromptField, PromptRow, PromptSection, PromptFieldData form a matryoshka.
 * Instantiation a PromptFieldData will instantiate all the inner dolls. The
 PromptFieldData `notify` is shared to the inner dolls.
+* The structure of a PromptFieldData subclass (names, repeats, explanations) does not
+depend on the values. It is computed once per subclass, as an immutable PromptSchema
+(see `PromptFieldsData.get_schema`). Instantiate only to edit values.
 """
 SectionPromptName = Annotated[str, "prompt_name of a PromptSection"]
 FieldPromptName = Annotated[str, "prompt_name of a PromptField"]
@@ -246,8 +251,8 @@ class PromptFieldsData(ABC, Observable):
                 "Some section in `self.field_section_classes` share the same"
                 " prompt_name"
             )
-        # Load the template
-        self._template = self._load_template()
+        # The template is loaded upon first rendering
+        self._template: Optional[Template] = None
         # Propagate the notify method
         for section in self.value.values():
             section.notify = self.notify
@@ -288,15 +293,16 @@ class PromptFieldsData(ABC, Observable):
     @property
     def full_mnem_explanation(self) -> str:
         """Full explanation of the prompt parameters"""
-        full_expl = ""
-        # Add name
-        full_expl += f"### {self.ui_name}"
-        # Add the header of section expl
-        full_expl += f"\n{self._mnem_explanation_header}"
-        # Add section expalantions
-        for section in self.value.values():
-            full_expl += f"\n{section.full_ui_explanation}"
-        return full_expl
+        return self.get_schema().full_mnem_explanation
+
+    @classmethod
+    def get_schema(cls) -> "PromptSchema":
+        """Structure of the prompt, computed once per subclass
+
+        Use it rather than an instance to answer structural questions (section names,
+        explanations...)
+        """
+        return _build_prompt_schema(prompt_fields_data_class=cls)
 
     def to_dict(
         self,
@@ -345,6 +351,8 @@ class PromptFieldsData(ABC, Observable):
         prompt_args = self.to_dict(
             drop_empty_rows=True, raise_when_empty_value_remains=True
         )
+        if self._template is None:
+            self._template = self._load_template()
         prompt = self._template.render(**prompt_args)
         return prompt
 
@@ -352,19 +360,103 @@ class PromptFieldsData(ABC, Observable):
         """Get name of section containing only 1 row, and that row contain
         1 parameter only.
         """
-        out_sect_names = []
-        # Get structure of prompt parameters as dict
-        data_dict = self.to_dict(
-            drop_empty_rows=False, raise_when_empty_value_remains=False
+        return list(self.get_schema().one_d_section_names)
+
+
+# ======
+# Schema
+# ======
+@dataclass(frozen=True)
+class PromptFieldSchema:
+    """Structure of a PromptField"""
+
+    prompt_name: FieldPromptName
+    ui_name: str
+    ui_explanation: str
+    ui_placeholder: str
+
+
+@dataclass(frozen=True)
+class PromptSectionSchema:
+    """Structure of a PromptSection"""
+
+    prompt_name: SectionPromptName
+    ui_name: str
+    n_repeat: int
+    fields: tuple[PromptFieldSchema, ...]
+    full_ui_explanation: str
+
+    @property
+    def field_names(self) -> tuple[FieldPromptName, ...]:
+        """prompt_name of the fields of a row"""
+        return tuple(field.prompt_name for field in self.fields)
+
+    @property
+    def is_1d(self) -> bool:
+        """Whether the section has only 1 row, of 1 field only"""
+        return self.n_repeat == 1 and len(self.fields) == 1
+
+
+@dataclass(frozen=True)
+class PromptSchema:
+    """Structure of a PromptFieldsData subclass, independent of the values"""
+
+    ui_name: str
+    template_name: str
+    template_version: int
+    sections: tuple[PromptSectionSchema, ...]
+    one_d_section_names: tuple[SectionPromptName, ...]
+    full_mnem_explanation: str
+
+    def get_section(self, prompt_name: SectionPromptName) -> PromptSectionSchema:
+        """Section schema from its prompt_name
+
+        Raises:
+            KeyError: no section has that prompt_name
+        """
+        for section in self.sections:
+            if section.prompt_name == prompt_name:
+                return section
+        raise KeyError(prompt_name)
+
+
+@functools.cache
+def _build_prompt_schema(
+    prompt_fields_data_class: Type[PromptFieldsData],
+) -> PromptSchema:
+    """Compute the schema from a prototype instance (the template is not loaded)"""
+    prototype = prompt_fields_data_class()
+    sections = tuple(
+        PromptSectionSchema(
+            prompt_name=section.prompt_name,
+            ui_name=section.ui_name,
+            n_repeat=section.n_repeat,
+            fields=tuple(
+                PromptFieldSchema(
+                    prompt_name=field.prompt_name,
+                    ui_name=field.ui_name,
+                    ui_explanation=field.ui_explanation,
+                    ui_placeholder=field.ui_placeholder,
+                )
+                for field in section.value[0].value.values()
+            ),
+            full_ui_explanation=section.full_ui_explanation,
         )
-        for sect_name, sect_list in data_dict.items():
-            # Only one row in section?
-            if len(sect_list) == 1:
-                # Only 1 field in row?
-                row = sect_list[0]
-                if len(row) == 1:
-                    out_sect_names.append(sect_name)
-        return out_sect_names
+        for section in prototype.value.values()
+    )
+    # Full explanation: name, header, then the sections
+    full_expl = f"### {prototype.ui_name}"
+    full_expl += f"\n{prototype._mnem_explanation_header}"
+    for section in sections:
+        full_expl += f"\n{section.full_ui_explanation}"
+    return PromptSchema(
+        ui_name=prototype.ui_name,
+        template_name=prototype.template_name,
+        template_version=prototype.template_version,
+        sections=sections,
+        one_d_section_names=tuple(s.prompt_name for s in sections if s.is_1d),
+        full_mnem_explanation=full_expl,
+    )
 
 
 # ==============
@@ -571,6 +663,9 @@ class MnemonicNoteFieldMapData(Observable):
         self._om_username = om_username
         self._note_field_names = note_field_names
         self._prompt_params_class = prompt_params_class
+        self._data_points = UserDataPoints(
+            om_username=om_username, on_change=self.notify
+        )
         # Pointer
         self._assocs_root_keys = [  # Root keys to all associations
             MNEM_NOTE_ASSOCS_KEY,
@@ -589,27 +684,21 @@ class MnemonicNoteFieldMapData(Observable):
 
     def point_to_genout_note_field_dp(self) -> CachedUserDataPoint:
         # TODO docstr
-        dp = CachedUserDataPoint(
-            om_username=self._om_username,
+        return self._data_points.get(
             root_keys=self._assocs_root_keys,
             subject_key=GENOUT_NOTE_ASSOCS_KEY,
             default_value=None,
-            on_change=self.notify,
         )
-        return dp
 
     def point_to_prompt_note_assoc_dp(
         self, section_prompt_name: str
     ) -> CachedUserDataPoint:
         # TODO docstr
-        dp = CachedUserDataPoint(
-            om_username=self._om_username,
+        return self._data_points.get(
             root_keys=self._assocs_root_keys + [PROMPT_NOTE_ASSOCS_KEY],
             subject_key=section_prompt_name,
             default_value=None,
-            on_change=self.notify,
         )
-        return dp
 
     def _point_to_prompt_note_assocs(
         self,
@@ -624,8 +713,8 @@ class MnemonicNoteFieldMapData(Observable):
         note type. Check that all the prompt parameter names are accounted for --
         and only them."""
         # Get names of **string** prompt params
-        prompt_data_instance = self._prompt_params_class()
-        str_prompt_param_names = prompt_data_instance.get_1d_prompt_section_names()
+        schema = self._prompt_params_class.get_schema()
+        str_prompt_param_names = schema.one_d_section_names
         # check for existing prompt param names that exist in user data but shouldn't
         keys_to_del = []
         for prompt_param in self._prompt_note_assocs.keys():
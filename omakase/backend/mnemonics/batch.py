@@ -0,0 +1,138 @@
+"""
+Batch rendering of prompts, e.g., for all the cards of a deck
+
+The field values come as a table with one row per prompt, and one column per field of
+each row of each section, named '{section}.{row index}.{field}' (see `get_column_name`).
+Missing columns and missing values (None, NaN) count as empty fields.
+"""
+from dataclasses import dataclass
+from typing import Hashable, Iterator, Optional, Type, Union
+
+import numpy as np
+import pandas as pd
+
+from omakase.backend.mnemonics.base import (
+    EmptyFieldError,
+    FieldPromptName,
+    PromptFieldsData,
+    PromptSchema,
+    SectionPromptName,
+)
+from omakase.io import get_jinja_template
+
+COLUMN_SEP = "."
+
+
+@dataclass(frozen=True)
+class RenderedPrompt:
+    """Outcome of the rendering of one row of the table"""
+
+    row_label: Hashable
+    prompt: Optional[str] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def get_column_name(
+    section_prompt_name: SectionPromptName,
+    row_idx: int,
+    field_prompt_name: FieldPromptName,
+) -> str:
+    """Name of the table column holding a field of a row of a section"""
+    return COLUMN_SEP.join([section_prompt_name, str(row_idx), field_prompt_name])
+
+
+def get_column_names(schema: PromptSchema) -> list[str]:
+    """Names of all the table columns for a prompt schema"""
+    return [
+        get_column_name(
+            section_prompt_name=section.prompt_name,
+            row_idx=row_idx,
+            field_prompt_name=field_name,
+        )
+        for section in schema.sections
+        for row_idx in range(section.n_repeat)
+        for field_name in section.field_names
+    ]
+
+
+def render_prompts(
+    prompt_fields_data_class: Type[PromptFieldsData],
+    table: Union[pd.DataFrame, list[dict[str, str]]],
+) -> Iterator[RenderedPrompt]:
+    """Render one prompt per row of `table`, lazily
+
+    As `PromptFieldsData.to_dict`, fully empty rows of a section are dropped, and
+    partly empty ones are an error. Sections of a single row are required, as the
+    templates refer to that row: leaving them empty is an error too. Errors are
+    reported per row rather than raised.
+
+    Args:
+        prompt_fields_data_class: type of prompt to render
+        table: field values, with a column per field (see `get_column_name`). Other
+            columns are ignored.
+
+    Returns:
+        one RenderedPrompt per row of `table`, in order. Its `row_label` is the index
+        label (DataFrame) or the position (list of dicts).
+    """
+    schema = prompt_fields_data_class.get_schema()
+    template = get_jinja_template(
+        template_name=schema.template_name, version=schema.template_version
+    )
+    # Normalize the table: schema columns only, empty strings for missing values
+    frame = pd.DataFrame(table) if not isinstance(table, pd.DataFrame) else table
+    columns = get_column_names(schema=schema)
+    frame = frame.reindex(columns=columns).fillna("").astype(str)
+    values = frame.to_numpy()
+    is_empty = values == ""
+    # Validate all the table rows at once, per row of section
+    n_table_rows = len(frame)
+    error_msgs = np.full(n_table_rows, None, dtype=object)
+    # (section name, field names, column positions, is the row of section empty)
+    section_rows: list[tuple[str, tuple[str, ...], list[int], np.ndarray]] = []
+    col_pos = 0
+    for section in schema.sections:
+        n_fields = len(section.fields)
+        for _ in range(section.n_repeat):
+            positions = list(range(col_pos, col_pos + n_fields))
+            col_pos += n_fields
+            all_empty = is_empty[:, positions].all(axis=1)
+            partly_empty = is_empty[:, positions].any(axis=1) & ~all_empty
+            # Keep the first error of each table row
+            error_msgs[partly_empty & (error_msgs == None)] = (  # noqa: E711
+                f"A field in section '{section.prompt_name}' was left empty while"
+                " other in the same row are not."
+            )
+            section_rows.append(
+                (section.prompt_name, section.field_names, positions, all_empty)
+            )
+        if section.n_repeat == 1:
+            # Required section: the templates refer to its row
+            error_msgs[all_empty & (error_msgs == None)] = (  # noqa: E711
+                f"The section '{section.prompt_name}' was left empty, while it is"
+                " required."
+            )
+    # Render
+    section_names = [section.prompt_name for section in schema.sections]
+    for pos, row_label in enumerate(frame.index):
+        if error_msgs[pos] is not None:
+            yield RenderedPrompt(
+                row_label=row_label, error=EmptyFieldError(error_msgs[pos])
+            )
+            continue
+        prompt_args: dict[str, list[dict[str, str]]] = {n: [] for n in section_names}
+        for section_name, field_names, positions, all_empty in section_rows:
+            if not all_empty[pos]:
+                prompt_args[section_name].append(
+                    dict(zip(field_names, values[pos, positions]))
+                )
+        try:
+            prompt = template.render(**prompt_args)
+        except Exception as e:
+            yield RenderedPrompt(row_label=row_label, error=e)
+        else:
+            yield RenderedPrompt(row_label=row_label, prompt=prompt)
@@ -0,0 +1,358 @@
+"""
+Write-behind queue of note saves
+
+Saving a note from the UI should neither block the event loop nor open a transaction
+per click. Saves are queued per omakase user, coalesced per note, and written in
+batches (see `ManipulateAnkiDb.update_fields_bulk`) on the worker of the collection,
+as any other collection operation (see `AsyncAnkiDb`): flushes never overlap. Each
+save gets a future resolved with the outcome for its note.
+
+Pending saves are appended to an on-disk journal (JSON lines) before `enqueue`
+returns, and replayed when the queue is created again, e.g. after a restart, unless
+their note was modified after they were journaled. Journal writes run on a dedicated
+thread, in the order of the changes they record, and are waited for without holding
+the lock of the queue.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from omakase.ankiapi.server.ankidb import ManipulateAnkiDb
+from omakase.ankiapi.server.async_ankidb import AsyncAnkiDb
+from omakase.ankiapi.server.collection_pool import get_collection_pool
+from omakase.annotations import NoteFieldIdx, NoteFieldValue, NoteId
+from omakase.io import get_collection_path, get_note_save_journal_path
+from omakase.om_logging import logger
+
+# Default delay (seconds) between a first pending save and the flush, during which
+# further saves are batched with it
+DEFAULT_FLUSH_DELAY = 0.5
+
+
+@dataclass
+class NoteSaveResult:
+    """Outcome of a queued note save
+
+    Attributes:
+        error: None if the save succeeded, otherwise what prevented it
+        skipped: True if nothing had to be written (no changed field)
+    """
+
+    note_id: NoteId
+    error: Optional[str] = None
+    skipped: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class NoteSaveCounters:
+    """Number of saves, by outcome, since the queue was created"""
+
+    written: int = 0
+    skipped: int = 0
+    failed: int = 0
+
+
+class NoteSaveQueue:
+    def __init__(
+        self,
+        db_path: str,
+        journal_path: str,
+        flush_delay: float = DEFAULT_FLUSH_DELAY,
+    ) -> None:
+        """Write-behind queue of note field updates for one collection
+
+        Saves of the same note are coalesced (later values win, field by field) until
+        the next flush. Flushes happen at most `flush_delay` seconds after the first
+        pending save, and run on the worker of the collection.
+
+        Args:
+            db_path: path to the Anki collection
+            journal_path: path to the journal of pending saves. Saves found there are
+                replayed.
+            flush_delay: seconds to wait for more saves before flushing
+        """
+        self._db_path = db_path
+        self._async_db = AsyncAnkiDb(db_path=db_path)
+        self._journal_path = journal_path
+        self._flush_delay = flush_delay
+        self._lock = threading.Lock()
+        self._pending: dict[NoteId, dict[NoteFieldIdx, NoteFieldValue]] = {}
+        self._futures: dict[NoteId, list[Future]] = {}
+        # Time (epoch seconds) of the last journaled save of each pending note
+        self._journaled_at: dict[NoteId, float] = {}
+        self._flush_scheduled = False
+        self.counters = NoteSaveCounters()
+        self._closing = threading.Event()
+        # Waits for the flush delays
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="note-saves"
+        )
+        # Appends and rewrites of the journal, in the order they were submitted
+        # (with the lock held, hence in the order of the changes of `_pending`)
+        self._journal_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="note-saves-journal"
+        )
+        self._replay_journal()
+
+    @property
+    def pending_note_ids(self) -> list[NoteId]:
+        with self._lock:
+            return list(self._pending.keys())
+
+    def enqueue(
+        self, note_id: NoteId, updates: dict[NoteFieldIdx, NoteFieldValue]
+    ) -> "Future[NoteSaveResult]":
+        """Queue an update of the fields of a note
+
+        Args:
+            updates: {field index: new value}. If empty, the save is skipped.
+
+        Returns:
+            Future resolved with the outcome once the note is flushed (use
+            `asyncio.wrap_future` to await it from the event loop). The save is in
+            the journal already.
+        """
+        future: Future[NoteSaveResult] = Future()
+        if not updates:
+            with self._lock:
+                self.counters.skipped += 1
+            future.set_result(NoteSaveResult(note_id=note_id, skipped=True))
+            return future
+        journaled_at = time.time()
+        with self._lock:
+            journaled = self._journal_executor.submit(
+                self._append_to_journal,
+                note_id=note_id,
+                updates=updates,
+                journaled_at=journaled_at,
+            )
+            self._pending.setdefault(note_id, {}).update(updates)
+            self._futures.setdefault(note_id, []).append(future)
+            self._journaled_at[note_id] = journaled_at
+            self._schedule_flush()
+        # Durable from then on
+        try:
+            journaled.result()
+        except OSError:
+            logger.exception(f"Could not journal a save of note {note_id}")
+        return future
+
+    def flush(self) -> list[NoteSaveResult]:
+        """Write all pending saves now, and resolve their futures
+
+        The write runs on the worker of the collection (not to be called from it), so
+        that flushes run one at a time, in order.
+
+        Returns:
+            The outcome for each flushed note
+        """
+        return self._async_db.submit(self._flush).result()
+
+    def _flush(self) -> list[NoteSaveResult]:
+        """See `flush`. Runs on the worker of the collection."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            futures, self._futures = self._futures, {}
+            for note_id in pending:
+                self._journaled_at.pop(note_id, None)
+        if not pending:
+            return []
+        try:
+            with ManipulateAnkiDb(db_path=self._db_path) as anki_db:
+                report = anki_db.update_fields_bulk(updates=pending)
+            errors = report.errors
+            unchanged_note_ids = set(report.unchanged_note_ids)
+        except Exception as e:
+            logger.exception(f"Could not flush note saves to {self._db_path}")
+            errors = {note_id: f"{e.__class__.__name__}: {e}" for note_id in pending}
+            unchanged_note_ids = set()
+        results = [
+            NoteSaveResult(
+                note_id=note_id,
+                error=errors.get(note_id),
+                skipped=note_id in unchanged_note_ids,
+            )
+            for note_id in pending
+        ]
+        with self._lock:
+            # Only keep saves queued during the flush
+            self._journal_executor.submit(
+                self._rewrite_journal,
+                pending=dict(self._pending),
+                journaled_at=dict(self._journaled_at),
+            )
+            for result in results:
+                n_saves = len(futures.get(result.note_id, []))
+                if not result.ok:
+                    self.counters.failed += n_saves
+                elif result.skipped:
+                    self.counters.skipped += n_saves
+                else:
+                    self.counters.written += n_saves
+        for result in results:
+            for future in futures.get(result.note_id, []):
+                future.set_result(result)
+        logger.info(
+            f"Flushed {len(pending)} note saves to {self._db_path}"
+            f" ({len(errors)} errors)"
+        )
+        return results
+
+    def wait_for_journal(self) -> None:
+        """Wait until the journal reflects the saves queued so far"""
+        self._journal_executor.submit(lambda: None).result()
+
+    def close(self) -> None:
+        """Flush pending saves and stop the background workers"""
+        self._closing.set()
+        self._executor.shutdown(wait=True)
+        self.flush()
+        self._journal_executor.shutdown(wait=True)
+
+    def _schedule_flush(self) -> None:
+        """Schedule a flush on the worker, unless one is already scheduled. To be
+        called with the lock held."""
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._executor.submit(self._flush_after_delay)
+
+    def _flush_after_delay(self) -> None:
+        # Cut short when closing
+        self._closing.wait(timeout=self._flush_delay)
+        with self._lock:
+            self._flush_scheduled = False
+        self.flush()
+
+    def _append_to_journal(
+        self,
+        note_id: NoteId,
+        updates: dict[NoteFieldIdx, NoteFieldValue],
+        journaled_at: float,
+    ) -> None:
+        """Runs on the journal thread"""
+        os.makedirs(os.path.dirname(self._journal_path), exist_ok=True)
+        with open(self._journal_path, "a", encoding="utf-8") as f:
+            f.write(
+                _to_journal_line(
+                    note_id=note_id, updates=updates, journaled_at=journaled_at
+                )
+            )
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite_journal(
+        self,
+        pending: dict[NoteId, dict[NoteFieldIdx, NoteFieldValue]],
+        journaled_at: dict[NoteId, float],
+    ) -> None:
+        """Journal holding only the `pending` saves (atomically replaced). Runs on the
+        journal thread."""
+        if not pending:
+            if os.path.exists(self._journal_path):
+                os.remove(self._journal_path)
+            return
+        tmp_path = self._journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for note_id, updates in pending.items():
+                f.write(
+                    _to_journal_line(
+                        note_id=note_id,
+                        updates=updates,
+                        journaled_at=journaled_at.get(note_id, time.time()),
+                    )
+                )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._journal_path)
+
+    def _replay_journal(self) -> None:
+        """Queue the saves left in the journal by a previous run, except those of
+        notes modified since they were journaled (e.g., edited in Anki)"""
+        if not os.path.exists(self._journal_path):
+            return
+        with open(self._journal_path, encoding="utf-8") as f:
+            lines = f.readlines()
+        entries = []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:  # e.g., interrupted while writing
+                logger.warning(f"Skipping corrupt line in {self._journal_path}")
+                continue
+            entries.append(entry)
+        if not entries:
+            return
+        note_ids = list({entry["note_id"] for entry in entries})
+        try:
+            mods = self._async_db.submit(self._get_note_mods, note_ids=note_ids)
+            mods = mods.result()
+        except Exception:
+            logger.exception(f"Cannot check the notes of {self._journal_path}")
+            mods = {}
+        with self._lock:
+            for entry in entries:
+                note_id = entry["note_id"]
+                # Entries of older journals have no time: replayed
+                journaled_at = entry.get("journaled_at", time.time())
+                if mods.get(note_id, 0) > journaled_at:
+                    logger.warning(
+                        f"Not replaying a save of note {note_id}, modified since"
+                    )
+                    continue
+                updates = {int(idx): value for idx, value in entry["updates"].items()}
+                self._pending.setdefault(note_id, {}).update(updates)
+                self._journaled_at[note_id] = max(
+                    journaled_at, self._journaled_at.get(note_id, 0.0)
+                )
+            if self._pending:
+                logger.info(
+                    f"Replaying {len(self._pending)} note saves from"
+                    f" {self._journal_path}"
+                )
+                self._schedule_flush()
+
+    def _get_note_mods(self, note_ids: list[NoteId]) -> dict[NoteId, int]:
+        """Runs on the worker of the collection"""
+        with ManipulateAnkiDb(db_path=self._db_path) as anki_db:
+            return anki_db.get_note_mods(note_ids=note_ids)
+
+
+def _to_journal_line(
+    note_id: NoteId, updates: dict[NoteFieldIdx, NoteFieldValue], journaled_at: float
+) -> str:
+    entry = {"note_id": note_id, "updates": updates, "journaled_at": journaled_at}
+    return json.dumps(entry) + "\n"
+
+
+_QUEUES: dict[str, NoteSaveQueue] = {}
+"""{om username: note save queue}"""
+_QUEUES_LOCK = threading.Lock()
+
+
+def get_note_save_queue(om_username: str) -> NoteSaveQueue:
+    """Process-wide note save queue of `om_username`"""
+    with _QUEUES_LOCK:
+        if om_username not in _QUEUES:
+            _QUEUES[om_username] = NoteSaveQueue(
+                db_path=get_collection_path(om_username=om_username),
+                journal_path=get_note_save_journal_path(om_username=om_username),
+            )
+        return _QUEUES[om_username]
+
+
+@atexit.register
+def _close_queues() -> None:
+    with _QUEUES_LOCK:
+        for queue in _QUEUES.values():
+            queue.close()
+    # The pool may have been closed already, and reopened by the flushes above
+    get_collection_pool().close_all()
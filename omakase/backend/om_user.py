@@ -5,14 +5,12 @@ All data are considered persisted.
 """
 from typing import Any, Callable, Optional
 
-from nicegui import app
-
 from omakase.annotations import DeckName
 from omakase.backend.decks import DeckFilters
-from omakase.observer_logic import Observable
+from omakase.backend.om_user_storage import get_om_user_storage
+from omakase.observer_logic import Change, Observable
 
 # Keys of the omakase user storage
-USER_CACHES_KEY = "user_caches"
 LAST_SELECTED_DECK_KEY = "last_selected_deck"
 DECK_UI_FILTER_CORR_KEY = "deck_filter_correspondance"
 MNEM_NOTE_ASSOCS_KEY = "mnemn_note_assocs"
@@ -23,29 +21,17 @@ GENOUT_NOTE_ASSOCS_KEY = "genout_note_assocs"
 # =========================
 # Storage-specific function
 # =========================
-def _point_to_om_user_caches() -> dict:
-    if USER_CACHES_KEY not in app.storage.general:
-        app.storage.general[USER_CACHES_KEY] = dict()
-    return app.storage.general[USER_CACHES_KEY]
-
-
 def point_to_om_user_cache(om_username: str) -> dict:
     """
     Point to the in-memory data dict for the omakase user
 
-    Can be changed to handle data differently (i.e., use redis.)
-    The function must point to collection. It is possible to supercharge a collection
-    (i.e., dict) to write asynchronously to a database (i.e., redis) at every write.
-    This is what NiceGUI does behind the scene (writes to json at every change; the data
-    are, of course, persisted in memory.)
+    The dict is handed out by the configured storage backend (see
+    `omakase.backend.om_user_storage`), which persists every change made to it,
+    including nested ones.
     """
-    user_caches = _point_to_om_user_caches()
-    if om_username not in user_caches:
-        user_caches[om_username] = dict()
-    return user_caches[om_username]
+    return get_om_user_storage().point_to_user_cache(om_username=om_username)
 
 
-# TODO: test
 def point_to_om_user_subcache(om_username: str, keys: list[str]) -> dict:
     """
     Point to a subdict of the omakase user data
@@ -72,12 +58,18 @@ def point_to_om_user_subcache(om_username: str, keys: list[str]) -> dict:
 # Cached datapoint
 # ================
 class CachedUserDataPoint:
-    """User-related data point, synced with app.storage.general
+    """User-related data point, synced with the omakase user storage
 
     Data is accessible and editable through the `value` attribute.
     This construct simplifies the use of nicegui's `bind_*` methods.
 
-    `on_change` defines a function to call upon changes.
+    `on_change` defines a function to call upon changes, with the `Change` as keyword
+    argument `change` (e.g., `Observable.notify`).
+
+    The dict holding the data point is resolved once, then reused as long as it is
+    still the one found at `root_keys` in the user cache (a few identity checks).
+    It is resolved again if it was replaced, e.g. by assigning a new dict to one of
+    the root keys.
     """
 
     def __init__(
@@ -90,41 +82,100 @@ class CachedUserDataPoint:
     ) -> None:
         # Initialization
         self._default_value = default_value
+        self._root_keys = list(root_keys)
         self._subject_key = subject_key
         self._on_change = on_change
         # Pointer to user cache
         self._user_cache = point_to_om_user_cache(om_username=om_username)
         # Get root dict
-        self._root_dict = self._resolve_root_dict(root_keys=root_keys)
+        self._root_dict = self._resolve_root_dict()
         # Sanitization
         self._handle_missing_subject_key()
 
     @property
     def value(self) -> Any:
-        return self._root_dict[self._subject_key]
+        root_dict = self._point_to_root_dict()
+        if self._subject_key not in root_dict:
+            self._handle_missing_subject_key()
+        return root_dict[self._subject_key]
+
+    @value.setter
+    def value(self, value: Any) -> None:
+        root_dict = self._point_to_root_dict()
+        old_value = root_dict.get(self._subject_key)
+        root_dict[self._subject_key] = value
+        if self._on_change is not None:
+            self._on_change(
+                change=Change(
+                    path=tuple(self._root_keys) + (self._subject_key,),
+                    old_value=old_value,
+                    new_value=value,
+                )
+            )
 
-    def _resolve_root_dict(self, root_keys: str) -> dict:
+    def _point_to_root_dict(self) -> dict:
+        """Root dict, resolved again if it is not in the user cache anymore"""
+        if self._root_dict_is_stale():
+            self._root_dict = self._resolve_root_dict()
+        return self._root_dict
+
+    def _root_dict_is_stale(self) -> bool:
+        pointer = self._user_cache
+        for k in self._root_keys:
+            pointer = pointer.get(k)
+            if not isinstance(pointer, dict):
+                return True
+        return pointer is not self._root_dict
+
+    def _resolve_root_dict(self) -> dict:
         """Point to the part of the user  cache described by root_keys
 
         Create non-existing dict on the way"""
         pointer = self._user_cache
-        for k in root_keys:
+        for k in self._root_keys:
             if k not in pointer:
                 pointer[k] = {}
             pointer = pointer[k]
         return pointer
 
-    @value.setter
-    def value(self, value: Any) -> None:
-        self._root_dict[self._subject_key] = value
-        if self._on_change is not None:
-            self._on_change()
-
     def _handle_missing_subject_key(self) -> None:
         if self._subject_key not in self._root_dict:
             self._root_dict[self._subject_key] = self._default_value
 
 
+class UserDataPoints:
+    """Data points of an omakase user, created once per (root keys, subject key)
+
+    Observables hand out data points on every access; memoizing them spares creating
+    one and resolving its path each time.
+
+    `on_change` is passed to every data point.
+    """
+
+    def __init__(self, om_username: str, on_change: Optional[Callable] = None) -> None:
+        self._om_username = om_username
+        self._on_change = on_change
+        self._data_points: dict[tuple[tuple[str, ...], str], CachedUserDataPoint] = {}
+
+    def get(
+        self, root_keys: list[str], subject_key: str, default_value: Any
+    ) -> CachedUserDataPoint:
+        """Data point at `root_keys` + `subject_key`, initialized with
+        `default_value` if missing"""
+        key = (tuple(root_keys), subject_key)
+        data_point = self._data_points.get(key)
+        if data_point is None:
+            data_point = CachedUserDataPoint(
+                om_username=self._om_username,
+                root_keys=root_keys,
+                subject_key=subject_key,
+                default_value=default_value,
+                on_change=self._on_change,
+            )
+            self._data_points[key] = data_point
+        return data_point
+
+
 # ========================
 # Subject - implementation
 # ========================
@@ -136,15 +187,14 @@ class LastSelectedDeckObl(Observable):
 
     def __init__(self, om_username: str) -> None:
         self._om_username = om_username
+        self._data_points = UserDataPoints(
+            om_username=om_username, on_change=self.notify
+        )
 
     @property
     def data(self) -> CachedUserDataPoint:
-        return CachedUserDataPoint(
-            om_username=self._om_username,
-            default_value=None,
-            root_keys=[],
-            subject_key=LAST_SELECTED_DECK_KEY,
-            on_change=self.notify,
+        return self._data_points.get(
+            root_keys=[], subject_key=LAST_SELECTED_DECK_KEY, default_value=None
         )
 
 
@@ -160,18 +210,18 @@ class DeckFilterCorrObl(Observable):
 
     def __init__(self, om_username: str):
         self._om_username = om_username
+        self._data_points = UserDataPoints(
+            om_username=om_username, on_change=self.notify
+        )
+        self._default_filter_label = DeckFilters().all_notes.ui_label
 
     def get_filter_dp(self, deck_name: DeckName) -> CachedUserDataPoint:
         """Default to the ui label for all_notes"""
-        default_value = DeckFilters().all_notes.ui_label
-        dp = CachedUserDataPoint(
-            om_username=self._om_username,
+        return self._data_points.get(
             root_keys=[DECK_UI_FILTER_CORR_KEY],
             subject_key=deck_name,
-            default_value=default_value,
-            on_change=self.notify,
+            default_value=self._default_filter_label,
         )
-        return dp
 
 
 # TODO: reuse the below for writting to SQL db
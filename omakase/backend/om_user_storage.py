@@ -0,0 +1,381 @@
+"""
+Storage backends of the omakase user data
+
+The user data of an omakase user is a dict, mutated in place by the rest of the app
+(see `omakase.backend.om_user`). A backend hands out this dict and persists its
+changes, nested ones included.
+
+Three backends are available (see conf/om_user.toml):
+- "app_storage": NiceGUI's `app.storage.general`. All users share a single JSON file,
+  rewritten as a whole upon any change.
+- "sqlite": one row per (user, top-level key), in a SQLite db in WAL mode. A change
+  only rewrites the row of the top-level key it belongs to.
+- "sharded_json": one JSON file per user. Changes mark the user as dirty, and a
+  background flusher rewrites the files of dirty users at most once per interval.
+"""
+import atexit
+import functools
+import json
+import os
+import sqlite3
+import threading
+import urllib.parse
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from nicegui import app
+from nicegui.observables import ObservableDict as NgObservableDict
+from nicegui.observables import ObservableList as NgObservableList
+
+from omakase.io import (
+    get_om_user_db_path,
+    get_om_user_flush_interval,
+    get_om_user_shards_dirpath,
+    get_om_user_storage_backend,
+)
+from omakase.om_logging import logger
+
+# Key of the user caches in app.storage.general
+USER_CACHES_KEY = "user_caches"
+
+
+class OmUserStorage(ABC):
+    """Persisted storage of the omakase user data"""
+
+    @abstractmethod
+    def point_to_user_cache(self, om_username: str) -> dict:
+        """
+        Point to the in-memory data dict of `om_username`
+
+        The same dict is returned across calls. Changes made to it, including to
+        nested dicts and lists, are persisted.
+        """
+
+    @abstractmethod
+    def has_user(self, om_username: str) -> bool:
+        """Whether some data is stored for `om_username`"""
+
+    def import_user_caches(self, user_caches: dict[str, dict]) -> None:
+        """Copy {om username: user data} over, for users without any stored data"""
+        for om_username, user_cache in user_caches.items():
+            if self.has_user(om_username=om_username):
+                continue
+            logger.info(f"Importing the user data of {om_username}")
+            self.point_to_user_cache(om_username=om_username).update(user_cache)
+
+    def close(self) -> None:
+        """Persist pending changes and release resources"""
+
+
+# ===================
+# app.storage.general
+# ===================
+class AppStorageOmUserStorage(OmUserStorage):
+    """User data stored in NiceGUI's `app.storage.general`
+
+    NiceGUI writes the whole storage to a JSON file upon every change, hence the cost
+    of a write grows with the data of all users."""
+
+    def point_to_user_cache(self, om_username: str) -> dict:
+        user_caches = self.point_to_user_caches()
+        if om_username not in user_caches:
+            user_caches[om_username] = dict()
+        return user_caches[om_username]
+
+    def has_user(self, om_username: str) -> bool:
+        return om_username in self.point_to_user_caches()
+
+    @staticmethod
+    def point_to_user_caches() -> dict:
+        """{om username: user data}, for all users"""
+        if USER_CACHES_KEY not in app.storage.general:
+            app.storage.general[USER_CACHES_KEY] = dict()
+        return app.storage.general[USER_CACHES_KEY]
+
+
+# ==============
+# Persisted dict
+# ==============
+class _PersistedUserCache(dict):
+    """User data dict calling `persist(key, value)` (resp. `delete(key)`) whenever
+    the value at a top-level key changes (resp. is removed)
+
+    Dict and list values are wrapped into NiceGUI's observable collections, so that
+    nested changes are reported on the top-level key they belong to."""
+
+    def __init__(
+        self,
+        data: dict,
+        persist: Callable[[str, Any], None],
+        delete: Callable[[str], None],
+    ) -> None:
+        super().__init__()
+        self._persist = persist
+        self._delete = delete
+        for key, value in data.items():
+            super().__setitem__(key, self._observe(key=key, value=value))
+
+    def _observe(self, key: str, value: Any) -> Any:
+        on_change = functools.partial(self._handle_nested_change, key)
+        if isinstance(value, dict):
+            return NgObservableDict(value, on_change=on_change)
+        if isinstance(value, list):
+            return NgObservableList(value, on_change=on_change)
+        return value
+
+    def _handle_nested_change(self, key: str) -> None:
+        if key in self:
+            self._persist(key, self[key])
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        value = self._observe(key=key, value=value)
+        super().__setitem__(key, value)
+        self._persist(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        super().__delitem__(key)
+        self._delete(key)
+
+    def pop(self, key: str, *args: Any) -> Any:
+        had_key = key in self
+        value = super().pop(key, *args)
+        if had_key:
+            self._delete(key)
+        return value
+
+    def popitem(self) -> tuple[str, Any]:
+        key, value = super().popitem()
+        self._delete(key)
+        return key, value
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self) -> None:
+        for key in list(self):
+            del self[key]
+
+
+# ======
+# SQLite
+# ======
+class SqliteOmUserStorage(OmUserStorage):
+    """User data stored in a SQLite db, one JSON value per (user, top-level key)
+
+    The data of a user is loaded upon first access, then served from memory. Writes
+    are synchronous, but in WAL mode with `synchronous=NORMAL` a commit does not wait
+    for the disk."""
+
+    def __init__(self, db_path: str) -> None:
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # The UI and the background workers may write concurrently: the connection
+        # is shared, access is serialized through self._lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute("pragma synchronous=normal")
+        with self._conn:
+            self._conn.execute(
+                "create table if not exists user_data ("
+                "om_username text not null, key text not null, value text not null, "
+                "primary key (om_username, key))"
+            )
+        self._user_caches: dict[str, _PersistedUserCache] = {}
+
+    def point_to_user_cache(self, om_username: str) -> dict:
+        with self._lock:
+            if om_username not in self._user_caches:
+                self._user_caches[om_username] = _PersistedUserCache(
+                    data=self._load(om_username=om_username),
+                    persist=functools.partial(self._write, om_username),
+                    delete=functools.partial(self._delete, om_username),
+                )
+            return self._user_caches[om_username]
+
+    def has_user(self, om_username: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "select 1 from user_data where om_username = ? limit 1",
+                (om_username,),
+            ).fetchone()
+        return row is not None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _load(self, om_username: str) -> dict:
+        rows = self._conn.execute(
+            "select key, value from user_data where om_username = ?", (om_username,)
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def _write(self, om_username: str, key: str, value: Any) -> None:
+        serialized = json.dumps(value)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "insert into user_data (om_username, key, value) values (?, ?, ?) "
+                "on conflict (om_username, key) do update set value = excluded.value",
+                (om_username, key, serialized),
+            )
+
+    def _delete(self, om_username: str, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "delete from user_data where om_username = ? and key = ?",
+                (om_username, key),
+            )
+
+
+# ============
+# Sharded JSON
+# ============
+class ShardedJsonOmUserStorage(OmUserStorage):
+    """User data stored in one JSON file (shard) per user
+
+    A shard is loaded upon the first access to the user's data, so that memory and
+    startup scale with the active users. Changes only mark the user as dirty; a
+    background worker rewrites the shards of dirty users `flush_interval` seconds
+    after the first change, hence at most once per user and interval. Shards are
+    written to a temporary file, then atomically renamed."""
+
+    def __init__(self, dirpath: str, flush_interval: float = 1.0) -> None:
+        self._dirpath = dirpath
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._user_caches: dict[str, _PersistedUserCache] = {}
+        self._dirty: set[str] = set()
+        self._flush_scheduled = False
+        self._closing = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="om-user-flush"
+        )
+        self.n_shard_writes = 0
+        os.makedirs(dirpath, exist_ok=True)
+
+    def point_to_user_cache(self, om_username: str) -> dict:
+        with self._lock:
+            if om_username not in self._user_caches:
+                mark_dirty = functools.partial(self._mark_dirty, om_username)
+                self._user_caches[om_username] = _PersistedUserCache(
+                    data=self._load(om_username=om_username),
+                    persist=lambda key, value: mark_dirty(),
+                    delete=lambda key: mark_dirty(),
+                )
+            return self._user_caches[om_username]
+
+    def has_user(self, om_username: str) -> bool:
+        with self._lock:
+            if om_username in self._user_caches:
+                return bool(self._user_caches[om_username])
+        return os.path.exists(self._get_shard_path(om_username=om_username))
+
+    def flush(self) -> None:
+        """Write the shards of the dirty users now"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        for om_username in dirty:
+            try:
+                self._write(om_username=om_username)
+            except Exception:
+                logger.exception(f"Could not write the user data of {om_username}")
+                self._mark_dirty(om_username)  # retry later
+
+    def close(self) -> None:
+        """Write the pending changes and stop the background worker"""
+        self._closing.set()
+        self._executor.shutdown(wait=True)
+        self.flush()
+
+    def _get_shard_path(self, om_username: str) -> str:
+        # Usernames are quoted to be valid (and unambiguous) filenames
+        filename = urllib.parse.quote(om_username, safe="") + ".json"
+        return os.path.join(self._dirpath, filename)
+
+    def _load(self, om_username: str) -> dict:
+        path = self._get_shard_path(om_username=om_username)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write(self, om_username: str) -> None:
+        # Serialize under the lock, so that the shard is a consistent snapshot
+        with self._lock:
+            serialized = json.dumps(self._user_caches[om_username])
+        path = self._get_shard_path(om_username=om_username)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(serialized)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.n_shard_writes += 1
+
+    def _mark_dirty(self, om_username: str) -> None:
+        with self._lock:
+            self._dirty.add(om_username)
+            if not self._flush_scheduled and not self._closing.is_set():
+                self._flush_scheduled = True
+                self._executor.submit(self._flush_after_interval)
+
+    def _flush_after_interval(self) -> None:
+        # Cut short when closing
+        self._closing.wait(timeout=self._flush_interval)
+        with self._lock:
+            self._flush_scheduled = False
+        self.flush()
+
+
+# ==========
+# Entrypoint
+# ==========
+_STORAGE: Optional[OmUserStorage] = None
+_STORAGE_LOCK = threading.Lock()
+
+
+def get_om_user_storage() -> OmUserStorage:
+    """Process-wide storage of the omakase user data, as configured in
+    conf/om_user.toml
+
+    Raises:
+        ValueError: the configured backend is unknown
+    """
+    global _STORAGE
+    with _STORAGE_LOCK:
+        if _STORAGE is None:
+            _STORAGE = _create_storage(backend=get_om_user_storage_backend())
+        return _STORAGE
+
+
+@atexit.register
+def _close_storage() -> None:
+    with _STORAGE_LOCK:
+        if _STORAGE is not None:
+            _STORAGE.close()
+
+
+def _create_storage(backend: str) -> OmUserStorage:
+    if backend == "app_storage":
+        return AppStorageOmUserStorage()
+    if backend == "sqlite":
+        storage = SqliteOmUserStorage(db_path=get_om_user_db_path())
+        # Carry over the data stored by the former default backend
+        storage.import_user_caches(app.storage.general.get(USER_CACHES_KEY, {}))
+        return storage
+    if backend == "sharded_json":
+        storage = ShardedJsonOmUserStorage(
+            dirpath=get_om_user_shards_dirpath(),
+            flush_interval=get_om_user_flush_interval(),
+        )
+        storage.import_user_caches(app.storage.general.get(USER_CACHES_KEY, {}))
+        return storage
+    raise ValueError(f"Unknown omakase user storage backend: {backend}")
@@ -0,0 +1,105 @@
+"""
+Scheduling of the refreshes of UI elements
+
+Observers refresh their UI element upon notification. During a chain reaction (e.g.,
+deck names -> last selected deck -> cards -> card index), the same element may be
+asked to refresh several times in a row. A `RefreshScheduler` collects these requests
+and runs each refresh once, on the next tick of the event loop (or after an interval).
+"""
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Callable, Hashable, Optional
+
+from nicegui import core
+
+from omakase.om_logging import logger
+
+# Default delay (seconds) between a first refresh request and the flush. With 0, the
+# flush runs on the next tick of the event loop.
+DEFAULT_REFRESH_INTERVAL = 0.0
+
+
+@dataclass
+class RefreshCounters:
+    """Number of refreshes since the scheduler was created"""
+
+    requested: int = 0
+    executed: int = 0
+
+
+class RefreshScheduler:
+    def __init__(
+        self,
+        interval: float = DEFAULT_REFRESH_INTERVAL,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ) -> None:
+        """Refreshes of the UI elements of a client, each run once per flush
+
+        Args:
+            interval: delay (seconds) between a first request and the flush. With 0,
+                the flush runs on the next tick of the event loop.
+            loop: event loop running the flushes. Defaults to NiceGUI's loop. If no
+                loop is running (e.g., in tests), refreshes are run right away.
+        """
+        self._interval = interval
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._pending: dict[Hashable, Callable[[], None]] = {}
+        self._flush_scheduled = False
+        self.counters = RefreshCounters()
+
+    def request(self, key: Hashable, refresh: Callable[[], None]) -> None:
+        """Request a refresh, merged with the pending one of the same `key`
+
+        Args:
+            key: identifies the UI element (e.g., its observer)
+            refresh: refreshes the UI element (e.g., `self.display.refresh`)
+        """
+        loop = self._loop or core.loop
+        with self._lock:
+            self.counters.requested += 1
+            if loop is None or not loop.is_running():
+                run_now = True
+            else:
+                run_now = False
+                self._pending[key] = refresh
+                if not self._flush_scheduled:
+                    self._flush_scheduled = True
+                    loop.call_soon_threadsafe(self._schedule_flush, loop)
+        if run_now:
+            self._run(refresh)
+
+    def is_pending(self, key: Hashable) -> bool:
+        """Whether a refresh of `key` awaits the next flush"""
+        with self._lock:
+            return key in self._pending
+
+    def discard_pending(self) -> None:
+        """Drop the pending refreshes (e.g., nothing was displayed yet)"""
+        with self._lock:
+            self._pending = {}
+
+    def flush(self) -> None:
+        """Run the pending refreshes now"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flush_scheduled = False
+        for refresh in pending.values():
+            self._run(refresh)
+
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Requests made during the current tick are merged into that flush
+        if self._interval > 0:
+            loop.call_later(self._interval, self.flush)
+        else:
+            loop.call_soon(self.flush)
+
+    def _run(self, refresh: Callable[[], None]) -> None:
+        try:
+            refresh()
+        except Exception:
+            logger.exception("Could not refresh a UI element")
+            return
+        with self._lock:
+            self.counters.executed += 1
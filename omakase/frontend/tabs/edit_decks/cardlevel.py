@@ -3,22 +3,30 @@
 Called by the UI module at the level of the decks
 """
 
+import asyncio
 import functools as ft
-from typing import Type
+from typing import Optional, Type
 
 from nicegui import ui
 
 from omakase.annotations import MnemonicUiLabel
 from omakase.backend.decks import DecksManipulator, ObservableCard
+from omakase.backend.generation import (
+    GenerationError,
+    MnemonicGenerator,
+    get_generation_backend,
+)
 from omakase.backend.mnemonics import MockPromptData, SoundTargetComponentsData
 from omakase.backend.mnemonics.base import (
+    EmptyFieldError,
     MnemonicNoteFieldMapData,
     PromptFieldsData,
     PromptRow,
 )
+from omakase.frontend.refresh import RefreshScheduler
 from omakase.frontend.tabs.edit_decks.data import CurrentMnemTypeObl
 from omakase.frontend.web_user import OM_USERNAME_KEY, point_to_web_user_data
-from omakase.observer_logic import Observable, Observer
+from omakase.observer_logic import Change, Observable, Observer
 
 # ==========
 # Parameters
@@ -32,10 +40,10 @@ _AVAILABLE_MNEMONICS: list[Type[PromptFieldsData]] = [
 # ====
 # Core
 # ====
-_AVAILABLE_MNEMN_BY_NAME: dict[MnemonicUiLabel, Type[PromptFieldsData]] = {
-    mnem().ui_name: mnem for mnem in _AVAILABLE_MNEMONICS
+AVAILABLE_MNEMONICS_BY_NAME: dict[MnemonicUiLabel, Type[PromptFieldsData]] = {
+    mnem.get_schema().ui_name: mnem for mnem in _AVAILABLE_MNEMONICS
 }
-_DEFAULT_MNEM_NAME = _AVAILABLE_MNEMONICS[0]().ui_name
+DEFAULT_MNEM_NAME = _AVAILABLE_MNEMONICS[0].get_schema().ui_name
 
 
 class _DataMediator(Observer):
@@ -48,6 +56,7 @@ class CardEditor(Observer):
         self,
         card_obl: ObservableCard,
         deck_manipulator: DecksManipulator,
+        refresh_scheduler: RefreshScheduler,
     ) -> None:
         """Card editor
 
@@ -57,16 +66,20 @@ class CardEditor(Observer):
         """
         # Assignement
         self._deck_manipulator = deck_manipulator
+        self._refresh_scheduler = refresh_scheduler
         self._om_username: str = point_to_web_user_data().get(OM_USERNAME_KEY)
         # Observables
         self._card_obl = card_obl
-        self._current_mnem_type_obl = CurrentMnemTypeObl(data=_DEFAULT_MNEM_NAME)
+        self._current_mnem_type_obl = CurrentMnemTypeObl(data=DEFAULT_MNEM_NAME)
         # Observers
         self._field_editor_obr = _FieldEditors(
-            card_obl=self._card_obl, deck_manipulator=self._deck_manipulator
+            card_obl=self._card_obl,
+            deck_manipulator=self._deck_manipulator,
+            refresh_scheduler=self._refresh_scheduler,
         )
         self._mnem_type_selector_obr = _MnemTypeSelector(
-            current_mnem_type=self._current_mnem_type_obl
+            current_mnem_type=self._current_mnem_type_obl,
+            refresh_scheduler=self._refresh_scheduler,
         )
         # Non-observer UI
         self._prompt_note_field_button = _PromptNoteFieldButton(
@@ -89,8 +102,8 @@ class CardEditor(Observer):
             self._gen_button.display()
         self._field_editor_obr.display()
 
-    def update(self, observable: Observable) -> None:
-        self.display.refresh()
+    def update(self, observable: Observable, change: Optional[Change] = None) -> None:
+        self._refresh_scheduler.request(key=self, refresh=self.display.refresh)
 
 
 class _FieldEditors(Observer):
@@ -98,9 +111,11 @@ class _FieldEditors(Observer):
         self,
         card_obl: ObservableCard,
         deck_manipulator: DecksManipulator,
+        refresh_scheduler: RefreshScheduler,
     ) -> None:
         self._card_obl = card_obl
         self._deck_manipulator = deck_manipulator
+        self._refresh_scheduler = refresh_scheduler
 
     @ui.refreshable
     def display(self) -> None:
@@ -113,25 +128,34 @@ class _FieldEditors(Observer):
                     target_object=note_fields, target_name=field_name
                 ).props("outlined")
         # Display a save button, with a save mechanism
-        ui.button(
-            text="Save changes",
-            on_click=ft.partial(
-                self._deck_manipulator.save_note,
-                note_id=card_obl.note_id,
-                note_fields=note_fields,
-            ),
-        )
+        ui.button(text="Save changes", on_click=self._save_note)
+
+    async def _save_note(self) -> None:
+        """Queue the save of the note, and report its outcome once written"""
+        future = self._deck_manipulator.queue_note_save(card=self._card_obl)
+        result = await asyncio.wrap_future(future)
+        if result.skipped:
+            ui.notify("No change to save")
+        elif result.ok:
+            ui.notify("Note saved", type="positive")
+        else:
+            ui.notify(f"Could not save the note: {result.error}", type="negative")
 
-    def update(self, observable: Observable) -> None:
-        self.display.refresh()
+    def update(self, observable: Observable, change: Optional[Change] = None) -> None:
+        self._refresh_scheduler.request(key=self, refresh=self.display.refresh)
 
 
 # TODO: should subscribe to current mnem type (if changed somewhere else)
 class _MnemTypeSelector(Observer):
     """Select the type of mnemonics"""
 
-    def __init__(self, current_mnem_type: CurrentMnemTypeObl) -> None:
+    def __init__(
+        self,
+        current_mnem_type: CurrentMnemTypeObl,
+        refresh_scheduler: RefreshScheduler,
+    ) -> None:
         self._current_mnem_type = current_mnem_type
+        self._refresh_scheduler = refresh_scheduler
 
     @ui.refreshable
     def display(self) -> None:
@@ -141,13 +165,13 @@ class _MnemTypeSelector(Observer):
         with ui.row():
             ui.markdown("Mnemonic type :")
             ui.select(
-                options=list(_AVAILABLE_MNEMN_BY_NAME.keys()),
+                options=list(AVAILABLE_MNEMONICS_BY_NAME.keys()),
             ).bind_value(
                 target_object=self._current_mnem_type, target_name="value"
             )  # .tooltip("select the type of mnemonic for generation")
 
-    def update(self, observable: Observable) -> None:
-        self.display.refresh()
+    def update(self, observable: Observable, change: Optional[Change] = None) -> None:
+        self._refresh_scheduler.request(key=self, refresh=self.display.refresh)
 
 
 class _PromptNoteFieldButton:
@@ -196,7 +220,7 @@ class _MnemNoteFieldAssociator:
         mnem_note_field_map = self._get_mnem_note_field_map()
         note_field_names = list(self._card_obl.note_fields.keys())
         mnem_name = self._current_mnem_type_obl.value
-        prompt_param_inst = _AVAILABLE_MNEMN_BY_NAME[mnem_name]()
+        prompt_schema = AVAILABLE_MNEMONICS_BY_NAME[mnem_name].get_schema()
         # Display with hook to user data
         ui.markdown("### Send output... *(mandatory)*")
         with ui.row():
@@ -208,12 +232,11 @@ class _MnemNoteFieldAssociator:
                 target_name="value",
             )
         ui.markdown("### Pre-fill... *(optional)*")
-        one_d_prompt_section_names = prompt_param_inst.get_1d_prompt_section_names()
-        for prompt_section_name in one_d_prompt_section_names:
+        for prompt_section_name in prompt_schema.one_d_section_names:
             with ui.row():
-                prompt_param_ui_name = prompt_param_inst.value[
-                    prompt_section_name
-                ].ui_name
+                prompt_param_ui_name = prompt_schema.get_section(
+                    prompt_name=prompt_section_name
+                ).ui_name
                 ui.markdown(f"`mnemonic field {prompt_param_ui_name}` from note field ")
                 ui.space()
                 ui.select(
@@ -226,12 +249,12 @@ class _MnemNoteFieldAssociator:
                 )
         with ui.expansion("About the mnemonic fields", icon="help").classes("w-full"):
             ui.separator()
-            ui.markdown(prompt_param_inst.full_mnem_explanation)
+            ui.markdown(prompt_schema.full_mnem_explanation)
 
     def _get_mnem_note_field_map(self) -> MnemonicNoteFieldMapData:
         om_username: str = point_to_web_user_data().get(OM_USERNAME_KEY)
         nf_map = self._mnem_note_field_map_data = MnemonicNoteFieldMapData(
-            prompt_params_class=_AVAILABLE_MNEMN_BY_NAME[
+            prompt_params_class=AVAILABLE_MNEMONICS_BY_NAME[
                 self._current_mnem_type_obl.value
             ],
             note_type=self._card_obl.note_type,
@@ -277,7 +300,7 @@ class _GenerationButton:
     def _get_mnem_note_field_map(self) -> MnemonicNoteFieldMapData:
         om_username: str = point_to_web_user_data().get(OM_USERNAME_KEY)
         nf_map = self._mnem_note_field_map_data = MnemonicNoteFieldMapData(
-            prompt_params_class=_AVAILABLE_MNEMN_BY_NAME[
+            prompt_params_class=AVAILABLE_MNEMONICS_BY_NAME[
                 self._current_mnem_type_obl.value
             ],
             note_type=self._card_obl.note_type,
@@ -311,17 +334,32 @@ class _Generator:
     def _generate_content_to_display(self) -> None:
         """Factor out the content to display in the dialog box"""
         # Create a mnemonic object
-        prompt_param_data = _AVAILABLE_MNEMN_BY_NAME[
+        prompt_param_data = self._prompt_param_data = AVAILABLE_MNEMONICS_BY_NAME[
             self._current_mnem_type_obl.value
         ]()
         for section_prompt_name, section_data in prompt_param_data.value.items():
             ui.markdown(f"### {section_data.ui_name}")
             for row in section_data.value:
                 self._display_row(row=row, section_prompt_name=section_prompt_name)
+        ui.button(text="Generate", icon="play_circle_filled", on_click=self._generate)
         with ui.expansion("About the mnemonic fields", icon="help").classes("w-full"):
             ui.separator()
             ui.markdown(prompt_param_data.full_mnem_explanation)
 
+    async def _generate(self) -> None:
+        """Generate a mnemonic into the note field of the generation output"""
+        try:
+            generator = MnemonicGenerator(backend=get_generation_backend())
+            await generator.generate(
+                prompt_fields_data=self._prompt_param_data,
+                card=self._card_obl,
+                mnem_note_field_map=self._mnem_note_field_map,
+            )
+        except (EmptyFieldError, GenerationError) as e:
+            ui.notify(f"Could not generate: {e}", type="negative")
+        else:
+            ui.notify("Mnemonic generated (save the note to keep it)", type="positive")
+
     # async def _test_async_outer(self) -> None:
     #     await self._test_async_inner()
     #
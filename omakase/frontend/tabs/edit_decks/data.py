@@ -1,18 +1,87 @@
 """
 Data objects (observables) specific to this tab
 """
+from dataclasses import dataclass, field
 from typing import Optional
 
-from omakase.backend.decks import ObservableCard
-from omakase.observer_logic import ObservableList, ObservablePrimitive
+from omakase.ankiapi.server.ankidb import Watermark
+from omakase.annotations import CardId
+from omakase.backend.decks import CardStore
+from omakase.observer_logic import (
+    Change,
+    Observable,
+    ObservableList,
+    ObservablePrimitive,
+)
 
 
 class DeckNamesObl(ObservableList[str]):
     pass
 
 
-class CurrentCardsObl(ObservableList[ObservableCard]):
-    pass
+@dataclass(frozen=True)
+class CardsDelta(Change):
+    """Change of the current cards that leaves the deck and its filter untouched
+
+    Attributes:
+        upserted_cards: new or modified cards
+        removed_card_ids: cards that are not there anymore
+    """
+
+    upserted_cards: CardStore = field(default_factory=CardStore)
+    removed_card_ids: set[CardId] = field(default_factory=set)
+
+
+class CurrentCardsObl(Observable):
+    """Cards currently pulled from the collection, as a compact `CardStore`
+
+    Use `self.value` to access the store. `self.notify` is triggered upon assignment.
+
+    `watermark` marks when they were pulled, so that later changes can be applied
+    through `apply_changes`.
+
+    Changes applied through `apply_changes` are notified as a `CardsDelta`, other
+    assignments (e.g., another deck or filter was selected) as a plain `Change`.
+    Observers can use the former to update themselves incrementally."""
+
+    def __init__(
+        self,
+        data: Optional[CardStore] = None,
+        watermark: Optional[Watermark] = None,
+    ) -> None:
+        self._value = data if data is not None else CardStore()
+        self.watermark = watermark
+
+    @property
+    def value(self) -> CardStore:
+        return self._value
+
+    @value.setter
+    def value(self, value: CardStore) -> None:
+        old_value, self._value = self._value, value
+        self.notify(change=Change(old_value=old_value, new_value=value))
+
+    def apply_changes(
+        self,
+        upserted_cards: CardStore,
+        removed_card_ids: set[CardId],
+        watermark: Watermark,
+    ) -> None:
+        """Replace/append `upserted_cards` (matched by card id) and drop
+        `removed_card_ids`, with a single notification"""
+        self.watermark = watermark
+        old_value = self._value
+        self._value = old_value.with_changes(
+            upserted_cards=upserted_cards, removed_card_ids=removed_card_ids
+        )
+        self.notify(
+            change=CardsDelta(
+                old_value=old_value,
+                new_value=self._value,
+                upserted_cards=upserted_cards,
+                removed_card_ids=removed_card_ids,
+            )
+        )
 
 
 class CurrentCardIdxObl(ObservablePrimitive[Optional[int]]):
@@ -26,35 +26,85 @@ Uppon modification of a data point, two actions happen:
 (Observable)       │ (Observer) │ ◄────┘
                    └────────────┘
 """
+import json
+from typing import Optional
 from unittest.mock import Mock
 
-from nicegui import ui
+from nicegui import background_tasks, ui
 
-from omakase.annotations import DeckName
+from omakase.annotations import CardId, DeckName, OmDeckFilterCode
+from omakase.backend.bulk_generation import (
+    BulkGenerationJob,
+    create_bulk_generation_job,
+)
 from omakase.backend.decks import (
+    CardChanges,
+    CardStore,
     DeckFilters,
     DecksManipulator,
     ObservableCard,
     filter_label_obj_corr,
     get_card_property_names,
 )
+from omakase.backend.generation import GenerationError
 from omakase.backend.om_user import DeckFilterCorrObl, LastSelectedDeckObl
 from omakase.exceptions import display_exception
-from omakase.frontend.tabs.edit_decks.cardlevel import CardEditor
+from omakase.frontend.refresh import RefreshScheduler
+from omakase.frontend.tabs.edit_decks.cardlevel import (
+    AVAILABLE_MNEMONICS_BY_NAME,
+    DEFAULT_MNEM_NAME,
+    CardEditor,
+)
 from omakase.frontend.tabs.edit_decks.data import (
+    CardsDelta,
     CurrentCardIdxObl,
     CurrentCardsObl,
     DeckNamesObl,
 )
+from omakase.frontend.tabs.edit_decks.rowmodel import (
+    CardRowModel,
+    FilterModel,
+    SortModel,
+)
 from omakase.frontend.tabs.utils import TabContent
 from omakase.frontend.web_user import OM_USERNAME_KEY, point_to_web_user_data
-from omakase.observer_logic import Observable, Observer
+from omakase.observer_logic import Change, Observable, Observer, batch
 from omakase.om_logging import logger
 
 # =========
 # Constants
 # =========
 _AVAILABLE_DECK_FILTERS = DeckFilters()
+# Number of rows per block requested by the deck grid
+_GRID_BLOCK_SIZE = 100
+# Text filters offered by the deck grid (all supported by CardRowModel)
+_TEXT_FILTER_OPTIONS = [
+    "contains",
+    "notContains",
+    "equals",
+    "notEqual",
+    "startsWith",
+    "endsWith",
+    "blank",
+    "notBlank",
+]
+# Datasource of the deck grid. Forward block requests to the server (`getRows`
+# event), which answers through `successCallback` (see `_DeckDisplayer._send_rows`)
+_GRID_DATASOURCE_JS = """{
+    getRows: (params) => {
+        const element = getElement(ELEMENT_ID);
+        element.rowRequests = element.rowRequests || {};
+        element.nextRowRequestId = (element.nextRowRequestId || 0) + 1;
+        element.rowRequests[element.nextRowRequestId] = params;
+        element.$emit("getRows", {
+            request_id: element.nextRowRequestId,
+            start_row: params.startRow,
+            end_row: params.endRow,
+            sort_model: params.sortModel,
+            filter_model: params.filterModel,
+        });
+    },
+}"""
 
 
 # ============
@@ -93,17 +143,19 @@ class _DataMediator(Observer):
         self._deck_ui_filter_corr_obl = deck_ui_filter_corr_obl
         self._current_cards_obl = current_cards_obl
         self._current_card_idx_obl = current_card_idx_obl
+        # Incremented whenever the cards are to be replaced, to drop outdated pulls
+        self._cards_request_id = 0
 
-    def update(self, observable: Observable) -> None:
+    def update(self, observable: Observable, change: Optional[Change] = None) -> None:
         """Implements the update logic of class Observer"""
         if isinstance(observable, DeckNamesObl):
             self._handle_deck_names_change()
         elif isinstance(observable, LastSelectedDeckObl):
             self._handle_last_deck_name_change()
         elif isinstance(observable, DeckFilterCorrObl):
-            self._handle_deck_filter_corr_change()
+            self._handle_deck_filter_corr_change(change=change)
         elif isinstance(observable, CurrentCardsObl):
-            self._handle_current_cards_change()
+            self._handle_current_cards_change(change=change)
         elif isinstance(observable, CurrentCardIdxObl):
             self._handle_current_card_idx_change()
         else:
@@ -121,27 +173,115 @@ class _DataMediator(Observer):
         # Update folnextyers
         self._update_cards()
 
-    def _handle_deck_filter_corr_change(self) -> None:
+    def _handle_deck_filter_corr_change(self, change: Optional[Change]) -> None:
+        # The filter of another deck, or the same filter, was selected
+        if change is not None and (
+            change.path[-1:] != (self._last_selected_deck_obl.data.value,)
+            or change.old_value == change.new_value
+        ):
+            return
         # Update next layers
         self._update_cards()
 
-    def _handle_current_cards_change(self) -> None:
-        # Update next layers
-        self._current_card_idx_obl.value = None
+    def _handle_current_cards_change(self, change: Optional[Change]) -> None:
+        # Update next layers. Incremental changes keep the selection (see `resync`)
+        if not isinstance(change, CardsDelta):
+            self._current_card_idx_obl.value = None
 
     def _handle_current_card_idx_change(self) -> None:
         # Update next layers
         pass
 
+    async def resync(self) -> None:
+        """Pull changes from the collection
+
+        If the decks changed, reload everything in cascade. Otherwise, only apply the
+        card changes since the last pull to the current cards.
+
+        Changes are made within a `batch()`, so that each observer is notified once.
+        """
+        cards_request_id = self._cards_request_id
+        deck_names = await self._deck_manipulator.async_list_decks()
+        deck_name = self._last_selected_deck_obl.data.value
+        if (
+            deck_names != list(self._deck_names_obl.value)
+            or deck_name is None
+            or self._current_cards_obl.watermark is None
+        ):
+            with batch():
+                self._deck_names_obl.value = deck_names
+            return
+        changes = await self._deck_manipulator.async_get_card_changes(
+            deck_name=deck_name,
+            om_filter_code=_get_om_filter_code(
+                deck_name=deck_name, deck_filter_corr_obl=self._deck_ui_filter_corr_obl
+            ),
+            since=self._current_cards_obl.watermark,
+            known_card_ids=set(self._current_cards_obl.value.card_ids),
+        )
+        # Cards were replaced meanwhile (e.g., another deck was selected)
+        if cards_request_id != self._cards_request_id:
+            return
+        with batch():
+            if changes.decks_changed:
+                self._deck_names_obl.value = deck_names
+                return
+            self._apply_card_changes(changes=changes)
+
+    def _apply_card_changes(self, changes: CardChanges) -> None:
+        """Apply `changes` to the current cards, keeping the card under edition
+        selected if still there"""
+        selected_card_id = self._get_selected_card_id()
+        self._current_cards_obl.apply_changes(
+            upserted_cards=changes.upserted_cards,
+            removed_card_ids=changes.removed_card_ids,
+            watermark=changes.watermark,
+        )
+        cards = self._current_cards_obl.value
+        card_idx = (
+            cards.index(card_id=selected_card_id)
+            if selected_card_id is not None and cards.has_card(card_id=selected_card_id)
+            else None
+        )
+        # Left untouched otherwise, not to refresh the card editor for nothing
+        if card_idx != self._current_card_idx_obl.value or (
+            selected_card_id is not None
+            and changes.upserted_cards.has_card(card_id=selected_card_id)
+        ):
+            self._current_card_idx_obl.value = card_idx
+
+    def _get_selected_card_id(self) -> Optional[CardId]:
+        card_idx = self._current_card_idx_obl.value
+        if card_idx is None:
+            return None
+        return self._current_cards_obl.value.card_ids[card_idx]
+
     def _update_cards(self) -> None:
-        """Update cards to match the current deck and its filter"""
+        """Update cards to match the current deck and its filter
+
+        Cards are pulled in the background, not to block the event loop, and assigned
+        once there.
+        """
+        self._cards_request_id += 1
+        background_tasks.create(
+            self._async_update_cards(cards_request_id=self._cards_request_id),
+            name="update deck cards",
+        )
+
+    async def _async_update_cards(self, cards_request_id: int) -> None:
         deck_name = self._last_selected_deck_obl.data.value
-        cards = _get_cards(
+        watermark = self._deck_manipulator.get_watermark()
+        cards = await _async_get_cards(
             deck_name=deck_name,
             deck_filter_corr_obl=self._deck_ui_filter_corr_obl,
             deck_manipulator=self._deck_manipulator,
         )
-        self._current_cards_obl.value = cards
+        # Drop the cards if another deck/filter was selected meanwhile
+        if cards_request_id != self._cards_request_id:
+            return
+        with batch():
+            self._current_cards_obl.watermark = watermark
+            self._current_cards_obl.value = cards
 
     def _sanitize_current_deck_name(self):
         """Sanitize current deck
@@ -162,20 +302,32 @@ class _DataMediator(Observer):
             deck_name_dp.value = deck_name_dp.value
 
 
-def _get_cards(
+async def _async_get_cards(
     deck_name: DeckName,
     deck_filter_corr_obl: DeckFilterCorrObl,
     deck_manipulator: DecksManipulator,
-) -> list[ObservableCard]:
+) -> CardStore:
     """Get cards from a deck, given the specified filter."""
-    filter_name = deck_filter_corr_obl.get_filter_dp(deck_name=deck_name).value
-    om_filter_code = filter_label_obj_corr[filter_name].code
-    cards = deck_manipulator.get_cards_from_deck(
+    # No deck selected (e.g., the user has no deck)
+    if deck_name is None:
+        return CardStore()
+    om_filter_code = _get_om_filter_code(
+        deck_name=deck_name, deck_filter_corr_obl=deck_filter_corr_obl
+    )
+    cards = await deck_manipulator.async_get_cards_from_deck(
         deck_name=deck_name, om_filter_code=om_filter_code
     )
     return cards
 
 
+def _get_om_filter_code(
+    deck_name: DeckName, deck_filter_corr_obl: DeckFilterCorrObl
+) -> OmDeckFilterCode:
+    """Code of the filter selected for that deck"""
+    filter_name = deck_filter_corr_obl.get_filter_dp(deck_name=deck_name).value
+    return filter_label_obj_corr[filter_name].code
+
+
 # ==========
 # UI classes
 # ==========
@@ -195,30 +347,32 @@ class EditDeckTabContent(TabContent):
         self._deck_names_obl = DeckNamesObl(data=self._deck_manipulator.list_decks())
         self._current_cards_obl = CurrentCardsObl(data=None)
         self._current_card_idx_obl = CurrentCardIdxObl(data=None)
+        # Refreshes of the UI elements of this client, merged within a tick
+        self._refresh_scheduler = RefreshScheduler()
         # Observers
         self._deck_selector_obr = _DeckSelector(
             deck_names_obl=self._deck_names_obl,
             last_selected_deck_obl=self._last_selected_deck_obl,
             curr_card_idx_obl=self._current_card_idx_obl,
+            refresh_scheduler=self._refresh_scheduler,
         )
         self._deck_displayer_obr = _DeckDisplayer(
             current_cards_obl=self._current_cards_obl,
             curr_card_idx_obl=self._current_card_idx_obl,
             last_selected_deck_obl=self._last_selected_deck_obl,
             deck_ui_filter_corr_obl=self._deck_ui_filter_corr_obl,
+            refresh_scheduler=self._refresh_scheduler,
         )
         self._filter_selector_obr = _FilterSelector(
             last_selected_deck_obl=self._last_selected_deck_obl,
             deck_ui_filter_corr_obl=self._deck_ui_filter_corr_obl,
-        )
-        self._resync_button = _ResyncButton(
-            deck_names_obl=self._deck_names_obl,
-            deck_manipulator=self._deck_manipulator,
+            refresh_scheduler=self._refresh_scheduler,
         )
         self._card_editor_obr = _CardEditorWrapper(
             current_cards_obl=self._current_cards_obl,
             current_card_idx_obl=self._current_card_idx_obl,
             deck_manipulator=self._deck_manipulator,
+            refresh_scheduler=self._refresh_scheduler,
         )
         # Mediator (responsible for adjusting observables wrt each others and for
         # handling their notifications)
@@ -230,6 +384,13 @@ class EditDeckTabContent(TabContent):
             current_cards_obl=self._current_cards_obl,
             current_card_idx_obl=self._current_card_idx_obl,
         )
+        self._resync_button = _ResyncButton(mediator=self._mediator_obr)
+        self._bulk_generator_obr = _BulkGenerator(
+            current_cards_obl=self._current_cards_obl,
+            deck_manipulator=self._deck_manipulator,
+            om_username=self.om_username,
+            refresh_scheduler=self._refresh_scheduler,
+        )
         # Subscription only to data impact the UI element. The mediator handles the rest
         self._deck_names_obl.attach(self._mediator_obr)
         self._deck_names_obl.attach(self._deck_selector_obr)
@@ -243,6 +404,8 @@ class EditDeckTabContent(TabContent):
         self._current_card_idx_obl.attach(self._card_editor_obr)
         # [Slight unsafe] To align all data and UI elements, we trigger a chain reaction
         self._last_selected_deck_obl.notify()
+        # Nothing is displayed yet: the UI elements will be built from the aligned data
+        self._refresh_scheduler.discard_pending()
 
     def _a_deck_exists(self) -> bool:
         return self._deck_manipulator.list_decks() != []
@@ -265,6 +428,7 @@ class EditDeckTabContent(TabContent):
         with ui.row():
             self._filter_selector_obr.display()
             self._resync_button.display()
+        self._bulk_generator_obr.display()
         self._card_editor_obr.display()
 
 
@@ -274,6 +438,7 @@ class _DeckSelector(Observer):
         last_selected_deck_obl: LastSelectedDeckObl,
         deck_names_obl: DeckNamesObl,
         curr_card_idx_obl: CurrentCardIdxObl,
+        refresh_scheduler: RefreshScheduler,
     ):
         """Deck selector
 
@@ -283,6 +448,7 @@ class _DeckSelector(Observer):
         self._last_selected_deck_obl = last_selected_deck_obl
         self._deck_names_obl = deck_names_obl
         self._curr_card_idx_obl = curr_card_idx_obl
+        self._refresh_scheduler = refresh_scheduler
 
     @ui.refreshable
     def display(self) -> None:
@@ -302,8 +468,8 @@ class _DeckSelector(Observer):
             target_name="value",
         ).props("outlined")
 
-    def update(self, observable: Observable) -> None:
-        self.display.refresh()
+    def update(self, observable: Observable, change: Optional[Change] = None) -> None:
+        self._refresh_scheduler.request(key=self, refresh=self.display.refresh)
 
 
 class _DeckDisplayer(Observer):
@@ -313,6 +479,7 @@ class _DeckDisplayer(Observer):
         curr_card_idx_obl: CurrentCardIdxObl,
         last_selected_deck_obl: LastSelectedDeckObl,
         deck_ui_filter_corr_obl: DeckFilterCorrObl,
+        refresh_scheduler: RefreshScheduler,
     ) -> None:
         """Deck displayer and card selector
 
@@ -320,15 +487,24 @@ class _DeckDisplayer(Observer):
         - Updates _CurrentCardIdxObl
         """
         self._aggrid_table: ui.aggrid = self._build_aggrid_mock()
+        self._row_model = CardRowModel()
+        # Whether the grid last requested rows with some sort or filter
+        self._grid_is_sorted_or_filtered = False
         self._cards_obl = current_cards_obl
         self._curr_card_idx_obl = curr_card_idx_obl
         self._last_selected_deck_obl = last_selected_deck_obl
         self._deck_ui_filter_corr_obl = deck_ui_filter_corr_obl
+        self._refresh_scheduler = refresh_scheduler
 
     @ui.refreshable
     # TODO faire de deck_name et filter_name des observeables utilisant le dp
     def display(self) -> None:
-        """Display deck as an aggrid table, assign to self._aggrid_table"""
+        """Display deck as an aggrid table, assign to self._aggrid_table
+
+        The table uses AG Grid's infinite row model: rows are requested by blocks, and
+        sorted/filtered server-side by self._row_model
+        """
+        self._row_model.set_cards(cards=self._cards_obl.value)
         # Display cards
         card_fields = get_card_property_names()
         self._aggrid_table = ui.aggrid(
@@ -338,29 +514,58 @@ class _DeckDisplayer(Observer):
                         "headerName": field,
                         "field": field,
                         "filter": "agTextColumnFilter",
+                        "filterParams": {"filterOptions": _TEXT_FILTER_OPTIONS},
                         "floatingFilter": True,
                     }
                     for field in card_fields
                 ],
-                "rowData": self._get_agrid_rows_from_cards(),
+                "rowModelType": "infinite",
+                "cacheBlockSize": _GRID_BLOCK_SIZE,
+                ":getRowId": "(params) => String(params.data.card_id)",
             }
+        )
+        self._aggrid_table.options[":datasource"] = _GRID_DATASOURCE_JS.replace(
+            "ELEMENT_ID", str(self._aggrid_table.id)
+        )
+        self._aggrid_table.on(
+            type="getRows", handler=lambda e: self._send_rows(**e.args)
         ).on(
             type="cellClicked",
             handler=lambda e: self._actions_on_agrid_cell_click(
-                selected_card_index=e.args["rowIndex"]
+                selected_card_id=e.args["data"]["card_id"]
             ),
         )
 
-    def _actions_on_agrid_cell_click(self, selected_card_index: int) -> None:
-        """Display card editor, prepare generator conf dialog box for display"""
-        self._curr_card_idx_obl.value = selected_card_index
-
-    def _get_agrid_rows_from_cards(self) -> list[dict]:
-        """Transfom self._cards_obl.cards to agrid rows
+    def _send_rows(
+        self,
+        request_id: int,
+        start_row: int,
+        end_row: int,
+        sort_model: SortModel,
+        filter_model: FilterModel,
+    ) -> None:
+        """Answer a block request of the grid datasource"""
+        self._grid_is_sorted_or_filtered = bool(sort_model or filter_model)
+        rows, n_rows = self._row_model.get_rows(
+            start_row=start_row,
+            end_row=end_row,
+            sort_model=sort_model,
+            filter_model=filter_model,
+        )
+        self._aggrid_table.client.run_javascript(
+            f"""
+            const element = getElement({self._aggrid_table.id});
+            const params = element.rowRequests[{int(request_id)}];
+            delete element.rowRequests[{int(request_id)}];
+            params.successCallback({json.dumps(rows)}, {n_rows});
+            """
+        )
 
-        The result can be passed to .option["rowData"] to update the aggrid table
-        """
-        return [card.get_card_properties() for card in self._cards_obl.value]
+    def _actions_on_agrid_cell_click(self, selected_card_id: CardId) -> None:
+        """Display card editor, prepare generator conf dialog box for display"""
+        self._curr_card_idx_obl.value = self._row_model.get_card_idx(
+            card_id=selected_card_id
+        )
 
     def _build_aggrid_mock(self):
         """Build a mock aggrid table for the first run of the interface. The deck button
@@ -370,8 +575,51 @@ class _DeckDisplayer(Observer):
         aggrid_table.options = dict()
         return aggrid_table
 
-    def update(self, observable: Observable) -> None:
-        self.display.refresh()
+    def update(self, observable: Observable, change: Optional[Change] = None) -> None:
+        """Rebuild the grid if the cards were replaced as a whole, otherwise only
+        update the rows that changed"""
+        if (
+            not isinstance(change, CardsDelta)
+            or isinstance(self._aggrid_table, Mock)
+            # The grid will be rebuilt from the current cards anyway
+            or self._refresh_scheduler.is_pending(key=self)
+        ):
+            self._refresh_scheduler.request(key=self, refresh=self.display.refresh)
+        else:
+            self._apply_delta(delta=change)
+
+    def _apply_delta(self, delta: CardsDelta) -> None:
+        """Update the rows of the grid after an incremental change of the cards
+
+        The infinite row model does not support row transactions. Modified rows are
+        updated in place by card id; if rows were added or removed, or if their order
+        may have changed, the blocks already loaded are requested again (keeping the
+        scroll position and the selection).
+        """
+        added = any(
+            not self._row_model.has_card(card_id=card_id)
+            for card_id in delta.upserted_cards.card_ids
+        )
+        self._row_model.set_cards(cards=self._cards_obl.value)
+        if added or delta.removed_card_ids or self._grid_is_sorted_or_filtered:
+            self._aggrid_table.run_grid_method("refreshInfiniteCache")
+            return
+        rows = {
+            str(card_id): self._row_model.get_row(card_id=card_id)
+            for card_id in delta.upserted_cards.card_ids
+        }
+        if not rows:
+            return
+        # Rows outside of the loaded blocks have no node, and will be requested later
+        self._aggrid_table.client.run_javascript(
+            f"""
+            const api = getElement({self._aggrid_table.id}).gridOptions.api;
+            for (const [rowId, data] of Object.entries({json.dumps(rows)})) {{
+                const node = api.getRowNode(rowId);
+                if (node) node.setData(data);
+            }}
+            """
+        )
 
 
 class _FilterSelector(Observer):
@@ -379,10 +627,12 @@ class _FilterSelector(Observer):
         self,
         last_selected_deck_obl: LastSelectedDeckObl,
         deck_ui_filter_corr_obl: DeckFilterCorrObl,
+        refresh_scheduler: RefreshScheduler,
     ) -> None:
         """Display the filter selection button"""
         self._last_selected_deck_obl = last_selected_deck_obl
         self._deck_ui_filter_corr_obl = deck_ui_filter_corr_obl
+        self._refresh_scheduler = refresh_scheduler
 
     @ui.refreshable
     def display(self) -> None:
@@ -398,18 +648,13 @@ class _FilterSelector(Observer):
             target_object=filter_name_dp, target_name="value"
         ).props("inline")
 
-    def update(self, observable: Observable) -> None:
-        self.display.refresh()
+    def update(self, observable: Observable, change: Optional[Change] = None) -> None:
+        self._refresh_scheduler.request(key=self, refresh=self.display.refresh)
 
 
 class _ResyncButton:
-    def __init__(
-        self,
-        deck_names_obl: DeckNamesObl,
-        deck_manipulator: DecksManipulator,
-    ):
-        self._deck_names_obl = deck_names_obl
-        self._deck_manipulator = deck_manipulator
+    def __init__(self, mediator: _DataMediator):
+        self._mediator = mediator
 
     @ui.refreshable
     def display(self) -> None:
@@ -418,9 +663,92 @@ class _ResyncButton:
             text="Pull collection again", on_click=self._actions_on_sync_button_click
         )
 
-    def _actions_on_sync_button_click(self):
-        # Update list of decks. The rest should update in cascade.
-        self._deck_names_obl.value = self._deck_manipulator.list_decks()
+    async def _actions_on_sync_button_click(self):
+        # Pull changes. The rest should update in cascade.
+        await self._mediator.resync()
+
+
+class _BulkGenerator(Observer):
+    def __init__(
+        self,
+        current_cards_obl: CurrentCardsObl,
+        deck_manipulator: DecksManipulator,
+        om_username: str,
+        refresh_scheduler: RefreshScheduler,
+    ) -> None:
+        """Generate mnemonics for all the current cards, and display the progress"""
+        self._current_cards_obl = current_cards_obl
+        self._deck_manipulator = deck_manipulator
+        self._om_username = om_username
+        self._refresh_scheduler = refresh_scheduler
+        self._mnem_name = DEFAULT_MNEM_NAME
+        self._job: Optional[BulkGenerationJob] = None
+
+    @ui.refreshable
+    def display(self) -> None:
+        """Display the progress of the running job, else a way to start one"""
+        if self._job is not None and not self._job.progress_obl.value.finished:
+            progress = self._job.progress_obl.value
+            with ui.row().classes("w-full items-center"):
+                ui.linear_progress(
+                    value=progress.fraction_done, show_value=False
+                ).classes("w-64")
+                ui.label(
+                    f"{progress.saved}/{progress.total} saved, {progress.failed}"
+                    f" failed, {progress.skipped + progress.empty} skipped"
+                )
+            return
+        with ui.row().classes("items-center"):
+            ui.select(
+                options=list(AVAILABLE_MNEMONICS_BY_NAME.keys()),
+            ).bind_value(target_object=self, target_name="_mnem_name")
+            ui.button(
+                text="Generate for all cards",
+                icon="play_circle_filled",
+                on_click=self._run_job,
+            )
+
+    def update(self, observable: Observable, change: Optional[Change] = None) -> None:
+        self._refresh_scheduler.request(key=self, refresh=self.display.refresh)
+
+    async def _run_job(self) -> None:
+        """Generate mnemonics for the notes of the current cards, once confirmed"""
+        cards = self._current_cards_obl.value
+        n_notes = 0 if cards is None else len(set(cards.get_column("note_id")))
+        if n_notes == 0:
+            ui.notify("No card to generate mnemonics for", type="warning")
+            return
+        # Confirm first: the notes are written to the collection
+        with ui.dialog() as dialog, ui.card():
+            ui.label(f"Generate a {self._mnem_name} mnemonic for {n_notes} notes?")
+            overwrite_checkbox = ui.checkbox(
+                text="Overwrite the output note fields already filled"
+            )
+            with ui.row():
+                ui.button(text="Cancel", on_click=lambda: dialog.submit(False))
+                ui.button(text="Generate", on_click=lambda: dialog.submit(True))
+        if not await dialog:
+            return
+        try:
+            self._job = create_bulk_generation_job(
+                cards=cards,
+                prompt_fields_data_class=AVAILABLE_MNEMONICS_BY_NAME[self._mnem_name],
+                om_username=self._om_username,
+                deck_manipulator=self._deck_manipulator,
+                overwrite=overwrite_checkbox.value,
+            )
+        except GenerationError as e:
+            ui.notify(f"Could not generate: {e}", type="negative")
+            return
+        self._job.progress_obl.attach(self)
+        self.display.refresh()
+        progress = await self._job.run()
+        ui.notify(
+            f"Generated {progress.saved} mnemonics ({progress.failed} failed,"
+            f" {progress.skipped} skipped, {progress.empty} with empty prompt"
+            " fields)",
+            type="positive" if progress.failed == 0 else "warning",
+        )
 
 
 class _CardEditorWrapper(Observer):
@@ -429,11 +757,13 @@ class _CardEditorWrapper(Observer):
         current_cards_obl: CurrentCardsObl,
         current_card_idx_obl: CurrentCardsObl,
         deck_manipulator: DecksManipulator,
+        refresh_scheduler: RefreshScheduler,
     ) -> None:
         # TODO: docstr
         self._current_cards_obl = current_cards_obl
         self._current_card_idx_obl = current_card_idx_obl
         self._deck_manipulator = deck_manipulator
+        self._refresh_scheduler = refresh_scheduler
 
     @ui.refreshable
     def display(self) -> None:
@@ -444,12 +774,14 @@ class _CardEditorWrapper(Observer):
         card_obl = self._get_card()
         # The card_editor UI lives only here
         card_editor = CardEditor(
-            card_obl=card_obl, deck_manipulator=self._deck_manipulator
+            card_obl=card_obl,
+            deck_manipulator=self._deck_manipulator,
+            refresh_scheduler=self._refresh_scheduler,
         )
         card_editor.display()
 
-    def update(self, observable: Observable) -> None:
-        self.display.refresh()
+    def update(self, observable: Observable, change: Optional[Change] = None) -> None:
+        self._refresh_scheduler.request(key=self, refresh=self.display.refresh)
 
     def _get_card(self) -> ObservableCard:
         """Get card, throw an error if not present"""
@@ -0,0 +1,121 @@
+"""
+Server-side row model for the deck AG Grid
+
+The grid runs AG Grid's infinite row model: it requests blocks of rows, along with its
+sort and filter models, and only displays what it received. Sorting and filtering are
+executed here, over the cards already pulled from the collection, so that only the
+rows on screen are shipped to the browser.
+"""
+from collections import OrderedDict
+from typing import Any, Optional
+
+from omakase.annotations import CardId
+from omakase.backend.decks import CardStore
+
+# AG Grid models (see https://www.ag-grid.com/javascript-data-grid/infinite-scrolling/)
+SortModel = list[dict[str, str]]  # [{"colId": ..., "sort": "asc" | "desc"}]
+FilterModel = dict[str, dict[str, Any]]  # {colId: text filter model}
+# Number of sorted/filtered views kept in memory (each indexes the whole deck)
+MAX_CACHED_VIEWS = 4
+
+
+class CardRowModel:
+    def __init__(self, cards: Optional[CardStore] = None) -> None:
+        """Sort, filter and slice cards as requested by an AG Grid infinite row model
+
+        Call `set_cards` whenever the underlying cards change. Rows are only built for
+        the requested blocks.
+        """
+        self.set_cards(cards=cards if cards is not None else CardStore())
+
+    def set_cards(self, cards: CardStore) -> None:
+        """Replace the cards the rows are computed from"""
+        self._cards = cards
+        # {(sort key, filter key): indexes of the rows to display, in order}, least
+        # recently used first
+        self._views: OrderedDict[tuple, list[int]] = OrderedDict()
+
+    def get_rows(
+        self,
+        start_row: int,
+        end_row: int,
+        sort_model: Optional[SortModel] = None,
+        filter_model: Optional[FilterModel] = None,
+    ) -> tuple[list[dict], int]:
+        """Rows `start_row` to `end_row` (excluded) of the sorted and filtered cards
+
+        Returns:
+            The rows, and the total number of rows after filtering
+        """
+        view = self._get_view(
+            sort_model=sort_model or [], filter_model=filter_model or {}
+        )
+        rows = [
+            self._cards.get_card_properties(idx=idx) for idx in view[start_row:end_row]
+        ]
+        return rows, len(view)
+
+    def get_card_idx(self, card_id: CardId) -> int:
+        """Index of the card in the store passed to `set_cards`"""
+        return self._cards.index(card_id=card_id)
+
+    def get_row(self, card_id: CardId) -> dict:
+        """Row of a card"""
+        return self._cards.get_card_properties(idx=self.get_card_idx(card_id=card_id))
+
+    def has_card(self, card_id: CardId) -> bool:
+        return self._cards.has_card(card_id=card_id)
+
+    def _get_view(self, sort_model: SortModel, filter_model: FilterModel) -> list[int]:
+        """Indexes of the filtered rows, sorted. Memoized, as the grid requests several
+        blocks for the same sort/filter. Only the `MAX_CACHED_VIEWS` last used views
+        are kept (e.g., each keystroke in a filter makes a new one)"""
+        key = (
+            tuple((s["colId"], s["sort"]) for s in sort_model),
+            repr(sorted(filter_model.items())),
+        )
+        if key not in self._views:
+            view = list(range(len(self._cards)))
+            for col_id, model in filter_model.items():
+                column = self._cards.get_column(name=col_id)
+                view = [idx for idx in view if _matches(value=column[idx], model=model)]
+            # Stable sorts, from the least to the most important column
+            for sort in reversed(sort_model):
+                view.sort(
+                    key=self._cards.get_column(name=sort["colId"]).__getitem__,
+                    reverse=sort["sort"] == "desc",
+                )
+            self._views[key] = view
+            if len(self._views) > MAX_CACHED_VIEWS:
+                self._views.popitem(last=False)
+        else:
+            self._views.move_to_end(key)
+        return self._views[key]
+
+
+def _matches(value: Any, model: dict[str, Any]) -> bool:
+    """Does `value` pass an AG Grid text filter model (simple or combined)?"""
+    if "conditions" in model:
+        results = [_matches(value=value, model=cond) for cond in model["conditions"]]
+        return all(results) if model["operator"] == "AND" else any(results)
+    text = str(value).lower()
+    filter_text = str(model.get("filter") or "").lower()
+    filter_type = model["type"]
+    if filter_type == "contains":
+        return filter_text in text
+    elif filter_type == "notContains":
+        return filter_text not in text
+    elif filter_type == "equals":
+        return text == filter_text
+    elif filter_type == "notEqual":
+        return text != filter_text
+    elif filter_type == "startsWith":
+        return text.startswith(filter_text)
+    elif filter_type == "endsWith":
+        return text.endswith(filter_text)
+    elif filter_type == "blank":
+        return text == ""
+    elif filter_type == "notBlank":
+        return text != ""
+    else:
+        raise NotImplementedError(f"Unsupported text filter type {filter_type}")
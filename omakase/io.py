@@ -1,7 +1,9 @@
+import functools
 import os
 import tomllib
+from typing import Optional
 
-from jinja2 import Environment, FileSystemLoader, Template
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
 
 import omakase
 
@@ -30,6 +32,81 @@ def get_conf_toml(filename) -> dict:
     return conf
 
 
+@functools.cache
+def _get_anki_conf() -> dict:
+    """Content of conf/anki.toml, read once"""
+    return get_conf_toml("anki.toml")
+
+
+def get_collection_path(om_username: str) -> str:
+    """Path to the Anki collection of `om_username`"""
+    anki_conf = _get_anki_conf()
+    return os.path.join(
+        get_lib_path(),
+        anki_conf["collections_dir"],
+        om_username,
+        anki_conf["collection_filename"],
+    )
+
+
+def get_note_save_journal_path(om_username: str) -> str:
+    """Path to the journal of the pending note saves of `om_username`"""
+    return os.path.join(
+        os.path.dirname(get_collection_path(om_username=om_username)),
+        _get_anki_conf()["note_save_journal_filename"],
+    )
+
+
+@functools.cache
+def _get_om_user_conf() -> dict:
+    """Content of conf/om_user.toml, read once"""
+    return get_conf_toml("om_user.toml")
+
+
+def get_om_user_storage_backend() -> str:
+    """Name of the storage backend of the omakase user data"""
+    return _get_om_user_conf()["backend"]
+
+
+def get_om_user_db_path() -> str:
+    """Path to the SQLite db of the omakase user data"""
+    return os.path.join(get_lib_path(), _get_om_user_conf()["sqlite"]["db_path"])
+
+
+def get_om_user_shards_dirpath() -> str:
+    """Path to the folder of the per-user JSON files of the omakase user data"""
+    return os.path.join(
+        get_lib_path(), _get_om_user_conf()["sharded_json"]["shards_dir"]
+    )
+
+
+def get_om_user_flush_interval() -> float:
+    """Minimum delay (seconds) between two writes of the JSON file of a user"""
+    return _get_om_user_conf()["sharded_json"]["flush_interval"]
+
+
+@functools.cache
+def _get_generation_conf() -> dict:
+    """Content of conf/generation.toml, read once"""
+    return get_conf_toml("generation.toml")
+
+
+def get_generation_backend_name() -> str:
+    """Name of the backend generating the mnemonics"""
+    return _get_generation_conf()["backend"]
+
+
+def get_generation_http_conf() -> dict:
+    """Parameters of the HTTP generation backend (see conf/generation.toml)"""
+    return dict(_get_generation_conf()["http"])
+
+
+def get_bulk_generation_conf() -> dict:
+    """Parameters of the generation for all the cards of a deck (see
+    conf/generation.toml)"""
+    return dict(_get_generation_conf()["bulk"])
+
+
 def get_log_path() -> str:
     """Path to log folder"""
     return os.path.join(
@@ -49,13 +126,61 @@ def _get_template_dirpath() -> str:
     )
 
 
-_TEMPLATE_LOADER = FileSystemLoader(_get_template_dirpath())
+@functools.cache
+def _get_templates_conf() -> dict:
+    """Content of conf/templates.toml, read once"""
+    return get_conf_toml("templates.toml")
+
+
+def create_jinja_environment(
+    template_dirpath: str,
+    cache_size: int = 100,
+    auto_reload: bool = False,
+    bytecode_cache_dirpath: Optional[str] = None,
+) -> Environment:
+    """Jinja environment loading templates from `template_dirpath`
+
+    Args:
+        cache_size: number of compiled templates kept in memory (least recently used
+            ones are dropped)
+        auto_reload: recompile a template if its file changed on disk since compiled
+        bytecode_cache_dirpath: if not None, compiled templates are also cached in that
+            folder, and reused across restarts
+    """
+    bytecode_cache = None
+    if bytecode_cache_dirpath is not None:
+        os.makedirs(bytecode_cache_dirpath, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(directory=bytecode_cache_dirpath)
+    return Environment(
+        loader=FileSystemLoader(template_dirpath),
+        cache_size=cache_size,
+        auto_reload=auto_reload,
+        bytecode_cache=bytecode_cache,
+    )
+
+
+@functools.cache
+def _get_jinja_environment() -> Environment:
+    """Process-wide Jinja environment, configured in conf/templates.toml"""
+    conf = _get_templates_conf()
+    bytecode_cache_dir = conf["bytecode_cache_dir"]
+    return create_jinja_environment(
+        template_dirpath=_get_template_dirpath(),
+        cache_size=conf["cache_size"],
+        auto_reload=conf["auto_reload"],
+        bytecode_cache_dirpath=(
+            os.path.join(get_lib_path(), bytecode_cache_dir)
+            if bytecode_cache_dir
+            else None
+        ),
+    )
 
 
 def get_jinja_template(template_name: str, version: int) -> Template:
-    """Get templates/`filename`"""
-    template_environment = Environment(loader=_TEMPLATE_LOADER)
+    """Get templates/`template_name`/`version`.jinja
+
+    Templates are compiled once, then served from the cache of the shared environment
+    """
     filename = template_name + "/" + str(version) + ".jinja"  # /" is the path
     # separator for jinja, even on Windows
-    template = template_environment.get_template(filename)
-    return template
+    return _get_jinja_environment().get_template(filename)
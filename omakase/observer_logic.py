@@ -13,12 +13,26 @@ my_obl = MyObl(data="oops")
 ```
 will not raise a beartype roar.
 """
+import weakref
 from abc import ABC, abstractmethod
-from typing import Generic, Optional, TypeVar
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Generic,
+    Hashable,
+    Iterable,
+    Iterator,
+    Optional,
+    TypeVar,
+)
 
 from beartype import beartype
 from nicegui.observables import ObservableDict as NgObservableDict
 from nicegui.observables import ObservableList as NgObservableList
+from nicegui.observables import ObservableSet as NgObservableSet
 
 # =======
 # TypeVar
@@ -29,10 +43,40 @@ V = TypeVar("V")
 P = TypeVar("P", str, int, float, bool, None)
 
 
+# ==============
+# Change records
+# ==============
+@dataclass(frozen=True)
+class Change:
+    """What changed in an observable
+
+    Attributes:
+        path: attributes/keys/indices leading from the value of the observable to the
+            changed element. Empty if the value was replaced as a whole.
+        old_value: value before the change (None if there was none)
+        new_value: value after the change (None if there is none anymore)
+        index_range: for changes of a list, the [start, stop) range of the indices
+            affected in that list (the last element of `path` being `start`)
+    """
+
+    path: tuple[Hashable, ...] = ()
+    old_value: Any = None
+    new_value: Any = None
+    index_range: Optional[tuple[int, int]] = None
+
+    def prefixed(self, key: Hashable) -> "Change":
+        """Same change, seen from the parent holding the changed value at `key`"""
+        return Change(
+            path=(key,) + self.path,
+            old_value=self.old_value,
+            new_value=self.new_value,
+            index_range=self.index_range,
+        )
+
+
 # ============================
 # Observer pattern - observers
 # ============================
-# TODO: generic tests
 class Observer(ABC):
     """An observer class
 
@@ -40,8 +84,12 @@ class Observer(ABC):
     """
 
     @abstractmethod
-    def update(self, observable: "Observable") -> None:
-        """Handle notifications from the observable"""
+    def update(self, observable: "Observable", change: Optional[Change] = None) -> None:
+        """Handle notifications from the observable
+
+        Args:
+            change: what changed, if known. If None, anything may have changed.
+        """
         pass
 
 
@@ -52,26 +100,292 @@ class Observable:
     """Observable
 
     In this library, `notify` is assumed to be called from within the self.
+
+    Within a `batch()`, notifications are deferred until the batch exits, unless
+    `batchable` is False (e.g., for observables whose notifications describe a
+    transient state).
+
+    Observers are weakly referenced: an observer is detached once nothing else refers
+    to it (e.g., once the UI element it handles is gone). Whoever creates an observer
+    must keep it for as long as it should be notified.
     """
 
+    batchable: bool = True
+
     def attach(self, observer: Observer) -> None:
         """Attach a new observer"""
+        self._observers = self._get_live_observer_refs() + [weakref.ref(observer)]
+
+    def detach(self, observer: Observer) -> None:
+        """Detach an observer, if attached"""
+        self._observers = [
+            ref for ref in self._get_live_observer_refs() if ref() is not observer
+        ]
+
+    def notify(self, change: Optional[Change] = None) -> None:
+        """Notifies the observers of a change in state
+
+        Args:
+            change: what changed, if known
+        """
+        observers = self._get_observers()
+        current_batch = _CURRENT_BATCH.get()
+        if self.batchable and current_batch is not None and current_batch.is_open:
+            current_batch.defer(observable=self, observers=observers, change=change)
+            return
+        for observer in observers:
+            observer.update(self, change=change)
+
+    def _get_observers(self) -> list[Observer]:
+        """Observers still alive, pruning the others"""
+        observer_refs = getattr(self, "_observers", [])
+        observers, live_observer_refs = [], []
+        for ref in observer_refs:
+            observer = ref()
+            if observer is not None:
+                observers.append(observer)
+                live_observer_refs.append(ref)
+        if len(live_observer_refs) != len(observer_refs):
+            self._observers = live_observer_refs
+        return observers
+
+    def _get_live_observer_refs(self) -> list[weakref.ref]:
+        return [ref for ref in getattr(self, "_observers", []) if ref() is not None]
+
+
+# ========
+# Batching
+# ========
+# Maximum number of rounds of notifications when a batch exits, beyond which the
+# notifications are deemed to loop
+MAX_BATCH_ROUNDS = 100
+
+
+class _Batch:
+    """Notifications deferred until the outermost `batch()` exits
+
+    Each (observable, observer) pair is notified at most once per round. Notifications
+    sent by the observers while a round is processed make the next round.
+
+    A pair notified once is passed its change; a pair notified several times is
+    passed None (anything may have changed)."""
+
+    def __init__(self) -> None:
+        self.is_open = True
+        self._pending: dict[
+            tuple[int, int], tuple[Observable, Observer, Optional[Change]]
+        ] = {}
+
+    def defer(
+        self,
+        observable: Observable,
+        observers: list[Observer],
+        change: Optional[Change],
+    ) -> None:
+        for observer in observers:
+            key = (id(observable), id(observer))
+            merged_change = None if key in self._pending else change
+            self._pending[key] = (observable, observer, merged_change)
+
+    def flush(self) -> None:
+        """Notify the observers, round after round, until no notification is left
+
+        Raises:
+            RuntimeError: the notifications did not settle after MAX_BATCH_ROUNDS
+        """
+        try:
+            for _ in range(MAX_BATCH_ROUNDS):
+                if not self._pending:
+                    return
+                pending, self._pending = self._pending, {}
+                for observable, observer, change in pending.values():
+                    observer.update(observable, change=change)
+            raise RuntimeError(
+                f"Notifications did not settle after {MAX_BATCH_ROUNDS} rounds"
+            )
+        finally:
+            self.is_open = False
+
+
+_CURRENT_BATCH: ContextVar[Optional[_Batch]] = ContextVar(
+    "_CURRENT_BATCH", default=None
+)
+
+
+@contextmanager
+def batch() -> Iterator[None]:
+    """Defer the notifications of all observables until the outermost batch exits
+
+    Each observer is then notified once per observable that changed, however many
+    times that observable notified. A change cascading from observer to observable
+    (e.g., deck names -> last selected deck -> cards) is notified in rounds, still
+    deduplicated within each round.
+
+    The batch is scoped to the current context (thread, or asyncio task).
+    """
+    outer_batch = _CURRENT_BATCH.get()
+    if outer_batch is not None and outer_batch.is_open:  # the outermost one flushes
+        yield
+        return
+    current_batch = _Batch()
+    token = _CURRENT_BATCH.set(current_batch)
+    try:
+        yield
+    finally:
         try:
-            self._observers
-        except AttributeError:
-            self._observers = []
-        self._observers.append(observer)
+            current_batch.flush()
+        finally:
+            _CURRENT_BATCH.reset(token)
+
+
+# ============================
+# Change-recording collections
+# ============================
+class _ChangeRecording(ABC):
+    """Mixin for NiceGUI's observable collections, calling the change handlers with
+    a `Change` (`handler(change)`), which nested collections report to their parent
+    with the path prefixed. Nested collections are change-recording too, so that
+    handlers never get NiceGUI's event arguments.
+
+    Changes are recorded for the usual single-element manipulations. Other
+    manipulations (e.g., `sort`, `clear`) report None."""
+
+    _change: Optional[Change] = None
 
-    def notify(self) -> None:
-        """Notifies the observers of a change in state"""
+    def _record(self, change: Change, mutate: Callable, *args: Any) -> Any:
+        """Call `mutate(*args)`, reporting `change` to the handlers"""
+        self._change = change
         try:
-            observers = self._observers
-        except AttributeError:
-            self._observers = []
-        observers = self._observers
-        for observer in observers:
-            observer.update(self)
-        # print(self.__class__.__qualname__)
+            return mutate(*args)
+        finally:
+            self._change = None
+
+    def _handle_change(self, change: Optional[Change] = None) -> None:
+        if change is None:
+            change = self._change
+        for handler in self._change_handlers:
+            handler(change)
+        if isinstance(self._parent, _ChangeRecording):
+            self._parent._handle_child_change(child=self, change=change)
+        elif self._parent is not None:
+            self._parent._handle_change()
+
+    def _handle_child_change(self, child: Any, change: Optional[Change]) -> None:
+        key = self._find_child_key(child=child)
+        if change is None or key is None:
+            self._handle_change()
+        else:
+            self._handle_change(change=change.prefixed(key))
+
+    @abstractmethod
+    def _find_child_key(self, child: Any) -> Optional[Hashable]:
+        """Key (or index) of `child` in this collection, None if not found"""
+
+    def _observe(self, data: Any) -> Any:
+        if isinstance(data, dict):
+            return _ChangeRecordingDict(data, _parent=self)
+        if isinstance(data, list):
+            return _ChangeRecordingList(data, _parent=self)
+        if isinstance(data, set):
+            return _ChangeRecordingSet(data, _parent=self)
+        return data
+
+
+class _ChangeRecordingDict(_ChangeRecording, NgObservableDict):
+    def _find_child_key(self, child: Any) -> Optional[Hashable]:
+        return next((key for key, value in self.items() if value is child), None)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        change = Change(path=(key,), old_value=self.get(key), new_value=value)
+        self._record(change, super().__setitem__, key, value)
+
+    def __delitem__(self, key: Any) -> None:
+        change = Change(path=(key,), old_value=self.get(key))
+        self._record(change, super().__delitem__, key)
+
+    def pop(self, key: Any, *args: Any) -> Any:
+        change = Change(path=(key,), old_value=self.get(key))
+        return self._record(change, super().pop, key, *args)
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        change = Change(path=(key,), new_value=default)
+        return self._record(change, super().setdefault, key, default)
+
+
+class _ChangeRecordingList(_ChangeRecording, NgObservableList):
+    def _find_child_key(self, child: Any) -> Optional[Hashable]:
+        return next((idx for idx, value in enumerate(self) if value is child), None)
+
+    def _index_change(
+        self, start: int, stop: int, old_value: Any = None, new_value: Any = None
+    ) -> Change:
+        return Change(
+            path=(start,),
+            old_value=old_value,
+            new_value=new_value,
+            index_range=(start, stop),
+        )
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        if isinstance(index, int):
+            start = index % len(self) if self else index
+            change = self._index_change(
+                start=start, stop=start + 1, old_value=self[index], new_value=value
+            )
+            self._record(
+                change,
+                super().__setitem__,
+                index,
+                value,
+            )
+        else:  # slice
+            super().__setitem__(index, value)
+
+    def append(self, item: Any) -> None:
+        change = self._index_change(start=len(self), stop=len(self) + 1, new_value=item)
+        self._record(change, super().append, item)
+
+    def extend(self, iterable: Iterable) -> None:
+        items = list(iterable)
+        change = self._index_change(
+            start=len(self), stop=len(self) + len(items), new_value=items
+        )
+        self._record(change, super().extend, items)
+
+    def insert(self, index: int, item: Any) -> None:
+        start = min(max(index + len(self) if index < 0 else index, 0), len(self))
+        change = self._index_change(start=start, stop=start + 1, new_value=item)
+        self._record(change, super().insert, index, item)
+
+    def pop(self, index: int = -1) -> Any:
+        start = index % len(self) if self else index
+        change = self._index_change(start=start, stop=start + 1, old_value=self[index])
+        return self._record(change, super().pop, index)
+
+    def remove(self, item: Any) -> None:
+        start = self.index(item)
+        change = self._index_change(start=start, stop=start + 1, old_value=self[start])
+        self._record(change, super().remove, item)
+
+
+class _ChangeRecordingSet(_ChangeRecording, NgObservableSet):
+    """The path of a change is the added or removed element"""
+
+    def _find_child_key(self, child: Any) -> Optional[Hashable]:
+        # Elements are hashable, hence not collections reporting changes
+        return None
+
+    def add(self, item: Any) -> None:
+        change = Change(path=(item,), new_value=item)
+        self._record(change, super().add, item)
+
+    def remove(self, item: Any) -> None:
+        change = Change(path=(item,), old_value=item)
+        self._record(change, super().remove, item)
+
+    def discard(self, item: Any) -> None:
+        change = Change(path=(item,), old_value=item if item in self else None)
+        self._record(change, super().discard, item)
 
 
 @beartype
@@ -89,7 +403,7 @@ class ObservableList(Observable, Generic[V]):
 
     def __init__(self, data: Optional[list[V]] = None) -> None:
         value = data if data is not None else list()
-        self._value = NgObservableList(data=value, on_change=self.notify)
+        self._value = _ChangeRecordingList(data=value, on_change=self.notify)
 
     @property
     def value(self) -> NgObservableList[V]:
@@ -97,8 +411,9 @@ class ObservableList(Observable, Generic[V]):
 
     @value.setter
     def value(self, value: list[V]) -> None:
-        self._value = NgObservableList(data=value, on_change=self.notify)
-        self.notify()
+        old_value = self._value
+        self._value = _ChangeRecordingList(data=value, on_change=self.notify)
+        self.notify(change=Change(old_value=old_value, new_value=self._value))
 
 
 @beartype
@@ -116,7 +431,7 @@ class ObservableDict(Observable, Generic[K, V]):
 
     def __init__(self, value: Optional[dict[K, V]] = None) -> None:
         value = value if value is not None else dict()
-        self._value = NgObservableDict(data=value, on_change=self.notify)
+        self._value = _ChangeRecordingDict(data=value, on_change=self.notify)
 
     @property
     def value(self) -> NgObservableDict[K, V]:
@@ -124,8 +439,9 @@ class ObservableDict(Observable, Generic[K, V]):
 
     @value.setter
     def value(self, value: dict[K, V]) -> None:
-        self._value = NgObservableDict(data=value, on_change=self.notify)
-        self.notify()
+        old_value = self._value
+        self._value = _ChangeRecordingDict(data=value, on_change=self.notify)
+        self.notify(change=Change(old_value=old_value, new_value=self._value))
 
 
 @beartype
@@ -144,18 +460,32 @@ class ObservablePrimitive(Observable, Generic[P]):
 
     @value.setter
     def value(self, value: P) -> None:
-        self._value = value
-        self.notify()
+        old_value, self._value = self._value, value
+        self.notify(change=Change(old_value=old_value, new_value=value))
 
 
 class ObservableDataclass(Observable):
     """NOTE: the subclass should be decorated with `@dataclass`
 
-    Values are accessed as usual for a dataclass"""
+    Values are accessed as usual for a dataclass. Notifications carry the path to the
+    changed attribute (e.g., `("note_fields", "Front")`). Changes of private
+    attributes (e.g., the observers) are not notified."""
 
     def __post_init__(self) -> None:
-        self.__dict__ = NgObservableDict(data=self.__dict__, on_change=self.notify)
+        self.__dict__ = _ChangeRecordingDict(
+            data=self.__dict__, on_change=self._handle_attribute_change
+        )
 
     def __setattr__(self, name, value) -> None:
+        old_value = self.__dict__.get(name)
         super().__setattr__(name, value)
-        self.notify()
+        if not name.startswith("_"):
+            self.notify(
+                change=Change(path=(name,), old_value=old_value, new_value=value)
+            )
+
+    def _handle_attribute_change(self, change: Optional[Change] = None) -> None:
+        """Handle changes within the attributes (e.g., of a dict attribute)"""
+        if change is not None and change.path and str(change.path[0]).startswith("_"):
+            return
+        self.notify(change=change)
@@ -0,0 +1,64 @@
+"""
+Benchmark: rendering one prompt per card of a deck, through the PromptFieldsData
+objects vs with the batch renderer
+
+Run with `python scripts/bench_batch_rendering.py [n_rows]`
+"""
+import sys
+import time
+
+import pandas as pd
+
+from omakase.backend.mnemonics import SoundTargetComponentsData
+from omakase.backend.mnemonics.batch import render_prompts
+
+
+def make_table(n_rows: int) -> pd.DataFrame:
+    rows = []
+    for i in range(n_rows):
+        row = {
+            "target_concept.0.target_concept": f"concept {i}",
+            "target_meaning_mnemonic.0.target_meaning_mnemonic": f"mnemonic {i}",
+        }
+        for j in range(1 + i % 4):  # 1 to 4 components
+            row[f"components.{j}.component_sound"] = f"sound {j}"
+            row[f"components.{j}.component_concept"] = f"comp {j}"
+            row[f"components.{j}.component_concept_details"] = f"details {j}"
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def render_with_objects(table: pd.DataFrame) -> list[str]:
+    prompts = []
+    for row in table.to_dict("records"):
+        data = SoundTargetComponentsData()
+        for column, value in row.items():
+            if isinstance(value, str):
+                section, row_idx, field = column.split(".")
+                data.value[section].value[int(row_idx)].value[field].value = value
+        prompts.append(data.get_prompt())
+    return prompts
+
+
+def main(n_rows: int) -> None:
+    table = make_table(n_rows=n_rows)
+    start = time.perf_counter()
+    reference = render_with_objects(table=table)
+    objects_s = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = [
+        r.prompt
+        for r in render_prompts(
+            prompt_fields_data_class=SoundTargetComponentsData, table=table
+        )
+    ]
+    batch_s = time.perf_counter() - start
+    assert batched == reference
+    print(f"{n_rows} prompts")
+    print(f"objects: {objects_s:.2f}s ({objects_s / n_rows * 1e6:.0f} µs per prompt)")
+    print(f"batch:   {batch_s:.2f}s ({batch_s / n_rows * 1e6:.0f} µs per prompt)")
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    main(n_rows=n_rows)
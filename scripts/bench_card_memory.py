@@ -0,0 +1,65 @@
+"""
+Benchmark: memory of a deck as ObservableCards vs as a CardStore
+
+Run with `python scripts/bench_card_memory.py [n_cards]`
+"""
+import sys
+import tracemalloc
+
+from omakase.ankiapi.server.ankidb import CardRecord
+from omakase.backend.decks import ObservableCard, _get_study_status, _store_from_records
+
+
+def _make_records(n_cards: int) -> list[CardRecord]:
+    return [
+        CardRecord(
+            card_id=1_700_000_000_000 + i,
+            note_id=1_600_000_000_000 + i,
+            sort_field_value=f"front {i}",
+            due_value=i,
+            note_type="Basic",
+            card_type=0,
+            card_queue=0,
+            note_fields={"Front": f"front {i}", "Back": f"back {i}"},
+        )
+        for i in range(n_cards)
+    ]
+
+
+def _as_observable_cards(records: list[CardRecord]) -> list[ObservableCard]:
+    """Previous representation: one ObservableCard per card"""
+    return [
+        ObservableCard(
+            card_id=record.card_id,
+            note_id=record.note_id,
+            sort_field_value=record.sort_field_value,
+            due_value=record.due_value,
+            note_type=record.note_type,
+            study_status=_get_study_status(record=record),
+            note_fields=dict(record.note_fields),
+        )
+        for record in records
+    ]
+
+
+def _measure(build, records: list[CardRecord]) -> float:
+    """Memory (MiB) still allocated by the result of `build(records)`"""
+    tracemalloc.start()
+    result = build(records)  # noqa: F841 (kept alive while measuring)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / 2**20
+
+
+def main(n_cards: int) -> None:
+    records = _make_records(n_cards=n_cards)
+    cards_mib = _measure(_as_observable_cards, records)
+    store_mib = _measure(lambda records: _store_from_records(records=records), records)
+    print(f"{n_cards} cards")
+    print(f"ObservableCards: {cards_mib:.1f} MiB")
+    print(f"CardStore:       {store_mib:.1f} MiB")
+    print(f"ratio:           x{cards_mib / store_mib:.1f}")
+
+
+if __name__ == "__main__":
+    main(n_cards=int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
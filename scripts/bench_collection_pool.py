@@ -0,0 +1,44 @@
+"""
+Benchmark: open-per-call vs pooled collection handles
+
+Run with `python scripts/bench_collection_pool.py [n_notes] [n_calls]`
+"""
+import os
+import sys
+import tempfile
+import time
+
+from synthetic_collection import make_synthetic_collection
+
+from omakase.ankiapi.server.ankidb import ManipulateAnkiDb
+from omakase.ankiapi.server.collection_pool import CollectionPool
+
+
+def _time_calls(db_path: str, n_calls: int, pooled: bool, pool: CollectionPool):
+    """Mean latency (ms) of a deck listing + card listing, per call"""
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        with ManipulateAnkiDb(db_path=db_path, pool=pool, pooled=pooled) as db:
+            deck_id = max(db.list_decks())
+            db.list_cards_in_deck(deck_id=deck_id)
+    return (time.perf_counter() - start) / n_calls * 1000
+
+
+def main(n_notes: int, n_calls: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "collection.anki2")
+        make_synthetic_collection(db_path=db_path, n_notes=n_notes)
+        pool = CollectionPool()
+        unpooled_ms = _time_calls(db_path, n_calls, pooled=False, pool=pool)
+        pooled_ms = _time_calls(db_path, n_calls, pooled=True, pool=pool)
+        pool.close_all()
+    print(f"{n_notes} notes, {n_calls} calls")
+    print(f"open-per-call: {unpooled_ms:.2f} ms/call")
+    print(f"pooled:        {pooled_ms:.2f} ms/call")
+    print(f"speedup:       x{unpooled_ms / pooled_ms:.1f}")
+
+
+if __name__ == "__main__":
+    n_notes = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    n_calls = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    main(n_notes=n_notes, n_calls=n_calls)
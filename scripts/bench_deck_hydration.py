@@ -0,0 +1,45 @@
+"""
+Benchmark: per-card lookups (N+1) vs single-query deck hydration
+
+Run with `python scripts/bench_deck_hydration.py [n_notes]`
+"""
+import os
+import sys
+import tempfile
+import time
+
+from synthetic_collection import make_synthetic_collection
+
+from omakase.ankiapi.server.ankidb import ManipulateAnkiDb
+
+
+def _hydrate_card_by_card(db: ManipulateAnkiDb, deck_id: int) -> int:
+    """Former path: list the cards, then one card + note lookup per card"""
+    n_cards = 0
+    for card_id in db.list_cards_in_deck(deck_id=deck_id):
+        card = db._coll.get_card(id=card_id)
+        note = card.note()
+        dict(note.items())
+        n_cards += 1
+    return n_cards
+
+
+def main(n_notes: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "collection.anki2")
+        deck_id = make_synthetic_collection(db_path=db_path, n_notes=n_notes)
+        with ManipulateAnkiDb(db_path=db_path) as db:
+            start = time.perf_counter()
+            _hydrate_card_by_card(db=db, deck_id=deck_id)
+            n_plus_one_s = time.perf_counter() - start
+            start = time.perf_counter()
+            records = db.hydrate_deck(deck_id=deck_id)
+            hydration_s = time.perf_counter() - start
+    print(f"{len(records)} cards")
+    print(f"card by card:   {n_plus_one_s:.3f} s")
+    print(f"hydrate_deck:   {hydration_s:.3f} s")
+
+
+if __name__ == "__main__":
+    n_notes = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    main(n_notes=n_notes)
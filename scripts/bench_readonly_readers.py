@@ -0,0 +1,62 @@
+"""
+Benchmark: throughput of N concurrent deck readers, through the pooled read-write
+collection vs read-only connections
+
+Run with `python scripts/bench_readonly_readers.py [n_notes] [reads_per_reader]`
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from synthetic_collection import make_synthetic_collection
+
+from omakase.ankiapi.server.ankidb import ManipulateAnkiDb, ReadOnlyAnkiDb
+from omakase.ankiapi.server.collection_pool import CollectionPool
+
+N_READERS = [1, 2, 4, 8]
+
+
+def _throughput(read: Callable[[], None], n_readers: int, n_reads: int) -> float:
+    """Deck hydrations per second, with `n_readers` threads doing `n_reads` each"""
+
+    def reader() -> None:
+        for _ in range(n_reads):
+            read()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_readers) as executor:
+        for future in [executor.submit(reader) for _ in range(n_readers)]:
+            future.result()
+    return n_readers * n_reads / (time.perf_counter() - start)
+
+
+def main(n_notes: int, n_reads: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "collection.anki2")
+        deck_id = make_synthetic_collection(db_path=db_path, n_notes=n_notes)
+        pool = CollectionPool()
+
+        def read_pooled() -> None:
+            with ManipulateAnkiDb(db_path=db_path, pool=pool) as anki_db:
+                anki_db.hydrate_deck(deck_id=deck_id, sql_filter="c.type = 0")
+
+        def read_only() -> None:
+            with ReadOnlyAnkiDb(db_path=db_path) as reader:
+                reader.hydrate_deck(deck_id=deck_id, sql_filter="c.type = 0")
+
+        print(f"{n_notes} notes, {n_reads} reads per reader (hydrations/s)")
+        print("readers  pooled read-write  read-only")
+        for n_readers in N_READERS:
+            pooled = _throughput(read_pooled, n_readers=n_readers, n_reads=n_reads)
+            ro = _throughput(read_only, n_readers=n_readers, n_reads=n_reads)
+            print(f"{n_readers:>7}  {pooled:>17.1f}  {ro:>9.1f}")
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    n_notes = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    n_reads = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    main(n_notes=n_notes, n_reads=n_reads)
@@ -0,0 +1,72 @@
+"""
+Benchmark: cost of reading a user data point through its observable, with a data
+point created on every access vs memoized
+
+Run with `python scripts/bench_user_data_points.py [n_reads]`
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+from omakase.backend import om_user_storage
+from omakase.backend.decks import DeckFilters
+from omakase.backend.om_user import (
+    DECK_UI_FILTER_CORR_KEY,
+    LAST_SELECTED_DECK_KEY,
+    CachedUserDataPoint,
+    DeckFilterCorrObl,
+    LastSelectedDeckObl,
+)
+from omakase.backend.om_user_storage import SqliteOmUserStorage
+
+OM_USERNAME = "bench"
+
+
+def main(n_reads: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = SqliteOmUserStorage(db_path=os.path.join(tmp_dir, "om_users.db"))
+        om_user_storage._STORAGE = storage
+        last_selected_deck_obl = LastSelectedDeckObl(om_username=OM_USERNAME)
+        deck_filter_corr_obl = DeckFilterCorrObl(om_username=OM_USERNAME)
+        last_selected_deck_obl.data.value = "deck1"
+
+        # Previous behaviour: a data point is created, and its path resolved, per read
+        def read_last_deck_unmemoized() -> None:
+            CachedUserDataPoint(
+                om_username=OM_USERNAME,
+                root_keys=[],
+                subject_key=LAST_SELECTED_DECK_KEY,
+                default_value=None,
+            ).value
+
+        def read_filter_unmemoized() -> None:
+            CachedUserDataPoint(
+                om_username=OM_USERNAME,
+                root_keys=[DECK_UI_FILTER_CORR_KEY],
+                subject_key="deck1",
+                default_value=DeckFilters().all_notes.ui_label,
+            ).value
+
+        def read_last_deck() -> None:
+            last_selected_deck_obl.data.value
+
+        def read_filter() -> None:
+            deck_filter_corr_obl.get_filter_dp(deck_name="deck1").value
+
+        print(f"{n_reads} reads (µs per read)")
+        print("data point            per access  memoized")
+        for label, unmemoized, memoized in [
+            ("last selected deck", read_last_deck_unmemoized, read_last_deck),
+            ("deck filter", read_filter_unmemoized, read_filter),
+        ]:
+            before = timeit.timeit(unmemoized, number=n_reads) / n_reads * 1e6
+            after = timeit.timeit(memoized, number=n_reads) / n_reads * 1e6
+            print(f"{label:<20}  {before:>10.2f}  {after:>8.2f}")
+        storage.close()
+        om_user_storage._STORAGE = None
+
+
+if __name__ == "__main__":
+    n_reads = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    main(n_reads=n_reads)
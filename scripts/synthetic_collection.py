@@ -0,0 +1,32 @@
+"""
+Build synthetic Anki collections for benchmarks
+"""
+from anki.collection import AddNoteRequest, Collection
+
+from omakase.annotations import DeckId
+
+SYNTHETIC_DECK_NAME = "Synthetic"
+
+
+def make_synthetic_collection(
+    db_path: str, n_notes: int, deck_name: str = SYNTHETIC_DECK_NAME
+) -> DeckId:
+    """Create a collection at `db_path` with `n_notes` 'Basic' notes in `deck_name`
+
+    Returns:
+        Id of the deck
+    """
+    coll = Collection(db_path)
+    try:
+        deck_id = coll.decks.id(deck_name)
+        note_type = coll.models.by_name("Basic")
+        requests = []
+        for i in range(n_notes):
+            note = coll.new_note(note_type)
+            note["Front"] = f"front {i}"
+            note["Back"] = f"back {i} " + "lorem ipsum " * 10
+            requests.append(AddNoteRequest(note=note, deck_id=deck_id))
+        coll.add_notes(requests)
+    finally:
+        coll.close()
+    return deck_id
@@ -1,5 +1,6 @@
-from nicegui import ui
+from nicegui import app, ui
 
+from omakase.backend.generation import close_generation_backend
 from omakase.frontend.main import create_main_page
 from omakase.frontend.routing import ENTRY_ROUTES
 from omakase.frontend.web_user import init_missing_web_user_storage
@@ -12,6 +13,8 @@ def entry_point() -> None:
     create_main_page()
 
 
+app.on_shutdown(close_generation_backend)
+
 # TODO : add storage secret
 # TODO : Put in toml files the arguments
 ui.run(
@@ -0,0 +1,45 @@
+from typing import Callable, Optional
+
+import pytest
+
+from omakase.backend import om_user_storage
+from omakase.backend.decks import ObservableCard
+from omakase.backend.om_user_storage import SqliteOmUserStorage
+
+
+@pytest.fixture
+def storage_path(tmp_path) -> str:
+    return str(tmp_path / "om_users.sqlite3")
+
+
+@pytest.fixture
+def storage(storage_path, monkeypatch):
+    """Storage of the omakase users, in place of the process-wide one"""
+    storage = SqliteOmUserStorage(db_path=storage_path)
+    monkeypatch.setattr(om_user_storage, "_STORAGE", storage)
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def make_card() -> Callable[..., ObservableCard]:
+    """Factory of new cards, by default alone in their note"""
+
+    def make_card(
+        card_id: int,
+        sort_field_value: str = "",
+        note_type: str = "t",
+        note_fields: Optional[dict[str, str]] = None,
+        note_id: Optional[int] = None,
+    ) -> ObservableCard:
+        return ObservableCard(
+            card_id=card_id,
+            note_id=card_id if note_id is None else note_id,
+            sort_field_value=sort_field_value,
+            due_value=0,
+            note_type=note_type,
+            study_status=1,
+            note_fields={} if note_fields is None else note_fields,
+        )
+
+    return make_card
@@ -0,0 +1,112 @@
+import pytest
+from anki.collection import Collection
+
+from omakase.ankiapi.server.ankidb import ManipulateAnkiDb, ReadOnlyAnkiDb
+from omakase.ankiapi.server.collection_pool import CollectionPool
+from omakase.backend.decks import DeckFilters
+
+DECK_NAME = "deck1"
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    """Collection with 5 'Basic' notes in DECK_NAME"""
+    path = str(tmp_path / "collection.anki2")
+    coll = Collection(path)
+    deck_id = coll.decks.id(DECK_NAME)
+    for i in range(5):
+        note = coll.new_note(coll.models.by_name("Basic"))
+        note["Front"] = f"front {i}"
+        note["Back"] = f"back {i}"
+        coll.add_note(note, deck_id)
+    coll.close()
+    return path
+
+
+@pytest.fixture
+def anki_db(db_path):
+    pool = CollectionPool()
+    with ManipulateAnkiDb(db_path=db_path, pool=pool) as db:
+        yield db
+    pool.close_all()
+
+
+def test_update_fields_bulk(anki_db):
+    note_ids = sorted(anki_db._coll.find_notes(""))
+    tagged_note = anki_db._coll.get_note(note_ids[2])
+    tagged_note.tags = ["tag1", "tag2"]
+    anki_db._coll.update_note(tagged_note)
+    updates = {nid: {1: f"new back {nid}"} for nid in note_ids}
+    updates[note_ids[0]] = {5: "no such field"}
+    updates[note_ids[1]] = {-1: "negative index", 0: "front"}
+    updates[123] = {0: "no such note"}
+    report = anki_db.update_fields_bulk(updates=updates, chunk_size=2)
+    assert sorted(report.updated_note_ids) == note_ids[2:]
+    assert set(report.errors.keys()) == {note_ids[0], note_ids[1], 123}
+    for nid in note_ids[2:]:
+        assert anki_db._coll.get_note(nid).fields[1] == f"new back {nid}"
+    assert anki_db._coll.get_note(note_ids[0]).fields[1] == "back 0"
+    assert anki_db._coll.get_note(note_ids[1]).fields == ["front 1", "back 1"]
+    assert anki_db._coll.get_note(note_ids[2]).tags == ["tag1", "tag2"]
+
+
+def test_unchanged_notes_are_not_written(anki_db):
+    note_id = anki_db._coll.find_notes("")[0]
+    mod = anki_db._coll.get_note(note_id).mod
+    report = anki_db.update_fields_bulk(updates={note_id: {0: "front 0"}})
+    assert report.unchanged_note_ids == [note_id]
+    assert report.updated_note_ids == []
+    assert not anki_db.update_fields(note_id=note_id, updates={1: "back 0"})
+    assert anki_db._coll.get_note(note_id).mod == mod
+
+
+def test_hydrate_deck(anki_db):
+    deck_id = anki_db._coll.decks.id_for_name(DECK_NAME)
+    records = anki_db.hydrate_deck(deck_id=deck_id)
+    assert len(records) == 5
+    record = records[0]
+    assert record.note_type == "Basic"
+    assert record.sort_field_value == "front 0"
+    assert record.note_fields == {"Front": "front 0", "Back": "back 0"}
+    assert record.card_type == 0
+    # Same result when hydrating by card ids
+    card_ids = [r.card_id for r in records]
+    assert anki_db.hydrate_cards(card_ids=card_ids[1:3]) == records[1:3]
+
+
+def test_read_only_matches_collection_search(tmp_path):
+    path = str(tmp_path / "collection.anki2")
+    pool = CollectionPool()
+    with ManipulateAnkiDb(db_path=path, pool=pool) as anki_db:
+        coll = anki_db._coll
+        deck_id = coll.decks.id(DECK_NAME)
+        subdeck_id = coll.decks.id(f"{DECK_NAME}::sub")
+        coll.decks.id("other")
+        # (type, queue): new, suspended new, learning, day learning, review,
+        # relearning
+        for i, (card_type, queue) in enumerate(
+            [(0, 0), (0, -1), (1, 1), (1, 3), (2, 2), (3, 1)]
+        ):
+            note = coll.new_note(coll.models.by_name("Basic"))
+            note["Front"] = f"front {i}"
+            coll.add_note(note, subdeck_id if i % 2 else deck_id)
+            card = note.cards()[0]
+            card.type, card.queue = card_type, queue
+            coll.update_card(card)
+        # Read while the writer holds the collection
+        with ReadOnlyAnkiDb(db_path=path) as reader:
+            assert reader.list_decks() == anki_db.list_decks()
+            for deck_filter in vars(DeckFilters()).values():
+                if deck_filter.sql_filter is None:
+                    continue
+                assert reader.find_card_ids_in_deck(
+                    deck_id=deck_id, sql_filter=deck_filter.sql_filter
+                ) == sorted(
+                    anki_db.find_cards_in_deck(
+                        deck_id=deck_id, search=deck_filter.anki_search
+                    )
+                ), deck_filter.ui_label
+            records = reader.hydrate_deck(deck_id=deck_id)
+            assert records == anki_db.hydrate_deck(deck_id=deck_id)
+            assert len(records) == 6
+    pool.close_all()
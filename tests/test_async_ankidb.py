@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from anki.collection import Collection
+
+from omakase.ankiapi.server.async_ankidb import AsyncAnkiDb
+from omakase.ankiapi.server.collection_pool import CollectionPool
+
+
+@pytest.fixture
+def pool():
+    pool = CollectionPool()
+    yield pool
+    pool.close_all()
+
+
+def _make_collection(path: str) -> int:
+    """Collection with a note in 'deck1'. Returns the id of the deck"""
+    coll = Collection(path)
+    deck_id = coll.decks.id("deck1")
+    note = coll.new_note(coll.models.by_name("Basic"))
+    note["Front"] = "front"
+    coll.add_note(note, deck_id)
+    coll.close()
+    return deck_id
+
+
+def test_awaitable_operations(tmp_path, pool):
+    db_path = str(tmp_path / "collection.anki2")
+    deck_id = _make_collection(db_path)
+    async_db = AsyncAnkiDb(db_path=db_path, pool=pool)
+
+    async def main():
+        decks, records = await asyncio.gather(
+            async_db.list_decks(), async_db.hydrate_deck(deck_id=deck_id)
+        )
+        assert decks[deck_id] == "deck1"
+        assert await async_db.update_fields(
+            note_id=records[0].note_id, updates={1: "back"}
+        )
+        (record,) = await async_db.search_deck(deck_id=deck_id, text="back")
+        assert record.note_fields["Back"] == "back"
+
+    asyncio.run(main())
+
+
+def test_one_worker_per_collection(tmp_path, pool):
+    db_paths = [str(tmp_path / f"collection{i}.anki2") for i in range(2)]
+    async_dbs = [AsyncAnkiDb(db_path=path, pool=pool) for path in db_paths]
+
+    def slow_thread_id() -> int:
+        time.sleep(0.05)
+        return threading.get_ident()
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticker = asyncio.create_task(tick())
+        names = await asyncio.gather(
+            *(
+                async_db.run_in_worker(slow_thread_id)
+                for async_db in async_dbs + async_dbs
+            )
+        )
+        ticker.cancel()
+        # The event loop kept running meanwhile
+        assert ticks > 5
+        return names
+
+    names = asyncio.run(main())
+    assert names[0] == names[2] != names[1] == names[3]
+    assert threading.get_ident() not in names
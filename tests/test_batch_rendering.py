@@ -0,0 +1,64 @@
+import pandas as pd
+
+from omakase.backend.mnemonics import SoundTargetComponentsData
+from omakase.backend.mnemonics.base import EmptyFieldError
+from omakase.backend.mnemonics.batch import get_column_names, render_prompts
+
+_FULL_ROW = {
+    "target_concept.0.target_concept": "voyage",
+    "target_meaning_mnemonic.0.target_meaning_mnemonic": "Family goes on a voyage",
+    "components.0.component_sound": "りょ",
+    "components.0.component_concept": "ryokan",
+    "components.0.component_concept_details": "an old inn",
+    "components.2.component_sound": "こう",
+    "components.2.component_concept": "coat",
+    "components.2.component_concept_details": "a long coat",
+}
+
+
+def _render_one(row: dict[str, str]) -> str:
+    """Render through the matryoshka of objects, for reference"""
+    data = SoundTargetComponentsData()
+    for column, value in row.items():
+        section, row_idx, field = column.split(".")
+        data.value[section].value[int(row_idx)].value[field].value = value
+    return data.get_prompt()
+
+
+def test_column_names():
+    columns = get_column_names(schema=SoundTargetComponentsData.get_schema())
+    assert len(columns) == 1 + 1 + 4 * 3
+    assert set(_FULL_ROW) <= set(columns)
+
+
+def test_batch_matches_single_rendering():
+    partial_row = {**_FULL_ROW, "components.2.component_sound": None}
+    no_target_row = {**_FULL_ROW, "target_concept.0.target_concept": ""}
+    rendered = list(
+        render_prompts(
+            prompt_fields_data_class=SoundTargetComponentsData,
+            table=[
+                _FULL_ROW,
+                partial_row,
+                {**_FULL_ROW, "other": "ignored"},
+                no_target_row,
+            ],
+        )
+    )
+    assert [r.row_label for r in rendered] == [0, 1, 2, 3]
+    assert rendered[0].ok and rendered[0].prompt == _render_one(row=_FULL_ROW)
+    assert isinstance(rendered[1].error, EmptyFieldError)
+    assert "components" in str(rendered[1].error)
+    assert rendered[2].prompt == rendered[0].prompt
+    # Required single-row section
+    assert isinstance(rendered[3].error, EmptyFieldError)
+    assert "target_concept" in str(rendered[3].error)
+
+
+def test_batch_from_dataframe_is_lazy():
+    frame = pd.DataFrame([_FULL_ROW] * 3, index=[10, 20, 30])
+    rendered = render_prompts(
+        prompt_fields_data_class=SoundTargetComponentsData, table=frame
+    )
+    assert next(rendered).row_label == 10
+    assert [r.row_label for r in rendered] == [20, 30]
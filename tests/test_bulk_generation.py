@@ -0,0 +1,174 @@
+import asyncio
+import time
+from concurrent.futures import Future
+
+from omakase.backend.bulk_generation import BulkGenerationJob, RetryPolicy, TokenBucket
+from omakase.backend.decks import CardStore, ObservableCard
+from omakase.backend.generation import GenerationBackend, GenerationError
+from omakase.backend.mnemonics import SoundTargetComponentsData
+from omakase.backend.mnemonics.base import MnemonicNoteFieldMapData
+from omakase.backend.note_saves import NoteSaveResult
+
+
+class _FlakyBackend(GenerationBackend):
+    """Fails the first attempt of the prompts containing `flaky`, always for 'fail'
+    prompts, and crashes on 'crash' prompts"""
+
+    def __init__(self, flaky: str = "") -> None:
+        self._flaky = flaky
+        self.attempts: dict[str, int] = {}
+        self.outputs: list[str] = []  # in order of generation
+        self.in_flight = self.max_in_flight = 0
+
+    async def generate(self, prompt: str) -> str:
+        self.attempts[prompt] = self.attempts.get(prompt, 0) + 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        if "crash" in prompt:
+            raise RuntimeError("unexpected")
+        if (self.attempts[prompt] == 1 and self._flaky in prompt) or "fail" in prompt:
+            raise GenerationError("flaky")
+        main_concept = [
+            line for line in prompt.splitlines() if line.startswith("Main Concept")
+        ][-1]
+        self.outputs.append(f"mnemonic for {main_concept}")
+        return self.outputs[-1]
+
+
+class _DeckManipulator:
+    def __init__(self) -> None:
+        self.saved_note_fields = {}
+
+    def queue_note_save(self, card: ObservableCard) -> "Future[NoteSaveResult]":
+        self.saved_note_fields[card.note_id] = dict(card.note_fields)
+        future = Future()
+        future.set_result(NoteSaveResult(note_id=card.note_id))
+        return future
+
+
+class _FixedDelayRetryPolicy(RetryPolicy):
+    def get_delay(self, n_failed_attempts: int) -> float:
+        return self.base_delay
+
+
+def _note_fields(front: str, mnemonic: str = "") -> dict[str, str]:
+    return {"Front": front, "Context": "a context", "Mnemonic": mnemonic}
+
+
+def _associate_note_fields() -> None:
+    """Associate the fields of the note type 't' to the prompt and output"""
+    nf_map = MnemonicNoteFieldMapData(
+        prompt_params_class=SoundTargetComponentsData,
+        note_type="t",
+        note_field_names=["Front", "Context", "Mnemonic"],
+        om_username="alice",
+    )
+    nf_map.point_to_genout_note_field_dp().value = "Mnemonic"
+    nf_map.point_to_prompt_note_assoc_dp(
+        section_prompt_name="target_concept"
+    ).value = "Front"
+    nf_map.point_to_prompt_note_assoc_dp(
+        section_prompt_name="target_meaning_mnemonic"
+    ).value = "Context"
+
+
+def test_token_bucket_limits_rate():
+    async def acquire_all(n: int) -> float:
+        bucket = TokenBucket(rate=100, capacity=2)
+        start = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # 2 tokens right away, then 1 per 10ms
+    assert asyncio.run(acquire_all(n=2)) < 0.01
+    assert asyncio.run(acquire_all(n=7)) >= 0.04
+
+
+def test_retry_delays_are_jittered_and_capped():
+    policy = RetryPolicy(base_delay=1.0, max_delay=3.0)
+    delays = [policy.get_delay(n_failed_attempts=n) for n in [1, 2, 3, 4] * 50]
+    assert all(0 <= delay <= 3.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_bulk_generation(storage, make_card):
+    cards = [
+        make_card(card_id=i, note_fields=_note_fields(front=f"concept {i}"))
+        for i in range(20)
+    ]
+    cards.append(make_card(card_id=20, note_fields=_note_fields(front="fail")))
+    cards.append(
+        make_card(
+            card_id=21,
+            note_type="unassociated",
+            note_fields=_note_fields(front="other"),
+        )
+    )
+    # Another card of the note of card 3
+    cards.append(make_card(card_id=22, note_id=3, note_fields=cards[3].note_fields))
+    cards.append(
+        make_card(card_id=23, note_fields=_note_fields(front="filled", mnemonic="m"))
+    )
+    cards.append(make_card(card_id=24, note_fields=_note_fields(front="crash")))
+    cards.append(make_card(card_id=25, note_fields=_note_fields(front="")))
+    store = CardStore.from_cards(cards)
+    _associate_note_fields()
+    backend, deck_manipulator = _FlakyBackend(), _DeckManipulator()
+    job = BulkGenerationJob(
+        cards=store,
+        prompt_fields_data_class=SoundTargetComponentsData,
+        om_username="alice",
+        backend=backend,
+        deck_manipulator=deck_manipulator,
+        max_concurrency=3,
+        rate_limiter=TokenBucket(rate=1000, capacity=5),
+        retry_policy=RetryPolicy(max_attempts=2, base_delay=0.001),
+        queue_size=2,
+    )
+    progress = asyncio.run(job.run())
+    assert progress.total == 25  # one per note
+    assert (progress.generated, progress.saved) == (20, 20)
+    assert (progress.failed, progress.skipped, progress.empty) == (2, 2, 1)
+    assert progress.finished and progress.fraction_done == 1
+    assert backend.max_in_flight <= 3
+    assert len(backend.outputs) == 20
+    # Views were only built for the written notes
+    assert len(store._views) == 20
+    # Prompts were pre-filled from the associated note field
+    assert store[4].note_fields["Mnemonic"] == "mnemonic for Main Concept: concept 4"
+    assert deck_manipulator.saved_note_fields[4] == store[4].note_fields
+    assert 20 not in deck_manipulator.saved_note_fields
+    assert store[23].note_fields["Mnemonic"] == "m"
+
+
+def test_retries_wait_out_of_the_concurrency_slot(storage, make_card):
+    store = CardStore.from_cards(
+        [
+            make_card(card_id=1, note_fields=_note_fields(front="concept 1")),
+            make_card(
+                card_id=2, note_fields=_note_fields(front="concept 2", mnemonic="m")
+            ),
+        ]
+    )
+    _associate_note_fields()
+    backend = _FlakyBackend(flaky="concept 1")
+    job = BulkGenerationJob(
+        cards=store,
+        prompt_fields_data_class=SoundTargetComponentsData,
+        om_username="alice",
+        backend=backend,
+        deck_manipulator=_DeckManipulator(),
+        max_concurrency=1,
+        retry_policy=_FixedDelayRetryPolicy(max_attempts=2, base_delay=0.05),
+        overwrite=True,
+    )
+    progress = asyncio.run(job.run())
+    assert (progress.saved, progress.failed, progress.skipped) == (2, 0, 0)
+    # The note filled already was overwritten while the other one waited to retry
+    assert backend.outputs == [
+        "mnemonic for Main Concept: concept 2",
+        "mnemonic for Main Concept: concept 1",
+    ]
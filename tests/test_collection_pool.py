@@ -0,0 +1,66 @@
+import threading
+import time
+
+from omakase.ankiapi.server.ankidb import ManipulateAnkiDb
+from omakase.ankiapi.server.collection_pool import CollectionPool
+
+
+def test_handle_is_reused(tmp_path):
+    pool = CollectionPool()
+    db_path = str(tmp_path / "collection.anki2")
+    with ManipulateAnkiDb(db_path=db_path, pool=pool) as db:
+        first_coll = db._coll
+    with ManipulateAnkiDb(db_path=db_path, pool=pool) as db:
+        assert db._coll is first_coll
+        assert db.list_decks() != {}
+    pool.close_all()
+    assert pool.open_paths == []
+
+
+def test_lru_eviction(tmp_path):
+    pool = CollectionPool(max_size=2)
+    paths = [str(tmp_path / f"collection{i}.anki2") for i in range(3)]
+    for path in paths[:2]:
+        with pool.collection(path):
+            pass
+    # Touch the first one, so that the second is the least recently used
+    with pool.collection(paths[0]):
+        pass
+    with pool.collection(paths[2]):
+        pass
+    assert pool.open_paths == [paths[0], paths[2]]
+    pool.close_all()
+
+
+def test_idle_timeout(tmp_path):
+    pool = CollectionPool(idle_timeout=0)
+    path_a = str(tmp_path / "a.anki2")
+    path_b = str(tmp_path / "b.anki2")
+    with pool.collection(path_a):
+        pass
+    time.sleep(0.01)
+    with pool.collection(path_b):
+        assert pool.open_paths == [path_b]
+    pool.close_all()
+
+
+def test_checkout_is_exclusive(tmp_path):
+    pool = CollectionPool()
+    db_path = str(tmp_path / "collection.anki2")
+    events = []
+
+    def borrow(name: str) -> None:
+        with pool.collection(db_path):
+            events.append(f"{name} in")
+            time.sleep(0.05)
+            events.append(f"{name} out")
+
+    threads = [threading.Thread(target=borrow, args=(n,)) for n in ("t1", "t2")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # No interleaving between the two borrowers
+    assert events[0][:2] == events[1][:2]
+    assert events[2][:2] == events[3][:2]
+    pool.close_all()
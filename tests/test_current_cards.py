@@ -0,0 +1,39 @@
+from omakase.backend.decks import CardStore
+from omakase.frontend.tabs.edit_decks.data import CardsDelta, CurrentCardsObl
+from omakase.observer_logic import Observer
+
+
+class _ChangeRecorder(Observer):
+    def __init__(self) -> None:
+        self.changes = []
+
+    def update(self, observable, change=None) -> None:
+        self.changes.append(change)
+
+
+def test_apply_changes_notifies_delta(make_card):
+    cards_obl = CurrentCardsObl(data=CardStore.from_cards([make_card(1), make_card(2)]))
+    recorder = _ChangeRecorder()
+    cards_obl.attach(recorder)
+    cards_obl.apply_changes(
+        upserted_cards=CardStore.from_cards([make_card(2, "new"), make_card(3)]),
+        removed_card_ids={1},
+        watermark=10,
+    )
+    assert list(cards_obl.value.card_ids) == [2, 3]
+    assert cards_obl.value[0].sort_field_value == "new"
+    (delta,) = recorder.changes
+    assert isinstance(delta, CardsDelta)
+    assert list(delta.upserted_cards.card_ids) == [2, 3]
+    assert delta.removed_card_ids == {1}
+    assert delta.new_value is cards_obl.value
+
+
+def test_full_replacement_has_no_delta(make_card):
+    cards_obl = CurrentCardsObl()
+    recorder = _ChangeRecorder()
+    cards_obl.attach(recorder)
+    cards_obl.value = CardStore.from_cards([make_card(1)])
+    (change,) = recorder.changes
+    assert not isinstance(change, CardsDelta)
+    assert change.new_value is cards_obl.value
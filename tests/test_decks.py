@@ -0,0 +1,256 @@
+import asyncio
+import threading
+
+import pytest
+from anki.collection import Collection
+
+from omakase.ankiapi.server.collection_pool import get_collection_pool
+from omakase.backend import decks, note_saves
+from omakase.backend.decks import CardStore, DecksManipulator, ObservableCard
+from omakase.exceptions import NoSuchDeckException
+
+OM_USERNAME = "user"
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch) -> str:
+    """Collection of OM_USERNAME, with a new and a reviewed note in 'deck1'"""
+    path = str(tmp_path / "collection.anki2")
+    monkeypatch.setattr(decks, "get_collection_path", lambda om_username: path)
+    monkeypatch.setattr(decks, "_DECK_CACHES", {})
+    monkeypatch.setattr(note_saves, "get_collection_path", lambda om_username: path)
+    monkeypatch.setattr(
+        note_saves,
+        "get_note_save_journal_path",
+        lambda om_username: str(tmp_path / "note_saves.jsonl"),
+    )
+    monkeypatch.setattr(note_saves, "_QUEUES", {})
+    coll = Collection(path)
+    deck_id = coll.decks.id("deck1")
+    for i in range(2):
+        note = coll.new_note(coll.models.by_name("Basic"))
+        note["Front"] = f"front {i}"
+        note.tags = [f"tag{i}"]
+        coll.add_note(note, deck_id)
+    card = coll.get_card(coll.find_cards('"front:front 1"')[0])
+    card.type = card.queue = 2
+    coll.update_card(card)
+    coll.close()
+    yield path
+    for queue in note_saves._QUEUES.values():
+        queue.close()
+    get_collection_pool().close_all()
+
+
+def test_list_decks_and_cards(db_path):
+    manipulator = DecksManipulator(om_username=OM_USERNAME)
+    assert "deck1" in manipulator.list_decks()
+    assert (
+        len(manipulator.get_cards_from_deck(deck_name="deck1", om_filter_code=0)) == 2
+    )
+    new_cards = manipulator.get_cards_from_deck(deck_name="deck1", om_filter_code=1)
+    assert [c.sort_field_value for c in new_cards] == ["front 0"]
+    assert new_cards[0].note_fields == {"Front": "front 0", "Back": ""}
+    with pytest.raises(NoSuchDeckException):
+        manipulator.get_cards_from_deck(deck_name="no deck", om_filter_code=0)
+
+
+def test_cache_invalidated_on_change(db_path, monkeypatch):
+    manipulator = DecksManipulator(om_username=OM_USERNAME)
+    card = manipulator.get_cards_from_deck(deck_name="deck1", om_filter_code=1)[0]
+    # Served from cache while the collection is unchanged
+    hydrations = []
+    hydrate = decks.AnkiDbReader._hydrate
+    monkeypatch.setattr(
+        decks.AnkiDbReader,
+        "_hydrate",
+        lambda self, where: hydrations.append(where) or hydrate(self, where),
+    )
+    manipulator.get_cards_from_deck(deck_name="deck1", om_filter_code=1)
+    assert hydrations == []
+    # Pulled again after a change
+    card.note_fields["Front"] = "edited"
+    manipulator.save_note(card=card)
+    cards = manipulator.get_cards_from_deck(deck_name="deck1", om_filter_code=1)
+    assert len(hydrations) == 1
+    assert cards[0].sort_field_value == "edited"
+
+
+def test_filters_are_pushed_to_the_search(db_path):
+    manipulator = DecksManipulator(om_username=OM_USERNAME)
+
+    def sort_fields(**kwargs) -> list[str]:
+        cards = manipulator.get_cards_from_deck(deck_name="deck1", **kwargs)
+        return [card.sort_field_value for card in cards]
+
+    assert sort_fields(om_filter_code=2) == []
+    assert sort_fields(om_filter_code=3) == ["front 1"]
+    assert sort_fields(om_filter_code=0, tag="tag1") == ["front 1"]
+    assert sort_fields(om_filter_code=1, tag="tag1") == []
+    assert sort_fields(om_filter_code=0, text="front 0") == ["front 0"]
+    assert sort_fields(om_filter_code=1, tag="tag0", text="front*") == []
+
+
+def test_suspended_learning_card_is_in_learning(db_path):
+    with decks.ManipulateAnkiDb(db_path=db_path) as anki_db:
+        card = anki_db._coll.get_card(anki_db._coll.find_cards('"front:front 0"')[0])
+        card.type, card.queue = 1, -1  # learning, suspended
+        anki_db._coll.update_card(card)
+    manipulator = DecksManipulator(om_username=OM_USERNAME)
+    cards = manipulator.get_cards_from_deck(deck_name="deck1", om_filter_code=2)
+    assert [card.sort_field_value for card in cards] == ["front 0"]
+    # Same cards as the Anki search
+    searched = manipulator.get_cards_from_deck(
+        deck_name="deck1", om_filter_code=2, text="front"
+    )
+    assert [card.sort_field_value for card in searched] == ["front 0"]
+
+
+def test_collection_is_not_opened_on_reader_threads(db_path, monkeypatch):
+    manipulator = DecksManipulator(om_username=OM_USERNAME)
+    thread_names = []
+    enter = decks.ManipulateAnkiDb.__enter__
+
+    def record_thread(self):
+        thread_names.append(threading.current_thread().name)
+        return enter(self)
+
+    monkeypatch.setattr(decks.ManipulateAnkiDb, "__enter__", record_thread)
+
+    async def main() -> CardStore:
+        await manipulator.async_get_cards_from_deck(deck_name="deck1", om_filter_code=4)
+        return await manipulator.async_get_cards_from_deck(
+            deck_name="deck1", om_filter_code=0
+        )
+
+    assert len(asyncio.run(main())) == 2
+    # Only the 'is:due' search needed the collection, on its worker
+    assert len(thread_names) == 1
+    assert thread_names[0].startswith("anki-collection")
+
+
+def test_get_card_changes(db_path):
+    manipulator = DecksManipulator(om_username=OM_USERNAME)
+    watermark = manipulator.get_watermark()
+    cards = manipulator.get_cards_from_deck(deck_name="deck1", om_filter_code=0)
+    edited_card, deleted_card = cards
+    # Edit a note, delete the other one, add a new one
+    edited_card.note_fields["Front"] = "edited"
+    manipulator.save_note(card=edited_card)
+    with decks.ManipulateAnkiDb(db_path=db_path) as anki_db:
+        anki_db._coll.remove_notes([deleted_card.note_id])
+        note = anki_db._coll.new_note(anki_db._coll.models.by_name("Basic"))
+        note["Front"] = "added"
+        anki_db._coll.add_note(note, anki_db._coll.decks.id_for_name("deck1"))
+    changes = manipulator.get_card_changes(
+        deck_name="deck1",
+        om_filter_code=0,
+        since=watermark,
+        known_card_ids={card.card_id for card in cards},
+    )
+    upserted = sorted(card.sort_field_value for card in changes.upserted_cards)
+    assert upserted == ["added", "edited"]
+    assert changes.removed_card_ids == {deleted_card.card_id}
+    assert changes.watermark >= watermark
+
+
+def test_only_dirty_fields_are_saved(db_path):
+    manipulator = DecksManipulator(om_username=OM_USERNAME)
+    card = manipulator.get_cards_from_deck(deck_name="deck1", om_filter_code=1)[0]
+    other_view = manipulator.get_cards_from_deck(deck_name="deck1", om_filter_code=1)[0]
+    assert card.dirty_fields == set()
+    assert manipulator.save_note(card=card).skipped
+    card.note_fields["Back"] = "back"
+    assert card.dirty_fields == {"Back"}
+    assert card.get_dirty_field_updates() == {1: "back"}
+    result = manipulator.save_note(card=card)
+    assert result.ok and not result.skipped
+    assert card.dirty_fields == set()
+    # Dirty, but the collection already has that value: not written
+    other_view.note_fields["Back"] = "back"
+    assert manipulator.save_note(card=other_view).skipped
+    counters = manipulator.get_note_save_counters()
+    assert (counters.written, counters.skipped, counters.failed) == (1, 2, 0)
+
+
+def test_failed_save_leaves_fields_dirty(db_path, monkeypatch):
+    manipulator = DecksManipulator(om_username=OM_USERNAME)
+    card = manipulator.get_cards_from_deck(deck_name="deck1", om_filter_code=1)[0]
+    update_fields_bulk = decks.ManipulateAnkiDb.update_fields_bulk
+
+    def fail_once(self, updates):
+        monkeypatch.setattr(
+            decks.ManipulateAnkiDb, "update_fields_bulk", update_fields_bulk
+        )
+        raise OSError("disk full")
+
+    monkeypatch.setattr(decks.ManipulateAnkiDb, "update_fields_bulk", fail_once)
+    card.note_fields["Back"] = "back"
+    assert not manipulator.save_note(card=card).ok
+    assert card.dirty_fields == {"Back"}
+    # Retried with the same dirty fields
+    assert manipulator.save_note(card=card).ok
+    assert card.dirty_fields == set()
+    cards = manipulator.get_cards_from_deck(deck_name="deck1", om_filter_code=1)
+    assert cards[0].note_fields["Back"] == "back"
+    counters = manipulator.get_note_save_counters()
+    assert (counters.written, counters.failed) == (1, 1)
+
+
+def _make_store(n_cards: int) -> CardStore:
+    return CardStore.from_cards(
+        ObservableCard(
+            card_id=i,
+            note_id=i,
+            sort_field_value=f"front {i}",
+            due_value=i,
+            note_type="Basic",
+            study_status=1,
+            note_fields={"Front": f"front {i}", "Back": ""},
+        )
+        for i in range(n_cards)
+    )
+
+
+def test_card_store_views():
+    store = _make_store(n_cards=3)
+    assert len(store) == 3
+    assert store.index(card_id=2) == 2
+    assert not store.has_card(card_id=3)
+    assert store.get_column(name="note_type") == ["Basic"] * 3
+    card = store.get_card(idx=1)
+    assert card.get_card_properties() == store.get_card_properties(idx=1)
+    assert card.note_fields == {"Front": "front 1", "Back": ""}
+    # Views are memoized, so that edits are kept
+    card.note_fields["Back"] = "edited"
+    assert store[1].note_fields["Back"] == "edited"
+    assert store.copy()[1].note_fields["Back"] == ""
+
+
+def test_card_store_copy_on_write():
+    store = _make_store(n_cards=2)
+    copied = store.copy()
+    assert copied._card_ids is store._card_ids
+    copied.append(
+        card_id=2,
+        note_id=2,
+        sort_field_value="new",
+        due_value=0,
+        note_type="Cloze",
+        study_status=0,
+        note_fields={"Text": "new"},
+    )
+    assert (len(store), len(copied)) == (2, 3)
+    assert store.get_column(name="note_type") == ["Basic"] * 2
+    assert copied[2].note_fields == {"Text": "new"}
+    assert not store.has_card(card_id=2)
+
+
+def test_card_store_with_changes():
+    store = _make_store(n_cards=3)
+    kept_view = store.get_card(idx=0)
+    upserted = _make_store(n_cards=5).select(idxs=[4, 1])
+    new_store = store.with_changes(upserted_cards=upserted, removed_card_ids={2})
+    assert list(new_store.card_ids) == [0, 1, 4]
+    assert new_store[0] is kept_view
+    assert new_store.index(card_id=4) == 2
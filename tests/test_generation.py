@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from omakase.backend import generation
+from omakase.backend.decks import ObservableCard
+from omakase.backend.generation import (
+    FakeGenerationBackend,
+    GenerationError,
+    HttpGenerationBackend,
+    MnemonicGenerator,
+    get_generation_backend,
+)
+from omakase.backend.mnemonics import SoundTargetComponentsData
+from omakase.backend.mnemonics.base import MnemonicNoteFieldMapData
+
+
+def _make_map(card: ObservableCard) -> MnemonicNoteFieldMapData:
+    return MnemonicNoteFieldMapData(
+        prompt_params_class=SoundTargetComponentsData,
+        note_type=card.note_type,
+        note_field_names=list(card.note_fields),
+        om_username="alice",
+    )
+
+
+def test_generation_into_note_field(storage, make_card):
+    card = make_card(
+        card_id=1, sort_field_value="旅行", note_fields={"Front": "旅行", "Mnemonic": ""}
+    )
+    nf_map = _make_map(card=card)
+    backend = FakeGenerationBackend()
+    generator = MnemonicGenerator(backend=backend)
+    prompt_data = SoundTargetComponentsData()
+    for section_name, field_name in [
+        ("target_concept", "target_concept"),
+        ("target_meaning_mnemonic", "target_meaning_mnemonic"),
+    ]:
+        prompt_data.value[section_name].value[0].value[field_name].value = "voyage"
+    # No note field associated to the output yet
+    with pytest.raises(GenerationError):
+        asyncio.run(generator.generate(prompt_data, card, nf_map))
+    nf_map.point_to_genout_note_field_dp().value = "Mnemonic"
+    output = asyncio.run(generator.generate(prompt_data, card, nf_map))
+    assert card.note_fields["Mnemonic"] == output
+    assert card.dirty_fields == {"Mnemonic"}
+    assert backend.prompts == [prompt_data.get_prompt()]
+
+
+def test_http_backend():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if json.loads(request.content)["messages"][0]["content"] == "fail":
+            return httpx.Response(500)
+        return httpx.Response(
+            200, json={"choices": [{"message": {"content": "a mnemonic"}}]}
+        )
+
+    async def main() -> str:
+        backend = HttpGenerationBackend(
+            base_url="http://llm.test/v1",
+            model="m",
+            api_key="key",
+            transport=httpx.MockTransport(handler),
+        )
+        try:
+            output = await backend.generate(prompt="prompt")
+            with pytest.raises(GenerationError):
+                await backend.generate(prompt="fail")
+        finally:
+            await backend.aclose()
+        return output
+
+    assert asyncio.run(main()) == "a mnemonic"
+    assert str(requests[0].url) == "http://llm.test/v1/chat/completions"
+    assert requests[0].headers["Authorization"] == "Bearer key"
+
+
+def test_generation_not_configured_by_default(monkeypatch):
+    monkeypatch.setattr(generation, "_BACKEND", None)
+    with pytest.raises(GenerationError, match="not configured"):
+        get_generation_backend()
+
+
+def test_unknown_backend(monkeypatch):
+    monkeypatch.setattr(generation, "_BACKEND", None)
+    monkeypatch.setattr(generation, "get_generation_backend_name", lambda: "typo")
+    with pytest.raises(GenerationError, match="Unknown generation backend"):
+        get_generation_backend()
@@ -0,0 +1,43 @@
+import os
+
+from omakase.io import create_jinja_environment, get_jinja_template
+
+
+def _write_template(dirpath, content: str, mtime: int) -> None:
+    path = os.path.join(dirpath, "mnem", "0.jinja")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+    os.utime(path, (mtime, mtime))
+
+
+def test_templates_are_compiled_once():
+    template = get_jinja_template(template_name="reading_mnem", version=0)
+    assert get_jinja_template(template_name="reading_mnem", version=0) is template
+
+
+def test_auto_reload(tmp_path):
+    _write_template(tmp_path, content="v1 {{ x }}", mtime=1_000_000)
+    dev_env = create_jinja_environment(template_dirpath=str(tmp_path), auto_reload=True)
+    prod_env = create_jinja_environment(template_dirpath=str(tmp_path))
+    assert dev_env.get_template("mnem/0.jinja").render(x=1) == "v1 1"
+    assert prod_env.get_template("mnem/0.jinja").render(x=1) == "v1 1"
+    _write_template(tmp_path, content="v2 {{ x }}", mtime=2_000_000)
+    assert dev_env.get_template("mnem/0.jinja").render(x=1) == "v2 1"
+    assert prod_env.get_template("mnem/0.jinja").render(x=1) == "v1 1"
+
+
+def test_bytecode_cache(tmp_path):
+    template_dirpath = str(tmp_path / "templates")
+    _write_template(template_dirpath, content="{{ x }}", mtime=1_000_000)
+    cache_dirpath = str(tmp_path / "bytecode")
+    env = create_jinja_environment(
+        template_dirpath=template_dirpath, bytecode_cache_dirpath=cache_dirpath
+    )
+    assert env.get_template("mnem/0.jinja").render(x=1) == "1"
+    assert len(os.listdir(cache_dirpath)) == 1
+    # Compiled templates are reused by a new environment (e.g., after a restart)
+    env = create_jinja_environment(
+        template_dirpath=template_dirpath, bytecode_cache_dirpath=cache_dirpath
+    )
+    assert env.get_template("mnem/0.jinja").render(x=2) == "2"
@@ -1,7 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import FrozenInstanceError, dataclass
 
 import pytest
 
+from omakase.backend.mnemonics import MockPromptData, SoundTargetComponentsData, base
 from omakase.backend.mnemonics.base import PromptFieldTypeError, PromptParams
 
 
@@ -35,3 +36,27 @@ def test_non_filled_out_fields():
     instance = SimplePromptParams(field1="", field2={"k1": None, "k2": "b"})
     with pytest.raises(PromptFieldTypeError):
         instance.non_filled_out_fields()
+
+
+def test_prompt_schema(monkeypatch):
+    # Neither the schema nor an instance need the template
+    def fail(**kwargs):
+        raise AssertionError("template loaded")
+
+    monkeypatch.setattr(base, "get_jinja_template", fail)
+    schema = SoundTargetComponentsData.get_schema()
+    assert SoundTargetComponentsData.get_schema() is schema
+    assert MockPromptData.get_schema() is not schema
+    instance = SoundTargetComponentsData()
+    assert list(schema.one_d_section_names) == [
+        "target_concept",
+        "target_meaning_mnemonic",
+    ]
+    assert instance.get_1d_prompt_section_names() == list(schema.one_d_section_names)
+    assert instance.full_mnem_explanation == schema.full_mnem_explanation
+    components = schema.get_section(prompt_name="components")
+    assert components.n_repeat == 4
+    assert components.field_names == tuple(instance.value["components"].value[0].value)
+    assert components.full_ui_explanation in schema.full_mnem_explanation
+    with pytest.raises(FrozenInstanceError):
+        components.n_repeat = 1
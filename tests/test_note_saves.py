@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+from anki.collection import Collection
+
+from omakase.ankiapi.server.ankidb import ManipulateAnkiDb
+from omakase.ankiapi.server.collection_pool import get_collection_pool
+from omakase.backend.note_saves import NoteSaveQueue
+
+
+@pytest.fixture
+def note_id_and_paths(tmp_path) -> tuple[int, str, str]:
+    """A collection with a single note, and the path to a journal"""
+    db_path = str(tmp_path / "collection.anki2")
+    coll = Collection(db_path)
+    note = coll.new_note(coll.models.by_name("Basic"))
+    note["Front"] = "front"
+    coll.add_note(note, coll.decks.id("deck1"))
+    coll.close()
+    yield note.id, db_path, str(tmp_path / "note_saves.jsonl")
+    get_collection_pool().close_all()
+
+
+def _read_fields(db_path: str, note_id: int) -> list[str]:
+    with get_collection_pool().collection(db_path) as coll:
+        return coll.get_note(note_id).fields
+
+
+def test_saves_are_coalesced_and_reported(note_id_and_paths):
+    note_id, db_path, journal_path = note_id_and_paths
+    queue = NoteSaveQueue(db_path=db_path, journal_path=journal_path, flush_delay=60)
+    first = queue.enqueue(note_id=note_id, updates={0: "first", 1: "back"})
+    second = queue.enqueue(note_id=note_id, updates={0: "second"})
+    missing = queue.enqueue(note_id=1, updates={0: "nope"})
+    assert queue.pending_note_ids == [note_id, 1]
+    results = queue.flush()
+    assert len(results) == 2
+    assert first.result() is second.result()
+    assert first.result().ok
+    assert missing.result().error == "No such note"
+    assert _read_fields(db_path=db_path, note_id=note_id) == ["second", "back"]
+    assert queue.pending_note_ids == []
+    queue.close()
+
+
+def test_background_flush(note_id_and_paths):
+    note_id, db_path, journal_path = note_id_and_paths
+    queue = NoteSaveQueue(db_path=db_path, journal_path=journal_path, flush_delay=0)
+    future = queue.enqueue(note_id=note_id, updates={1: "back"})
+    assert future.result(timeout=10).ok
+    queue.close()
+
+
+def test_journal_is_replayed(note_id_and_paths):
+    note_id, db_path, journal_path = note_id_and_paths
+    with open(journal_path, "w") as f:
+        # Older than the last modification of the note: not replayed
+        stale = {"note_id": note_id, "updates": {"0": "stale"}, "journaled_at": 1.0}
+        f.write(json.dumps(stale) + "\n")
+        # Without time (older journal): replayed
+        f.write(json.dumps({"note_id": note_id, "updates": {"1": "replayed"}}) + "\n")
+        f.write('{"note_id": ')  # interrupted write
+    queue = NoteSaveQueue(db_path=db_path, journal_path=journal_path, flush_delay=60)
+    assert queue.pending_note_ids == [note_id]
+    queue.flush()
+    assert _read_fields(db_path=db_path, note_id=note_id) == ["front", "replayed"]
+    queue.wait_for_journal()
+    assert not os.path.exists(journal_path)
+    queue.close()
+
+
+def test_journal_is_written_before_enqueue_returns(note_id_and_paths, monkeypatch):
+    note_id, db_path, journal_path = note_id_and_paths
+    queue = NoteSaveQueue(db_path=db_path, journal_path=journal_path, flush_delay=60)
+    threads = []
+    append_to_journal = queue._append_to_journal
+
+    def record_thread(**kwargs) -> None:
+        threads.append(threading.current_thread())
+        append_to_journal(**kwargs)
+
+    monkeypatch.setattr(queue, "_append_to_journal", record_thread)
+    queue.enqueue(note_id=note_id, updates={1: "journaled"})
+    assert threads and threads[0] is not threading.current_thread()
+    with open(journal_path) as f:
+        assert json.loads(f.read())["updates"] == {"1": "journaled"}
+    queue.close()
+
+
+def test_flushes_run_on_the_collection_worker(note_id_and_paths, monkeypatch):
+    note_id, db_path, journal_path = note_id_and_paths
+    queue = NoteSaveQueue(db_path=db_path, journal_path=journal_path, flush_delay=0)
+    threads = []
+    update_fields_bulk = ManipulateAnkiDb.update_fields_bulk
+
+    def record_thread(self, **kwargs):
+        threads.append(threading.current_thread().name)
+        return update_fields_bulk(self, **kwargs)
+
+    monkeypatch.setattr(ManipulateAnkiDb, "update_fields_bulk", record_thread)
+    # Flushed in the background
+    assert queue.enqueue(note_id=note_id, updates={1: "first"}).result(timeout=10).ok
+    # Flushed from this thread
+    queue.enqueue(note_id=note_id, updates={1: "second"})
+    queue.flush()
+    assert _read_fields(db_path=db_path, note_id=note_id) == ["front", "second"]
+    assert len(threads) == 2
+    assert all(name.startswith("anki-collection") for name in threads)
+    queue.close()
+
+
+def test_flushes_do_not_overlap(note_id_and_paths, monkeypatch):
+    note_id, db_path, journal_path = note_id_and_paths
+    queue = NoteSaveQueue(db_path=db_path, journal_path=journal_path, flush_delay=60)
+    in_flight, max_in_flight = [], []
+    update_fields_bulk = ManipulateAnkiDb.update_fields_bulk
+
+    def slow_update(self, **kwargs):
+        in_flight.append(1)
+        max_in_flight.append(len(in_flight))
+        time.sleep(0.05)
+        in_flight.pop()
+        return update_fields_bulk(self, **kwargs)
+
+    monkeypatch.setattr(ManipulateAnkiDb, "update_fields_bulk", slow_update)
+    queue.enqueue(note_id=note_id, updates={1: "older"})
+    other_flush = threading.Thread(target=queue.flush)
+    other_flush.start()
+    time.sleep(0.01)
+    queue.enqueue(note_id=note_id, updates={1: "newer"})
+    queue.flush()
+    other_flush.join()
+    assert max(max_in_flight) == 1
+    assert _read_fields(db_path=db_path, note_id=note_id) == ["front", "newer"]
+    queue.close()
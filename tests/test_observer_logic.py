@@ -0,0 +1,220 @@
+import gc
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+import pytest
+
+from omakase import observer_logic
+from omakase.observer_logic import (
+    Change,
+    Observable,
+    ObservableDataclass,
+    ObservableDict,
+    ObservableList,
+    ObservablePrimitive,
+    Observer,
+    batch,
+)
+
+
+class _IntObl(ObservablePrimitive[int]):
+    pass
+
+
+class _Recorder(Observer):
+    def __init__(self) -> None:
+        self.updates: list[Observable] = []
+
+    def update(self, observable: Observable, change: Optional[Change] = None) -> None:
+        self.updates.append(observable)
+
+
+class _Doubler(Observer):
+    """Sets `target` to twice the value of the observable"""
+
+    def __init__(self, target: _IntObl) -> None:
+        self._target = target
+
+    def update(self, observable: Observable, change: Optional[Change] = None) -> None:
+        self._target.value = 2 * observable.value
+
+
+def test_batch_defers_and_deduplicates():
+    source, target = _IntObl(data=0), _IntObl(data=0)
+    recorder = _Recorder()
+    source.attach(recorder)
+    doubler = _Doubler(target=target)  # observers are weakly referenced
+    source.attach(doubler)
+    target.attach(recorder)
+    with batch():
+        for i in range(1, 4):
+            source.value = i
+        with batch():  # nested: flushed by the outermost batch
+            source.value = 4
+        assert recorder.updates == []
+        assert target.value == 0
+    # Source notified once, then target once, in a second round
+    assert recorder.updates == [source, target]
+    assert target.value == 8
+    # Outside a batch, notifications are immediate again
+    source.value = 5
+    assert recorder.updates == [source, target, source, target]
+
+
+def test_unbatchable_observable_notifies_immediately():
+    class _UnbatchableObl(_IntObl):
+        batchable = False
+
+    observable = _UnbatchableObl(data=0)
+    recorder = _Recorder()
+    observable.attach(recorder)
+    with batch():
+        observable.value = 1
+        observable.value = 2
+        assert recorder.updates == [observable, observable]
+
+
+def test_batch_detects_loops(monkeypatch):
+    monkeypatch.setattr(observer_logic, "MAX_BATCH_ROUNDS", 5)
+    a, b = _IntObl(data=1), _IntObl(data=1)
+    doublers = [_Doubler(target=b), _Doubler(target=a)]
+    a.attach(doublers[0])
+    b.attach(doublers[1])
+    with pytest.raises(RuntimeError):
+        with batch():
+            a.value = 1
+    # The batch is closed nonetheless
+    c = _IntObl(data=0)
+    recorder = _Recorder()
+    c.attach(recorder)
+    c.value = 1
+    assert recorder.updates == [c]
+
+
+class _ChangeRecorder(Observer):
+    def __init__(self) -> None:
+        self.changes: list[Optional[Change]] = []
+
+    def update(self, observable: Observable, change: Optional[Change] = None) -> None:
+        self.changes.append(change)
+
+
+def test_change_records():
+    deck_names = ObservableList(data=["a", ["b"]])
+    recorder = _ChangeRecorder()
+    deck_names.attach(recorder)
+    deck_names.value.append("c")
+    deck_names.value[1].insert(0, "d")
+    deck_names.value.pop(0)
+    deck_names.value.reverse()  # not recorded
+    assert recorder.changes == [
+        Change(path=(2,), new_value="c", index_range=(2, 3)),
+        Change(path=(1, 0), new_value="d", index_range=(0, 1)),
+        Change(path=(0,), old_value="a", index_range=(0, 1)),
+        None,
+    ]
+    assoc = ObservableDict(value={"deck": {"filter": "all"}})
+    assoc.attach(recorder)
+    assoc.value["deck"]["filter"] = "new"
+    del assoc.value["deck"]
+    assert recorder.changes[-2:] == [
+        Change(path=("deck", "filter"), old_value="all", new_value="new"),
+        Change(path=("deck",), old_value={"filter": "new"}),
+    ]
+
+
+def test_dataclass_change_records():
+    @dataclass
+    class _Card(ObservableDataclass):
+        sort_field_value: str
+        note_fields: dict
+
+    card = _Card(sort_field_value="a", note_fields={"Front": "a"})
+    recorder = _ChangeRecorder()
+    card.attach(recorder)
+    card.sort_field_value = "b"
+    card.note_fields["Front"] = "b"
+    assert recorder.changes == [
+        Change(path=("sort_field_value",), old_value="a", new_value="b"),
+        Change(path=("note_fields", "Front"), old_value="a", new_value="b"),
+    ]
+
+
+def test_nested_set_change_records():
+    @dataclass
+    class _Card(ObservableDataclass):
+        tags: dict
+
+    card = _Card(tags={"kanji": {"N5"}})
+    recorder = _ChangeRecorder()
+    card.attach(recorder)
+    card.tags["kanji"].add("N4")
+    card.tags["kanji"].discard("N5")
+    card.tags["kanji"].clear()  # not recorded
+    assert recorder.changes == [
+        Change(path=("tags", "kanji", "N4"), new_value="N4"),
+        Change(path=("tags", "kanji", "N5"), old_value="N5"),
+        None,
+    ]
+
+
+def test_batch_merges_change_records():
+    a, b = _IntObl(data=0), _IntObl(data=0)
+    recorder = _ChangeRecorder()
+    a.attach(recorder)
+    b.attach(recorder)
+    with batch():
+        a.value = 1
+        b.value = 1
+        b.value = 2
+    assert recorder.changes == [Change(old_value=0, new_value=1), None]
+
+
+def test_detach_and_pruning():
+    observable = _IntObl(data=0)
+    kept, dropped = _Recorder(), _Recorder()
+    observable.attach(kept)
+    observable.attach(dropped)
+    observable.detach(kept)
+    observable.value = 1
+    assert kept.updates == [] and dropped.updates == [observable]
+    del dropped
+    observable.value = 2
+    assert observable._observers == []
+
+
+class _CardEditor(Observer):
+    """Like the card editor: built upon each card selection, observing long-lived
+    data, with observers of its own"""
+
+    def __init__(self, card_idx_obl: _IntObl) -> None:
+        self._payload = list(range(100))
+        self._mnem_type_obl = _IntObl(data=0)
+        self._mnem_type_selector = _Recorder()
+        self._mnem_type_obl.attach(self._mnem_type_selector)
+        card_idx_obl.attach(self)
+
+    def update(self, observable: Observable, change: Optional[Change] = None) -> None:
+        pass
+
+
+def test_memory_is_flat_across_card_selections():
+    card_idx_obl = _IntObl(data=0)
+
+    def select_cards(n_selections: int) -> None:
+        for i in range(n_selections):
+            _CardEditor(card_idx_obl=card_idx_obl)
+            card_idx_obl.value = i
+
+    select_cards(n_selections=100)  # warm up
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    select_cards(n_selections=10_000)
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Retaining the editors would take several MiB
+    assert after - before < 100_000
+    assert len(card_idx_obl._observers) <= 1
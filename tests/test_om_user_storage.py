@@ -0,0 +1,137 @@
+import os
+import time
+
+import pytest
+
+from omakase.backend import om_user
+from omakase.backend.om_user_storage import (
+    ShardedJsonOmUserStorage,
+    SqliteOmUserStorage,
+)
+
+
+def test_nested_changes_are_persisted(storage, storage_path):
+    cache = storage.point_to_user_cache(om_username="alice")
+    assert storage.point_to_user_cache(om_username="alice") is cache
+    cache["deck"] = "deck1"
+    cache["assocs"] = {}
+    cache["assocs"]["mnem"] = {"fields": []}
+    cache["assocs"]["mnem"]["fields"].append("Front")
+    cache.setdefault("to_remove", 1)
+    cache.pop("to_remove")
+    storage.point_to_user_cache(om_username="bob")["deck"] = "deck2"
+    # Reloaded from the db
+    reloaded = SqliteOmUserStorage(db_path=storage_path)
+    assert reloaded.point_to_user_cache(om_username="alice") == {
+        "deck": "deck1",
+        "assocs": {"mnem": {"fields": ["Front"]}},
+    }
+    assert reloaded.point_to_user_cache(om_username="bob") == {"deck": "deck2"}
+    reloaded.close()
+
+
+def test_writes_are_scoped_to_user_and_key(storage, monkeypatch):
+    writes = []
+    write = storage._write
+
+    def spy_write(om_username, key, value):
+        writes.append((om_username, key))
+        write(om_username, key, value)
+
+    monkeypatch.setattr(storage, "_write", spy_write)
+    alice = storage.point_to_user_cache(om_username="alice")
+    alice["assocs"] = {"mnem": {}}
+    alice["deck"] = "deck1"
+    storage.point_to_user_cache(om_username="bob")["deck"] = "deck2"
+    writes.clear()
+    alice["assocs"]["mnem"]["field"] = "Back"
+    assert writes == [("alice", "assocs")]
+
+
+def test_import_user_caches(storage):
+    storage.point_to_user_cache(om_username="alice")["deck"] = "deck1"
+    storage.import_user_caches(
+        {"alice": {"deck": "stale"}, "bob": {"assocs": {"mnem": {"a": 1}}}}
+    )
+    assert storage.point_to_user_cache(om_username="alice") == {"deck": "deck1"}
+    assert storage.has_user(om_username="bob")
+    assert storage.point_to_user_cache(om_username="bob") == {
+        "assocs": {"mnem": {"a": 1}}
+    }
+
+
+def test_cached_user_data_point(storage, storage_path):
+    subcache = om_user.point_to_om_user_subcache(om_username="alice", keys=["a", "b"])
+    subcache["c"] = 1
+    dp = om_user.CachedUserDataPoint(
+        om_username="alice", root_keys=["filters"], subject_key="deck1", default_value=0
+    )
+    dp.value = 2
+    reloaded = SqliteOmUserStorage(db_path=storage_path)
+    assert reloaded.point_to_user_cache(om_username="alice") == {
+        "a": {"b": {"c": 1}},
+        "filters": {"deck1": 2},
+    }
+    reloaded.close()
+    with pytest.raises(TypeError):
+        om_user.point_to_om_user_subcache(om_username="alice", keys=["a", "b", "c"])
+
+
+def test_sharded_json_coalesces_writes(tmp_path):
+    dirpath = str(tmp_path / "om_users")
+    storage = ShardedJsonOmUserStorage(dirpath=dirpath, flush_interval=60)
+    alice = storage.point_to_user_cache(om_username="alice")
+    alice["assocs"] = {}
+    for i in range(10):
+        alice["assocs"][f"mnem{i}"] = {"field": i}
+    storage.point_to_user_cache(om_username="bob/1")["deck"] = "deck1"
+    storage.point_to_user_cache(om_username="carol")
+    assert storage.n_shard_writes == 0
+    storage.close()
+    # One write per dirty user, atomically renamed
+    assert storage.n_shard_writes == 2
+    assert sorted(os.listdir(dirpath)) == ["alice.json", "bob%2F1.json"]
+    reloaded = ShardedJsonOmUserStorage(dirpath=dirpath)
+    assert reloaded._user_caches == {}  # loaded lazily
+    assert reloaded.has_user(om_username="bob/1")
+    assert not reloaded.has_user(om_username="carol")
+    assert reloaded.point_to_user_cache(om_username="alice")["assocs"]["mnem9"] == {
+        "field": 9
+    }
+    reloaded.close()
+
+
+def test_sharded_json_flushes_in_background(tmp_path):
+    storage = ShardedJsonOmUserStorage(dirpath=str(tmp_path), flush_interval=0.01)
+    storage.point_to_user_cache(om_username="alice")["deck"] = "deck1"
+    for _ in range(100):
+        if storage.n_shard_writes:
+            break
+        time.sleep(0.01)
+    assert storage.n_shard_writes == 1
+    assert os.path.exists(tmp_path / "alice.json")
+    storage.close()
+
+
+def test_user_data_points_are_memoized(storage):
+    notifications = []
+    data_points = om_user.UserDataPoints(
+        om_username="alice",
+        on_change=lambda change: notifications.append(change.new_value),
+    )
+    dp = data_points.get(root_keys=["filters"], subject_key="deck1", default_value=0)
+    assert (
+        data_points.get(root_keys=["filters"], subject_key="deck1", default_value=1)
+        is dp
+    )
+    dp.value = 2
+    assert notifications == [2]
+    # The root dict is replaced: resolved again, with the default value
+    cache = storage.point_to_user_cache(om_username="alice")
+    cache["filters"] = {"deck2": 3}
+    assert dp.value == 0
+    dp.value = 4
+    assert cache["filters"] == {"deck1": 4, "deck2": 3}
+    # The subject key is removed
+    cache["filters"].pop("deck1")
+    assert dp.value == 0
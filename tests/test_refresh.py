@@ -0,0 +1,53 @@
+import asyncio
+
+from omakase.frontend.refresh import RefreshScheduler
+
+
+def test_refreshes_run_right_away_without_loop():
+    refreshes = []
+    scheduler = RefreshScheduler(loop=asyncio.new_event_loop())
+    scheduler.request(key="a", refresh=lambda: refreshes.append("a"))
+    scheduler.request(key="a", refresh=lambda: refreshes.append("a"))
+    assert refreshes == ["a", "a"]
+    assert scheduler.counters.requested == scheduler.counters.executed == 2
+
+
+def test_refreshes_are_merged_within_a_tick():
+    refreshes = []
+
+    async def chain_reaction(scheduler: RefreshScheduler) -> None:
+        for key in ["a", "b", "a", "a", "b"]:
+            scheduler.request(key=key, refresh=lambda key=key: refreshes.append(key))
+        assert scheduler.is_pending(key="a")
+        assert refreshes == []
+        for _ in range(3):  # let the flush run
+            await asyncio.sleep(0)
+        assert refreshes == ["a", "b"]
+        scheduler.request(key="a", refresh=lambda: refreshes.append("a"))
+        await asyncio.sleep(0.05)
+
+    async def main() -> RefreshScheduler:
+        scheduler = RefreshScheduler(loop=asyncio.get_running_loop())
+        await chain_reaction(scheduler=scheduler)
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert refreshes == ["a", "b", "a"]
+    assert scheduler.counters.requested == 6
+    assert scheduler.counters.executed == 3
+
+
+def test_interval_and_discard():
+    refreshes = []
+
+    async def main() -> None:
+        scheduler = RefreshScheduler(interval=0.02, loop=asyncio.get_running_loop())
+        scheduler.request(key="a", refresh=lambda: refreshes.append("a"))
+        scheduler.discard_pending()
+        scheduler.request(key="b", refresh=lambda: refreshes.append("b"))
+        await asyncio.sleep(0)
+        assert refreshes == []
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert refreshes == ["b"]
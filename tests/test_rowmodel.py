@@ -0,0 +1,74 @@
+from omakase.backend.decks import CardStore, ObservableCard
+from omakase.frontend.tabs.edit_decks.rowmodel import MAX_CACHED_VIEWS, CardRowModel
+
+
+def _make_cards(sort_field_values: list[str]) -> CardStore:
+    return CardStore.from_cards(
+        ObservableCard(
+            card_id=i,
+            note_id=i,
+            sort_field_value=value,
+            due_value=i,
+            note_type="t",
+            study_status=1,
+            note_fields={},
+        )
+        for i, value in enumerate(sort_field_values)
+    )
+
+
+def test_rows_are_sliced_and_counted():
+    row_model = CardRowModel(cards=_make_cards([f"card {i}" for i in range(10)]))
+    rows, total = row_model.get_rows(start_row=2, end_row=5)
+    assert [row["card_id"] for row in rows] == [2, 3, 4]
+    assert total == 10
+
+
+def test_rows_are_sorted_and_filtered():
+    row_model = CardRowModel(cards=_make_cards(["b", "a", "c", "ab"]))
+    rows, total = row_model.get_rows(
+        start_row=0,
+        end_row=100,
+        sort_model=[{"colId": "sort_field_value", "sort": "desc"}],
+        filter_model={"sort_field_value": {"type": "contains", "filter": "B"}},
+    )
+    assert [row["sort_field_value"] for row in rows] == ["b", "ab"]
+    assert total == 2
+
+
+def test_combined_filter_conditions():
+    row_model = CardRowModel(cards=_make_cards(["apple", "banana", "cherry"]))
+    filter_model = {
+        "sort_field_value": {
+            "operator": "OR",
+            "conditions": [
+                {"type": "startsWith", "filter": "a"},
+                {"type": "endsWith", "filter": "y"},
+            ],
+        }
+    }
+    rows, _ = row_model.get_rows(start_row=0, end_row=10, filter_model=filter_model)
+    assert [row["sort_field_value"] for row in rows] == ["apple", "cherry"]
+
+
+def test_card_idx_follows_set_cards():
+    row_model = CardRowModel()
+    assert row_model.get_rows(start_row=0, end_row=10) == ([], 0)
+    row_model.set_cards(cards=_make_cards(["a", "b", "c"]).select(idxs=[2, 1, 0]))
+    assert row_model.get_card_idx(card_id=0) == 2
+
+
+def test_views_are_bounded():
+    row_model = CardRowModel(cards=_make_cards(["apple", "banana", "cherry"]))
+    unfiltered = row_model._get_view(sort_model=[], filter_model={})
+    # Typing in a floating filter: one view per keystroke
+    for text in ["b", "ba", "ban", "bana", "banan", "banana"]:
+        rows, _ = row_model.get_rows(
+            start_row=0,
+            end_row=10,
+            filter_model={"sort_field_value": {"type": "contains", "filter": text}},
+        )
+        assert [row["sort_field_value"] for row in rows] == ["banana"]
+        row_model._get_view(sort_model=[], filter_model={})  # recently used
+    assert len(row_model._views) == MAX_CACHED_VIEWS
+    assert row_model._get_view(sort_model=[], filter_model={}) is unfiltered